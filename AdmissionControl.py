@@ -0,0 +1,83 @@
+from collections import Counter
+from threading import Lock
+from time import perf_counter
+
+
+class AdmissionControl:
+    """Capacity limits for hospital stages with backpressure and ambulance diversion.
+
+    Each limited stage (ER beds, surgical beds, lab backlog, waiting room) is
+    an instrumented semaphore in the resource ledger, so its occupancy shows
+    up in the utilization report. A patient holds a slot from admit() until
+    leave() or discharge(). A transfer keeps the old slot until the new one
+    is free, so a full stage backs patients up into the stages before it.
+    Stages without a capacity are not limited.
+    """
+
+    def __init__(self, ledger, capacities=None, on_block=None, on_divert=None):
+        self.capacities = {stage: capacity for stage, capacity in (capacities or {}).items() if capacity}
+        self.slots = {stage: ledger.semaphore(stage, capacity) for stage, capacity in self.capacities.items()}
+        self.on_block = on_block      # called with (stage, wait_seconds) after a blocked admission
+        self.on_divert = on_divert    # called with (stage,) when an arrival is turned away
+
+        self.lock = Lock()
+        self.blocks = Counter()
+        self.block_time = Counter()
+        self.diversions = Counter()
+
+    def admit(self, patient, stage, release=None):
+        """Give the patient a slot in `stage`, waiting for one if the stage is full.
+
+        `release` names a stage the patient gives up once admitted (a transfer).
+        Returns the seconds spent blocked.
+        """
+        wait = 0.0
+        slot = self.slots.get(stage)
+        if slot is not None and stage not in patient.held_stages:
+            if not slot.acquire(blocking=False):
+                # Stage is full: the caller stays blocked, which backs up its own queue
+                start = perf_counter()
+                slot.acquire()
+                wait = perf_counter() - start
+                with self.lock:
+                    self.blocks[stage] += 1
+                    self.block_time[stage] += wait
+                if self.on_block is not None:
+                    self.on_block(stage, wait)
+            patient.held_stages.append(stage)
+
+        if release is not None:
+            self.leave(patient, release)
+        return wait
+
+    def try_admit(self, patient, stage):
+        """Admit without waiting; a full stage counts a diversion and returns False."""
+        slot = self.slots.get(stage)
+        if slot is None or stage in patient.held_stages:
+            return True
+        if not slot.acquire(blocking=False):
+            with self.lock:
+                self.diversions[stage] += 1
+            if self.on_divert is not None:
+                self.on_divert(stage)
+            return False
+        patient.held_stages.append(stage)
+        return True
+
+    def leave(self, patient, stage):
+        """Free the patient's slot in `stage`, if they hold one."""
+        if stage in patient.held_stages:
+            patient.held_stages.remove(stage)
+            self.slots[stage].release()
+
+    def discharge(self, patient):
+        """Free every slot the patient still holds."""
+        for stage in list(patient.held_stages):
+            self.leave(patient, stage)
+
+    def summary(self):
+        """Blocks, blocked seconds and diversions per limited stage."""
+        with self.lock:
+            return {stage: {"capacity": capacity, "blocks": self.blocks[stage],
+                            "block_time": self.block_time[stage], "diversions": self.diversions[stage]}
+                    for stage, capacity in self.capacities.items()}
@@ -0,0 +1,252 @@
+import numpy as np
+
+from PatientFacts import MINUTES_PER_SECOND
+
+# Longest sleep of one simulate_time() call, in wall-clock seconds
+SLEEP_CAP = 0.5
+
+# Routing probabilities hard-wired into the worker threads
+ER_SEVERITY_WALK_IN = 0.3           # randint(1, 10) >= 8
+CODE_BLUE_CHANCE = 0.15
+CODE_BLUE_SURVIVAL = 0.20
+TESTS_CHANCE = 0.50
+BLOOD_WORK_SHARE = 0.75             # Blood work unless only an X-ray was picked
+XRAY_SHARE = 0.50
+SURGERY_CHANCE = 0.30
+SURGERY_SURVIVAL = 0.75
+
+
+def erlang_c(servers, offered_load):
+    """Probability that an arrival waits in an M/M/c queue (offered_load = arrival rate x service time)."""
+    blocking = 1.0
+    for k in range(1, servers + 1):
+        blocking = offered_load * blocking / (k + offered_load * blocking)
+    utilization = offered_load / servers
+    return blocking / (1 - utilization * (1 - blocking))
+
+
+class AnalyticModel:
+    """Queueing-network estimate of a simulation's stages, without running it.
+
+    Each stage is an M/M/c station sized from the simulation's settings, and
+    arrival rates per station come from solving the traffic equations of the
+    routing between them (a Jackson network, including the ER's loops
+    through the lab and code blue). Service times are the wall-clock means
+    of the stage's simulate_time() calls, so the model runs in the same real
+    time the threads spend. Times are reported in report minutes
+    (MINUTES_PER_SECOND per wall-clock second), like Statistics and
+    StageAnalytics.
+
+    Normal days only: MCI arrivals and the staff scheduler are not modeled.
+    A station with utilization >= 1 has no steady state; its wait is the
+    average over a day of the backlog growing while arrivals last.
+    """
+
+    def __init__(self, simulation):
+        self.simulation = simulation
+
+    def wall_time(self, low, high=None):
+        """Mean wall-clock seconds of simulate_time(uniform(low, high)), or of simulate_time(low)."""
+        speed = self.simulation.simulation_speed
+        low, high = low / speed, (high if high is not None else low) / speed
+        if high <= SLEEP_CAP:
+            return (low + high) / 2
+        if low >= SLEEP_CAP:
+            return SLEEP_CAP
+        return ((SLEEP_CAP ** 2 - low ** 2) / 2 + SLEEP_CAP * (high - SLEEP_CAP)) / (high - low)
+
+    def stations(self):
+        """Station name -> (ledger resource or None, servers, parallel queues, mean service seconds)."""
+        sim = self.simulation
+        stations = {
+            "Reception": ("Receptionists", sim.receptionists, 1, self.wall_time(3, 6)),
+            "Triage": (None, sim.receptionists, 1, self.wall_time(30, 60)),
+            "Ambulance offload": ("Ambulance crews", sim.ambulance_crews, 1, self.wall_time(3, 6)),
+            # One queue per ER doctor; only visits without a code blue or test order keep the doctor
+            "ER": ("ER doctors", 1, sim.er_doctors,
+                   (1 - CODE_BLUE_CHANCE) * (1 - TESTS_CHANCE) * self.wall_time(5, 10)),
+            "Code blue": (None, sim.code_blue_teams, 1, self.wall_time(8)),
+            # A blood analyzer cycle runs a whole batch
+            "Blood work": (None, sim.blood_analyzers, 1, self.wall_time(5, 10) / max(1, sim.lab_batch_size)),
+            "X-ray": (None, sim.xray_machines, 1, self.wall_time(5, 10)),
+            "Surgery": ("Operating rooms", sim.operating_rooms, 1, self.wall_time(10, 15)),
+            "Recovery": ("Recovery beds", sim.recovery_beds, 1, self.wall_time(5) + self.wall_time(2)),
+            "Recovery nurses": ("Recovery nurses", sim.recovery_nurses, 1, self.wall_time(2)),
+        }
+        for department in sim.departments:
+            stations[department] = (f"{department} doctors", sim.doctors_per_department, 1, self.wall_time(20, 40))
+        return stations
+
+    def department_shares(self):
+        """Share of non-ER walk-ins each department gets (conditions are drawn uniformly)."""
+        conditions = [condition for conditions in self.simulation.departments.values() for condition in conditions]
+        shares = dict.fromkeys(self.simulation.departments, 0.0)
+        for condition in conditions:
+            department = next(dept for dept, dept_conditions in self.simulation.departments.items()
+                              if condition in dept_conditions)
+            shares[department] += 1 / len(conditions)
+        return shares
+
+    def arrival_rates(self, names):
+        """Solve the traffic equations: arrival rate per station, per wall-clock second."""
+        index = {name: i for i, name in enumerate(names)}
+        external = np.zeros(len(names))
+        routing = np.zeros((len(names), len(names)))
+
+        def route(source, target, probability):
+            routing[index[source], index[target]] += probability
+
+        external[index["Reception"]] = 1 / self.wall_time(5)
+        external[index["Ambulance offload"]] = 1 / self.wall_time(15)
+
+        route("Reception", "Triage", 1)
+        route("Triage", "ER", ER_SEVERITY_WALK_IN)
+        for department, share in self.department_shares().items():
+            route("Triage", department, (1 - ER_SEVERITY_WALK_IN) * share)
+            route(department, "Surgery", SURGERY_CHANCE)
+        route("Ambulance offload", "ER", 1)
+
+        # ER visits end in a code blue, a lab order or an exam; patients come back after the first two
+        tests = (1 - CODE_BLUE_CHANCE) * TESTS_CHANCE
+        route("ER", "Code blue", CODE_BLUE_CHANCE)
+        route("Code blue", "ER", CODE_BLUE_SURVIVAL)
+        route("ER", "Blood work", tests * BLOOD_WORK_SHARE)
+        route("ER", "X-ray", tests * XRAY_SHARE)
+        route("ER", "Surgery", (1 - CODE_BLUE_CHANCE) * (1 - TESTS_CHANCE) * SURGERY_CHANCE)
+
+        # The patient returns once both tests are done: through blood work, or the X-ray if that was the only test
+        route("Blood work", "ER", 1)
+        route("X-ray", "ER", (1 - BLOOD_WORK_SHARE) / XRAY_SHARE)
+
+        route("Surgery", "Recovery", SURGERY_SURVIVAL)
+        route("Recovery", "Recovery nurses", 1)
+
+        rates = np.linalg.solve(np.eye(len(names)) - routing.T, external)
+        return dict(zip(names, rates))
+
+    def estimate(self):
+        """Utilization and expected wait of every station, plus the expected wait to see a doctor per route.
+
+        Returns {"stations": {name: {...}}, "routes": {route: wait_min}, "day_seconds": ...}.
+        """
+        sim = self.simulation
+        stations = self.stations()
+        rates = self.arrival_rates(list(stations))
+
+        # Arrivals last as long as the slower generator keeps going
+        arrival_window = max(sim.patients_per_day * self.wall_time(5), sim.ambulances_per_day * self.wall_time(15))
+
+        results = {}
+        for name, (resource, servers, queues, service) in stations.items():
+            arrival_rate = rates[name] / queues
+            capacity = servers / service if service > 0 else float("inf")
+            utilization = arrival_rate / capacity if servers else float("inf")
+
+            if utilization < 1:
+                wait = erlang_c(servers, arrival_rate * service) / (capacity - arrival_rate) if arrival_rate else 0.0
+                busy_for = arrival_window
+            else:
+                # The backlog grows all day; an arrival waits for the backlog ahead of it
+                wait = (arrival_rate - capacity) * arrival_window / (2 * capacity)
+                busy_for = arrival_rate * arrival_window / capacity
+
+            results[name] = {
+                "resource": resource,
+                "servers": servers * queues,
+                "arrival_rate": rates[name],
+                "service_min": service * MINUTES_PER_SECOND,
+                "utilization": utilization,
+                "stable": utilization < 1,
+                "wait_min": wait * MINUTES_PER_SECOND,
+                "sojourn_min": (wait + service) * MINUTES_PER_SECOND,
+                "busy_seconds": busy_for,
+            }
+
+        # A blood sample also waits for its batch to fill, at most the batch timeout
+        if sim.lab_batch_size > 1 and rates["Blood work"]:
+            fill_wait = min(self.wall_time(sim.lab_batch_timeout),
+                            (sim.lab_batch_size - 1) / (2 * rates["Blood work"]))
+            results["Blood work"]["wait_min"] += fill_wait * MINUTES_PER_SECOND
+            results["Blood work"]["sojourn_min"] += fill_wait * MINUTES_PER_SECOND
+
+        # The day ends once the most backlogged station has drained
+        day_seconds = max(station["busy_seconds"] for station in results.values())
+        for station in results.values():
+            # Share of the whole day a server is busy, as the resource ledger measures it
+            station["day_utilization"] = min(1.0, station["utilization"] * arrival_window / day_seconds)
+
+        def sojourn(name):
+            return results[name]["sojourn_min"]
+
+        front_desk = sojourn("Reception") + sojourn("Triage")
+        department_wait = sum(share * results[department]["wait_min"]
+                              for department, share in self.department_shares().items())
+        routes = {
+            "Department walk-in": front_desk + department_wait,
+            "ER walk-in": front_desk + results["ER"]["wait_min"],
+            "Ambulance": sojourn("Ambulance offload") + results["ER"]["wait_min"],
+        }
+        return {"stations": results, "routes": routes, "day_seconds": day_seconds}
+
+
+def measured_from_statistics(stats):
+    """Measured utilization per resource and mean wait per route (minutes) of a finished run."""
+    data = stats.fetch_data_from_db()
+    utilization = {resource["resource"]: resource["utilization"] for resource in data["resource_utilization"]}
+
+    routes = {
+        "Department walk-in": {"severity_max": 7, "came_by_ambulance": False},
+        "ER walk-in": {"severity_min": 8, "came_by_ambulance": False},
+        "Ambulance": {"came_by_ambulance": True},
+    }
+    waits = {}
+    for route, filters in routes.items():
+        summary = stats.patient_facts.percentiles("wait_min", [50], is_mci=False, **filters).get(())
+        if summary and summary["count"]:
+            waits[route] = summary["mean"]
+    return utilization, waits
+
+
+def compare_with_simulation(estimate, utilization, waits, tolerance=0.25, min_utilization_gap=0.05, min_wait_gap=1.0):
+    """Flag stations and routes where the simulation and the analytic estimate disagree.
+
+    `utilization` maps ledger resources to measured day utilization and
+    `waits` maps routes to measured mean waits in minutes. A value is flagged
+    when it is off by more than `tolerance` (relative) and by more than the
+    absolute gap. Returns a list of (what, measured, expected, note).
+    """
+    disagreements = []
+    for name, station in estimate["stations"].items():
+        measured = utilization.get(station["resource"])
+        if measured is None:
+            continue
+        expected = station["day_utilization"]
+        if abs(measured - expected) > max(min_utilization_gap, tolerance * expected):
+            note = "overloaded in the model" if not station["stable"] else ""
+            disagreements.append((f"{name} utilization", measured, expected, note))
+
+    for route, expected in estimate["routes"].items():
+        measured = waits.get(route)
+        if measured is None:
+            continue
+        if abs(measured - expected) > max(min_wait_gap, tolerance * expected):
+            disagreements.append((f"{route} wait (min)", measured, expected, ""))
+    return disagreements
+
+
+def print_estimate(estimate, disagreements=None):
+    print("\n=== Analytic Estimate (M/M/c network) ===")
+    for name, station in sorted(estimate["stations"].items(), key=lambda item: -item[1]["utilization"]):
+        if not station["arrival_rate"]:
+            continue
+        status = "" if station["stable"] else "  ⚠️ overloaded"
+        print(f"{name}: {station['servers']} servers, {station['utilization'] * 100:.1f}% utilized, "
+              f"wait {station['wait_min']:.1f} min, service {station['service_min']:.1f} min{status}")
+    for route, wait in estimate["routes"].items():
+        print(f"{route}: {wait:.1f} minutes to a doctor")
+
+    if disagreements is not None:
+        if not disagreements:
+            print("✅ Simulation agrees with the analytic estimate")
+        for what, measured, expected, note in disagreements:
+            print(f"❗ {what}: simulated {measured:.2f}, analytic {expected:.2f}" + (f" ({note})" if note else ""))
@@ -0,0 +1,160 @@
+import csv
+import heapq
+import json
+from collections import namedtuple
+from datetime import datetime, timezone
+
+
+# One replayed arrival; timestamp is in seconds since the epoch
+TraceArrival = namedtuple("TraceArrival", ["timestamp", "severity", "condition", "by_ambulance"])
+
+# Common chief complaints that do not literally name one of the simulated conditions
+COMPLAINT_SYNONYMS = {
+    "chest pain": "heart attack",
+    "palpitations": "arrhythmia",
+    "shortness of breath": "asthma",
+    "wheezing": "asthma",
+    "cough": "bronchitis",
+    "weakness one side": "stroke",
+    "facial droop": "stroke",
+    "head trauma": "concussion",
+    "convulsions": "seizure",
+    "abdominal pain": "appendicitis",
+    "vomiting": "food poisoning",
+    "diarrhea": "food poisoning",
+    "fever": "high fever",
+    "high blood pressure": "hypertension",
+    "high blood sugar": "diabetes",
+    "ankle pain": "sprained ankle",
+    "groin bulge": "hernia",
+}
+
+AMBULANCE_MODES = {"ambulance", "ems", "als", "bls", "helicopter", "1", "true", "yes"}
+
+
+class ArrivalTrace:
+    """Replay a historical ED arrival log (CSV or JSONL) lazily, in timestamp order.
+
+    Each record needs a timestamp (epoch seconds or ISO 8601), an acuity and a
+    chief complaint; an arrival-mode column marks ambulance arrivals. Only one
+    line plus a bounded reorder buffer is held in memory at a time, so files
+    of any size can be replayed.
+    """
+
+    def __init__(self, path, departments, file_format=None, time_field="timestamp", acuity_field="acuity",
+                 complaint_field="complaint", mode_field="arrival_mode", acuity_scale="severity",
+                 reorder_window=1000):
+        self.path = path
+        self.file_format = file_format or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+        self.time_field = time_field
+        self.acuity_field = acuity_field
+        self.complaint_field = complaint_field
+        self.mode_field = mode_field
+        self.acuity_scale = acuity_scale  # "severity" (1-10, 10 worst) or "esi" (1-5, 1 worst)
+        self.reorder_window = reorder_window
+
+        # Condition lookup built from the simulation's departments
+        self.conditions = [condition for conditions in departments.values() for condition in conditions]
+        self.department_conditions = {dept.lower(): conditions[0] for dept, conditions in departments.items()}
+
+        # Counters for the replay report
+        self.records_read = 0
+        self.records_skipped = 0
+        self.late_records = 0
+        self.unmapped_complaints = 0
+
+    def _read_rows(self):
+        with open(self.path, newline="", encoding="utf-8") as trace_file:
+            if self.file_format == "jsonl":
+                for line in trace_file:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
+            else:
+                yield from csv.DictReader(trace_file)
+
+    @staticmethod
+    def parse_timestamp(value):
+        """Convert an epoch number or ISO 8601 string to epoch seconds; times without an offset are UTC."""
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            if moment.tzinfo is None:
+                # Days are cut at UTC midnight, so the trace must not depend on the local time zone
+                moment = moment.replace(tzinfo=timezone.utc)
+            return moment.timestamp()
+
+    def parse_severity(self, value):
+        if value in (None, ""):
+            return None
+        acuity = int(float(value))
+        if self.acuity_scale == "esi":
+            # ESI 1 (resuscitation) -> 10, ESI 5 (non-urgent) -> 1
+            acuity = round(10 - (acuity - 1) * 2.25)
+        return max(1, min(10, acuity))
+
+    def map_complaint(self, complaint):
+        """Map a free-text chief complaint onto one of the simulated conditions."""
+        text = (complaint or "").strip().lower()
+        if text in self.conditions:
+            return text
+        if text in COMPLAINT_SYNONYMS:
+            return COMPLAINT_SYNONYMS[text]
+
+        for condition in self.conditions:
+            if condition in text:
+                return condition
+        for synonym, condition in COMPLAINT_SYNONYMS.items():
+            if synonym in text:
+                return condition
+        if text in self.department_conditions:
+            return self.department_conditions[text]
+
+        # Unknown complaints keep their text and are routed to Internal Medicine
+        self.unmapped_complaints += 1
+        return text or None
+
+    def _parse(self, row):
+        try:
+            timestamp = self.parse_timestamp(row[self.time_field])
+            severity = self.parse_severity(row.get(self.acuity_field))
+        except (KeyError, ValueError):
+            self.records_skipped += 1
+            return None
+
+        mode = str(row.get(self.mode_field) or "").strip().lower()
+        condition = self.map_complaint(row.get(self.complaint_field))
+        return TraceArrival(timestamp, severity, condition, mode in AMBULANCE_MODES)
+
+    def __iter__(self):
+        """Yield TraceArrival records in timestamp order.
+
+        Slightly out-of-order logs are fixed up with a heap of at most
+        reorder_window records; anything later than that is yielded as soon as
+        it is read and counted in late_records.
+        """
+        buffer = []
+        sequence = 0
+        last_timestamp = float("-inf")
+
+        for row in self._read_rows():
+            self.records_read += 1
+            arrival = self._parse(row)
+            if arrival is None:
+                continue
+
+            if arrival.timestamp < last_timestamp:
+                self.late_records += 1
+                yield arrival
+                continue
+
+            heapq.heappush(buffer, (arrival.timestamp, sequence, arrival))
+            sequence += 1
+            if len(buffer) > self.reorder_window:
+                last_timestamp, _, earliest = heapq.heappop(buffer)
+                yield earliest
+
+        while buffer:
+            _, _, earliest = heapq.heappop(buffer)
+            yield earliest
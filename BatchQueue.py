@@ -0,0 +1,43 @@
+from queue import Empty, Queue
+from time import monotonic
+
+
+class BatchQueue(Queue):
+    """Queue whose consumers can take several items per wake-up.
+
+    get_batch() takes up to max_items queued items under a single lock
+    acquisition, so a busy stage pays for one wake-up and one lock round trip
+    per batch instead of per patient. batch_done() marks a whole batch as
+    processed for join().
+    """
+
+    def get_batch(self, max_items, timeout=None):
+        """Wait up to `timeout` seconds for an item, then return up to max_items of those queued.
+
+        Raises Empty if nothing arrived in time, like get().
+        """
+        with self.not_empty:
+            if timeout is None:
+                while not self._qsize():
+                    self.not_empty.wait()
+            else:
+                end_time = monotonic() + timeout
+                while not self._qsize():
+                    remaining = end_time - monotonic()
+                    if remaining <= 0:
+                        raise Empty
+                    self.not_empty.wait(remaining)
+
+            batch = [self._get() for _ in range(min(max(1, max_items), self._qsize()))]
+            self.not_full.notify(len(batch))
+            return batch
+
+    def batch_done(self, count):
+        """Call task_done() for `count` items at once."""
+        with self.all_tasks_done:
+            unfinished = self.unfinished_tasks - count
+            if unfinished < 0:
+                raise ValueError("batch_done() called for more items than were queued")
+            if unfinished == 0:
+                self.all_tasks_done.notify_all()
+            self.unfinished_tasks = unfinished
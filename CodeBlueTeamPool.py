@@ -0,0 +1,57 @@
+from threading import Lock, Semaphore
+from time import time
+
+
+class CodeBlueTeamPool:
+    """Pool of code-blue teams assembled from the ER doctor and nurse pools."""
+
+    def __init__(self, teams, doctors, nurses, doctors_per_team=2, nurses_per_team=1, lock=None):
+        self.teams = teams
+        self.doctors = doctors
+        self.nurses = nurses
+        self.doctors_per_team = doctors_per_team
+        self.nurses_per_team = nurses_per_team
+
+        # One permit per team that can run a code blue at the same time
+        self.free_teams = Semaphore(teams)
+
+        # Only one team is assembled at a time, so two code blues can never
+        # each hold part of a team while waiting for the rest
+        self.assembly_lock = lock if lock is not None else Lock()
+
+        # Number of code blues currently running
+        self.active_lock = Lock()
+        self.active = 0
+
+    def has_free_team(self):
+        """Check whether another code blue could start right away."""
+        with self.active_lock:
+            return self.active < self.teams
+
+    def assemble(self):
+        """Block until a full team is available. Returns the time spent waiting in seconds."""
+        start = time()
+
+        self.free_teams.acquire()
+        with self.assembly_lock:
+            for _ in range(self.doctors_per_team):
+                self.doctors.acquire()
+            for _ in range(self.nurses_per_team):
+                self.nurses.acquire()
+
+        with self.active_lock:
+            self.active += 1
+
+        return time() - start
+
+    def disband(self):
+        """Return the team's doctors and nurse to the ER pools."""
+        for _ in range(self.doctors_per_team):
+            self.doctors.release()
+        for _ in range(self.nurses_per_team):
+            self.nurses.release()
+
+        with self.active_lock:
+            self.active -= 1
+
+        self.free_teams.release()
@@ -0,0 +1,167 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs, urlparse
+
+
+# Primary key columns used by the page to merge changed rows into its local copy
+TABLE_KEYS = {
+    "daily_stats": ["day"],
+    "conditions": ["day", "condition"],
+    "mci_stats": ["mci_day"],
+    "daily_waits": ["day"],
+    "patients_per_department": ["day", "department"],
+    "event_waits": ["day", "event"],
+    "resource_utilization": ["day", "resource"],
+}
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Hospital Simulation - Live</title>
+<style>
+  body { font-family: sans-serif; margin: 20px; color: #222; }
+  h1 { font-size: 20px; }
+  h2 { font-size: 16px; margin-top: 24px; }
+  table { border-collapse: collapse; font-size: 13px; }
+  td, th { border: 1px solid #ccc; padding: 3px 8px; text-align: right; }
+  th { background: #eee; }
+  td.name { text-align: left; }
+  .bar { background: #1f77b4; height: 10px; }
+  #status { color: #666; font-size: 12px; }
+</style>
+</head>
+<body>
+<h1>🏥 Hospital Simulation - Live Statistics</h1>
+<div id="status">connecting...</div>
+<h2>Mass Casualty Incident</h2><div id="mci"></div>
+<h2>Daily Statistics</h2><div id="daily"></div>
+<h2>Resource Utilization (latest day)</h2><div id="resources"></div>
+<h2>Departments (all days)</h2><div id="departments"></div>
+<script>
+const KEYS = %(keys)s;
+const state = {};
+let version = 0;
+
+function merge(table, rows) {
+  state[table] = state[table] || {};
+  for (const row of rows) {
+    state[table][KEYS[table].map(k => row[k]).join("|")] = row;
+  }
+}
+
+function rows(table) { return Object.values(state[table] || {}); }
+
+function render(meta) {
+  const waits = {};
+  for (const w of rows("daily_waits")) waits[w.day] = w.count ? w.total_wait / w.count : 0;
+
+  let html = "<table><tr><th>Day</th><th>Visits</th><th>Ambulances</th><th>ER</th><th>Deaths</th>"
+           + "<th>Surgeries</th><th>Code Blues</th><th>Survivals</th><th>Avg wait (min)</th></tr>";
+  for (const d of rows("daily_stats").sort((a, b) => a.day - b.day)) {
+    html += `<tr><td>${d.day + 1}</td><td>${d.total_visits}</td><td>${d.ambulance_arrivals}</td>`
+          + `<td>${d.er_patients}</td><td>${d.deaths}</td><td>${d.surgeries}</td><td>${d.code_blues}</td>`
+          + `<td>${d.survivals}</td><td>${(waits[d.day] || 0).toFixed(1)}</td></tr>`;
+  }
+  document.getElementById("daily").innerHTML = html + "</table>";
+
+  const mci = rows("mci_stats")[0];
+  document.getElementById("mci").innerHTML = mci
+    ? `Day ${meta.mci_day + 1}: ${mci.mci_patients} patients, ${mci.mci_survivals} survived, ${mci.mci_deaths} died`
+    : "not started";
+
+  const utilization = rows("resource_utilization");
+  const lastDay = Math.max(-1, ...utilization.map(r => r.day));
+  html = "<table><tr><th>Resource</th><th>Utilization</th><th></th><th>Avg queue</th><th>Max wait (ms)</th></tr>";
+  for (const r of utilization.filter(r => r.day === lastDay).sort((a, b) => b.utilization - a.utilization)) {
+    html += `<tr><td class="name">${r.resource}</td><td>${(r.utilization * 100).toFixed(1)}%%</td>`
+          + `<td><div class="bar" style="width:${Math.round(r.utilization * 200)}px"></div></td>`
+          + `<td>${r.avg_queue_length.toFixed(2)}</td><td>${(r.max_wait * 1000).toFixed(1)}</td></tr>`;
+  }
+  document.getElementById("resources").innerHTML = html + "</table>";
+
+  const departments = {};
+  for (const r of rows("patients_per_department")) departments[r.department] = (departments[r.department] || 0) + r.count;
+  html = "<table><tr><th>Department</th><th>Patients</th></tr>";
+  for (const [name, count] of Object.entries(departments).sort((a, b) => b[1] - a[1])) {
+    html += `<tr><td class="name">${name}</td><td>${count}</td></tr>`;
+  }
+  document.getElementById("departments").innerHTML = html + "</table>";
+}
+
+async function poll() {
+  try {
+    const response = await fetch(`/changes?since=${version}`);
+    const changes = await response.json();
+    let changed = 0;
+    for (const table in KEYS) { merge(table, changes[table]); changed += changes[table].length; }
+    version = changes.version;
+    render(changes);
+    document.getElementById("status").textContent =
+      `data version ${version} - ${changed} rows changed in last poll - ${new Date().toLocaleTimeString()}`;
+  } catch (error) {
+    document.getElementById("status").textContent = "waiting for simulation... " + error;
+  }
+  setTimeout(poll, %(interval)d);
+}
+poll();
+</script>
+</body>
+</html>
+"""
+
+
+class StatsDashboard:
+    """Local web page that follows a running simulation through incremental stats queries."""
+
+    def __init__(self, stats, host="127.0.0.1", port=8050, poll_interval=2.0):
+        self.stats = stats
+        self.host = host
+        self.port = port
+        self.poll_interval = poll_interval
+        self.server = None
+
+    def make_handler(self):
+        dashboard = self
+        page = (PAGE % {"keys": json.dumps(TABLE_KEYS), "interval": int(self.poll_interval * 1000)}).encode("utf-8")
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/":
+                    self.send_body(page, "text/html; charset=utf-8")
+                elif url.path == "/changes":
+                    since = int(parse_qs(url.query).get("since", ["0"])[0])
+                    changes = dashboard.stats.fetch_changes(since)
+                    self.send_body(json.dumps(changes).encode("utf-8"), "application/json")
+                else:
+                    self.send_error(404)
+
+            def send_body(self, body, content_type):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Keep the simulation output readable
+                pass
+
+        return Handler
+
+    def start(self):
+        """Serve the dashboard from a background thread."""
+        self.server = ThreadingHTTPServer((self.host, self.port), self.make_handler())
+        thread = Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        print(f"📺 Live dashboard at http://{self.host}:{self.server.server_port}/")
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,297 @@
+import os
+from itertools import count
+from multiprocessing import Process, Queue as ProcessQueue
+from queue import PriorityQueue, Queue
+from threading import Thread
+from time import time
+
+from HospitalSimulation import HospitalSimulation
+from Patient import Patient
+
+
+# Patient attributes shipped between processes, in a fixed order so a record
+# is a plain tuple; includes the flags that the ER and labs add on the fly
+PATIENT_FIELDS = tuple(field for field in vars(Patient("", 0)) if field != "rng") + ("needs_blood_work", "needs_xray",
+                                                                                      "handoff_time")
+
+# Settings copied from the coordinator into every shard process
+SHARD_SETTINGS = ("patients_per_day", "ambulances_per_day", "mci_patients", "departments",
+                  "doctors_per_department", "er_doctors", "receptionists", "nurses_per_doctor",
+                  "code_blue_teams", "operating_rooms", "recovery_beds", "recovery_nurses",
+                  "blood_analyzers", "xray_machines", "lab_batch_size", "lab_batch_timeout", "er_aging_rate")
+
+
+def pack_patient(patient):
+    """Turn a patient into a compact tuple record."""
+    return tuple(getattr(patient, field, None) for field in PATIENT_FIELDS)
+
+
+def unpack_patient(record):
+    """Rebuild a patient from a tuple record made by pack_patient()."""
+    patient = Patient(None, None)
+    for field, value in zip(PATIENT_FIELDS, record):
+        setattr(patient, field, value)
+    return patient
+
+
+class ShardError(Exception):
+    """Stands in for an exception raised in a shard process; shows as the original's repr()."""
+
+    def __repr__(self):
+        return self.args[0]
+
+
+class RemoteQueue:
+    """Stand-in for a stage queue that lives in another process."""
+
+    def __init__(self, inbox, target, key=None):
+        self.inbox = inbox
+        self.target = target
+        self.key = key
+
+    def put(self, patient):
+        # Stamp the handoff so the receiving stage can serve handoffs in order
+        patient.handoff_time = time()
+        self.inbox.put(("patient", self.target, self.key, pack_patient(patient)))
+
+    def task_done(self):
+        pass
+
+
+class HandoffQueue(PriorityQueue):
+    """Stage queue that serves patients in handoff order, whichever process sent them."""
+
+    def __init__(self):
+        super().__init__()
+        self.sequence = count()
+
+    def _put(self, patient):
+        handoff_time = getattr(patient, "handoff_time", None) or time()
+        patient.handoff_time = None  # Later local handoffs are stamped when they happen
+        super()._put((handoff_time, next(self.sequence), patient))
+
+    def _get(self):
+        return super()._get()[-1]
+
+
+class ShardStatsRelay:
+    """Statistics stand-in for shard processes: forwards records to the coordinator."""
+
+    def __init__(self, outbox, days):
+        self.outbox = outbox
+        self.days = days
+        self.mci_day = None
+        self.lock = None
+
+    def record_event_wait(self, day, event, wait_seconds):
+        self.outbox.put(("event_wait", day, event, wait_seconds))
+
+
+class ShardWorker(HospitalSimulation):
+    """Runs a group of departments (or the ER, labs and surgery) inside a worker process."""
+
+    def __init__(self, shard_id, settings, departments, hosts_er, inboxes, outbox):
+        super().__init__(settings["days"], settings["simulation_speed"],
+                         stats=ShardStatsRelay(outbox, settings["days"]),
+                         settings={name: settings[name] for name in SHARD_SETTINGS})
+
+        self.shard_id = shard_id
+        self.owned_departments = departments
+        self.hosts_er = hosts_er
+        self.inbox = inboxes[shard_id]
+        self.outbox = outbox
+        self.day_threads = []
+
+        # Queues owned by other shards forward patients to them
+        owners = settings["owners"]
+        er_inbox = inboxes[owners["ER"]]
+        self.department_queues = {dept: self.department_queues[dept] if dept in departments
+                                  else RemoteQueue(inboxes[owners[dept]], "department", dept)
+                                  for dept in self.departments}
+        if hosts_er:
+            self.surgery_queue = HandoffQueue()
+        else:
+            self.er_queues = [RemoteQueue(er_inbox, "er", i) for i in range(self.er_doctors)]
+            self.surgery_queue = RemoteQueue(er_inbox, "surgery")
+            self.mci_queue = RemoteQueue(er_inbox, "mci")
+
+    def worker_thread_specs(self):
+        specs = self.er_thread_specs() if self.hosts_er else []
+        # The MCI queue lives with the ER, so department shards do not send MCI assistants
+        return specs + self.department_thread_specs(self.owned_departments, mci_assistants=False)
+
+    def patient_departed(self, patient):
+        # The coordinator records statistics and keeps the in-flight count
+        self.outbox.put(("departed", pack_patient(patient)))
+
+    def patient_lost(self, patient, error):
+        # Free the slots held here; the coordinator records the failed visit and keeps the in-flight count
+        self.admission.discharge(patient)
+        self.outbox.put(("lost", pack_patient(patient), repr(error)))
+
+    def local_queue(self, target, key):
+        if target == "department":
+            return self.department_queues[key]
+        if target == "er":
+            return self.er_queues[key]
+        if target == "surgery":
+            return self.surgery_queue
+        return self.mci_queue
+
+    def serve(self):
+        """Process coordinator messages until told to stop."""
+        while True:
+            message = self.inbox.get()
+            kind = message[0]
+
+            if kind == "patient":
+                _, target, key, record = message
+                self.local_queue(target, key).put(unpack_patient(record))
+            elif kind == "state":
+                # Day and MCI flags mirrored from the coordinator
+                for name, value in message[1].items():
+                    setattr(self, name, value)
+            elif kind == "start_day":
+                self.ledger.start_window()
+                self.day_over.clear()
+                self.day_threads = self.start_worker_threads()
+            elif kind == "end_day":
+                self.stop_worker_threads(self.day_threads)
+                self.outbox.put(("day_done", self.shard_id, self.ledger.collect()))
+            elif kind == "stop":
+                self.simulation_complete.set()
+                break
+
+
+def run_shard(shard_id, settings, departments, hosts_er, inboxes, outbox):
+    """Entry point of a shard process."""
+    ShardWorker(shard_id, settings, departments, hosts_er, inboxes, outbox).serve()
+
+
+class ShardedHospitalSimulation(HospitalSimulation):
+    """Hospital simulation with departments and the ER spread over worker processes.
+
+    The coordinator process keeps reception, nurse assessment, ambulances,
+    patient generation and statistics. Shard 0 runs the ER, labs, surgery and
+    code blues; the other shards each run a group of departments. Patients move
+    between processes as tuple records over multiprocessing queues. During an
+    MCI only ER doctors treat MCI patients, since the MCI queue lives in the
+    ER shard.
+    """
+
+    # Flags that every shard needs to see; setting one broadcasts it
+    SHARED_STATE = ("current_day", "is_mci_day", "mci_in_progress")
+
+    def __init__(self, days=7, simulation_speed=1.0, worker_processes=None, stats=None):
+        self.shard_inboxes = []
+        super().__init__(days, simulation_speed, stats=stats)
+        self.worker_processes = max(2, worker_processes or os.cpu_count() or 2)
+        self.shard_processes = []
+
+    def use_admission_control(self, **capacities):
+        # Slots taken in one process would be freed in another, so limits are not enforced here
+        print("⚠️ Stage capacities are not supported in the multiprocess mode; running unlimited")
+
+    def use_staff_scheduler(self, **options):
+        # Pools live in different processes, so doctors cannot be lent between them here
+        print("⚠️ The staff scheduler is not supported in the multiprocess mode; using fixed MCI help")
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self.SHARED_STATE and self.shard_inboxes:
+            for inbox in self.shard_inboxes:
+                inbox.put(("state", {name: value}))
+
+    def start_shards(self):
+        """Start one ER shard and worker_processes - 1 department shards."""
+        department_shards = self.worker_processes - 1
+        groups = [[] for _ in range(department_shards)]
+        for i, dept in enumerate(self.departments):
+            groups[i % department_shards].append(dept)
+        groups = [group for group in groups if group]
+
+        owners = {"ER": 0}
+        for shard_id, group in enumerate(groups, start=1):
+            for dept in group:
+                owners[dept] = shard_id
+
+        settings = {name: getattr(self, name) for name in SHARD_SETTINGS}
+        settings.update(days=self.days, simulation_speed=self.simulation_speed, owners=owners)
+
+        self.outbox = ProcessQueue()
+        inboxes = [ProcessQueue() for _ in range(len(groups) + 1)]
+        for shard_id, departments in enumerate([[]] + groups):
+            process = Process(target=run_shard,
+                              args=(shard_id, settings, departments, shard_id == 0, inboxes, self.outbox))
+            process.daemon = True
+            process.start()
+            self.shard_processes.append(process)
+
+        # Patients routed by the front desk go straight to the owning shard
+        self.department_queues = {dept: RemoteQueue(inboxes[owners[dept]], "department", dept)
+                                  for dept in self.departments}
+        self.er_queues = [RemoteQueue(inboxes[0], "er", i) for i in range(self.er_doctors)]
+        self.surgery_queue = RemoteQueue(inboxes[0], "surgery")
+        self.mci_queue = RemoteQueue(inboxes[0], "mci")
+
+        self.shard_results = Queue()
+        self.shard_inboxes = inboxes
+        print(f"🧩 Started {len(inboxes)} shard processes: ER, "
+              + ", ".join("/".join(group) for group in groups))
+
+        self.listener = Thread(target=self.shard_listener_thread)
+        self.listener.daemon = True
+        self.listener.start()
+
+    def shard_listener_thread(self):
+        """Apply departures, failed visits and event records coming back from the shards."""
+        while True:
+            message = self.outbox.get()
+            kind = message[0]
+
+            if kind == "departed":
+                self.patient_departed(unpack_patient(message[1]))
+            elif kind == "lost":
+                # Recorded as a failed departure, which leaves the in-flight and MCI in-flight counts
+                self.patient_lost(unpack_patient(message[1]), ShardError(message[2]))
+            elif kind == "event_wait":
+                self.stats.record_event_wait(*message[1:])
+            elif kind == "day_done":
+                self.shard_results.put(message[2])
+            elif kind == "stopped":
+                break
+
+    def worker_thread_specs(self):
+        return self.front_desk_thread_specs()
+
+    def start_worker_threads(self):
+        for inbox in self.shard_inboxes:
+            inbox.put(("state", {"current_time": self.current_time}))
+            inbox.put(("start_day",))
+        return super().start_worker_threads()
+
+    def stop_worker_threads(self, threads):
+        super().stop_worker_threads(threads)
+        for inbox in self.shard_inboxes:
+            inbox.put(("end_day",))
+
+    def collect_utilization(self):
+        # Resources owned by a shard are reported from that shard
+        reports = {report["resource"]: report for report in self.ledger.collect()}
+        for _ in self.shard_inboxes:
+            for report in self.shard_results.get():
+                if report["acquisitions"] or report["resource"] not in reports:
+                    reports[report["resource"]] = report
+        return sorted(reports.values(), key=lambda report: report["utilization"], reverse=True)
+
+    def run_simulation(self):
+        self.start_shards()
+        try:
+            super().run_simulation()
+        finally:
+            for inbox in self.shard_inboxes:
+                inbox.put(("stop",))
+            for process in self.shard_processes:
+                process.join()
+            self.outbox.put(("stopped",))
+            self.listener.join()
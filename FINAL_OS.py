@@ -7,11 +7,32 @@ def main():
         days=7,                   # Simulate for 7 days
         simulation_speed=100.0    
     )
+
+    # Or simulate the days side by side in worker processes (from ParallelDays import ParallelDaysSimulation)
+    # simulation = ParallelDaysSimulation(days=30, simulation_speed=100.0, worker_processes=8)
     
     # Reduce the number of patients to speed up simulation but still see plenty of events
     simulation.patients_per_day = 100   
     simulation.ambulances_per_day = 50  
     simulation.mci_patients = 150        
+
+    # Follow the run live in a browser
+    # simulation.dashboard_port = 8050
+
+    # Replay a historical arrival log instead of synthetic arrivals (CSV or JSONL)
+    # simulation.use_arrival_trace("arrivals.csv", acuity_scale="esi")
+
+    # Export results as NPZ/CSV (and Parquet when pyarrow is installed) for notebooks
+    # simulation.export_formats = ("npz", "csv", "parquet")
+
+    # Write an HTML report with figures for every day and department
+    # simulation.html_report_dir = "report"
+
+    # Let low-severity ER patients move up 0.1 severity points per minute waited
+    # simulation.use_er_aging(0.1)
+
+    # Limit ER beds, surgical beds and the lab backlog; full ERs divert ambulances
+    # simulation.use_admission_control(er_beds=40, surgical_beds=10, lab_backlog=20, waiting_room=60)
     
     # Run the simulation
     simulation.run_simulation()
@@ -1,14 +1,37 @@
-from queue import Queue, PriorityQueue, Empty
-from random import choice, randint, uniform, random
-from threading import Event, Lock, Semaphore, Thread
+from queue import Queue, Empty
+from random import choice, uniform, random
+from threading import Condition, Event, Lock, Semaphore, Thread
 from time import sleep, time
 
+from AdmissionControl import AdmissionControl
+from AnalyticModel import AnalyticModel, compare_with_simulation, measured_from_statistics, print_estimate
+from BatchQueue import BatchQueue
+from ArrivalTrace import ArrivalTrace
+from CodeBlueTeamPool import CodeBlueTeamPool
+from Dashboard import StatsDashboard
+from HtmlReport import HtmlReport
+from InFlightCounter import InFlightCounter
+from LabAnalyzer import LabAnalyzer
 from Patient import Patient
+from PatientFacts import MINUTES_PER_SECOND
+from RandomStreams import RandomStreams
+from ResourceLedger import ResourceLedger
+from ResultExporter import ResultExporter
+from StageAnalytics import StageAnalytics
+from StaffScheduler import StaffScheduler
+from TriageQueue import TriageQueue
 from Statistics import Statistics
 
 
 class HospitalSimulation:
-    def __init__(self, days=7, simulation_speed=1.0):
+    # Settings stored with each run so runs in one database can be compared
+    SCENARIO_SETTINGS = ("days", "simulation_speed", "patients_per_day", "ambulances_per_day", "mci_patients",
+                         "doctors_per_department", "er_doctors", "receptionists", "nurses_per_doctor",
+                         "code_blue_teams", "ambulance_crews", "operating_rooms", "recovery_beds", "recovery_nurses",
+                         "blood_analyzers", "xray_machines", "lab_batch_size", "lab_batch_timeout",
+                         "stats_batch_size", "trace_time_scale", "er_aging_rate")
+
+    def __init__(self, days=7, simulation_speed=1.0, stats=None, settings=None):
         # Configurable parameters
         self.days = days
         self.simulation_speed = simulation_speed  # Higher values = faster simulation
@@ -21,6 +44,10 @@ class HospitalSimulation:
         self.ambulances_per_day = 50
         self.mci_patients = 150
 
+        # Optional historical arrival log replayed instead of synthetic arrivals
+        self.arrival_trace = None
+        self.trace_time_scale = 1.0  # Multiplier applied to gaps between trace arrivals (1.0 keeps them as recorded)
+
         # Department settings
         self.departments = {
             "Cardiology": ["heart attack", "arrhythmia", "heart failure"],
@@ -37,13 +64,62 @@ class HospitalSimulation:
         self.er_doctors = 60
         self.receptionists = 5
         self.nurses_per_doctor = 2
+        self.code_blue_teams = 3
+        self.ambulance_crews = 4
+        self.operating_rooms = 5
+        self.recovery_beds = 10
+        self.recovery_nurses = 3
+
+        # Lab settings: blood samples run in analyzer batches, X-rays one patient at a time
+        self.blood_analyzers = 3
+        self.xray_machines = 2
+        self.lab_batch_size = 6
+        self.lab_batch_timeout = 1.0  # Longest a sample waits for its batch to fill (simulated time)
+        self.lab_join_lock = Lock()
 
         # Generate realistic patient names
         self.first_names = ["John", "Emma", "Michael", "Olivia", "William", "James", "Ava", "Benjamin"]
         self.last_names = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis"]
 
+        # Optional wall-clock limit (seconds) for the whole run; None runs every day
+        self.max_runtime = None
+
+        # Port for the live web dashboard; None disables it
+        self.dashboard_port = None
+
+        # Columnar export of the run's results, e.g. ("npz", "csv", "parquet"); None disables it
+        self.export_formats = None
+        self.export_dir = "exports"
+
+        # Directory for the multi-figure HTML report; None disables it
+        self.html_report_dir = None
+
+        # Severity points an ER/MCI patient gains per minute waited; 0 keeps strict severity order
+        self.er_aging_rate = 0.0
+
+        # Scheduler lending doctors between departments and the ER; None keeps the fixed MCI help
+        self.staff_scheduler = None
+        self.loan_threads = []
+
+        # Relative tolerance for checking the run against the analytic queueing model; None skips the check
+        self.analytic_check = None
+
+        # Per-patient random streams for common random numbers; None draws from the shared generator
+        self.random_streams = None
+
+        # Most departures recorded per stats write
+        self.stats_batch_size = 64
+
+        # Settings overridden before staff pools and queues are sized from them
+        for name, value in (settings or {}).items():
+            setattr(self, name, value)
+
         # Initialize statistics
-        self.stats = Statistics()
+        self.stats = stats if stats is not None else Statistics(days=self.days)
+
+        # Utilization and contention ledger for every staff pool and shared lock
+        self.ledger = ResourceLedger()
+        self.stats.lock = self.ledger.lock("Statistics lock")
 
         # Initialize queues and resources
         self.initialize_queues_and_resources()
@@ -55,26 +131,51 @@ class HospitalSimulation:
         # Event to signal simulation completion
         self.simulation_complete = Event()
 
+        # Event to stop the current day's worker threads once the day is drained
+        self.day_over = Event()
+
+        # Patients that arrived but have not been discharged or died yet
+        self.in_flight = InFlightCounter()
+        self.mci_in_flight = InFlightCounter()
+
         # Current simulation time
         self.current_time = 0
 
         # Special events tracking
-        self.code_blue_in_progress = False
-        self.code_blue_lock = Lock()
+        self.code_blue_lock = self.ledger.lock("Code blue lock")
 
         # Available staff tracking
-        self.available_er_doctors = Semaphore(self.er_doctors)
-        self.available_er_nurses = Semaphore(self.er_doctors * self.nurses_per_doctor)
-        self.available_regular_doctors = {dept: Semaphore(self.doctors_per_department) for dept in
-                                          self.departments}
-        self.available_regular_nurses = {dept: Semaphore(self.doctors_per_department * self.nurses_per_doctor)
+        self.available_er_doctors = self.ledger.semaphore("ER doctors", self.er_doctors)
+        self.available_er_nurses = self.ledger.semaphore("ER nurses", self.er_doctors * self.nurses_per_doctor)
+
+        # Ambulance crews wait here for an ER doctor or nurse to come free
+        self.er_staff_released = Condition()
+        self.available_er_doctors.on_release = self.notify_er_staff_released
+        self.available_er_nurses.on_release = self.notify_er_staff_released
+        self.available_regular_doctors = {dept: self.ledger.semaphore(f"{dept} doctors", self.doctors_per_department)
+                                          for dept in self.departments}
+        self.available_regular_nurses = {dept: self.ledger.semaphore(f"{dept} nurses",
+                                                                     self.doctors_per_department * self.nurses_per_doctor)
                                          for dept in self.departments}
-        self.available_receptionists = Semaphore(self.receptionists)
+        self.available_receptionists = self.ledger.semaphore("Receptionists", self.receptionists)
+        self.available_ambulance_crews = self.ledger.semaphore("Ambulance crews", self.ambulance_crews)
+
+        # Operating rooms and the post-op recovery ward
+        self.available_operating_rooms = self.ledger.semaphore("Operating rooms", self.operating_rooms)
+        self.available_recovery_beds = self.ledger.semaphore("Recovery beds", self.recovery_beds)
+        self.available_recovery_nurses = self.ledger.semaphore("Recovery nurses", self.recovery_nurses)
+
+        # Code blue teams (2 ER doctors + 1 ER nurse each)
+        self.code_blue_pool = CodeBlueTeamPool(self.code_blue_teams, self.available_er_doctors,
+                                               self.available_er_nurses, lock=self.code_blue_lock)
 
         # Regular doctor pool for MCI assistance
         self.regular_doctors_helping_mci = Semaphore(0)  # Initially no regular doctors helping
         self.mci_assistance_needed = Event()  # Signal for regular doctors to help
 
+        # Stage capacities (ER beds, surgical beds, ...); unlimited until use_admission_control()
+        self.admission = AdmissionControl(self.ledger)
+
     def initialize_queues_and_resources(self):
         # Reception queue
         self.reception_queue = Queue()
@@ -82,19 +183,25 @@ class HospitalSimulation:
         # Nurse assessment queues
         self.assessment_queue = Queue()
 
+        # Departures waiting to be recorded in the statistics
+        self.departure_queue = BatchQueue()
+
         # Department doctor queues (FIFO)
         self.department_queues = {dept: Queue() for dept in self.departments}
 
-        # ER doctor queues (priority)
-        self.er_queues = [PriorityQueue() for _ in range(self.er_doctors)]
+        # ER doctor queues (priority by severity, then arrival)
+        self.er_queues = [TriageQueue(self.er_aging_rate) for _ in range(self.er_doctors)]
 
-        # Testing queues
-        self.blood_work_queue = Queue()
-        self.xray_queue = Queue()
+        # Testing queues: blood work and X-ray run in parallel for patients needing both
+        self.blood_work_analyzer = LabAnalyzer("Blood work", self.lab_batch_size, self.lab_batch_timeout)
+        self.xray_analyzer = LabAnalyzer("X-ray")
 
         # Surgery queues
         self.surgery_queue = Queue()
 
+        # Post-op recovery ward queue
+        self.recovery_queue = Queue()
+
         # Ambulance queue
         self.ambulance_queue = Queue()
 
@@ -102,7 +209,11 @@ class HospitalSimulation:
         self.code_blue_queue = Queue()
 
         # MCI queue - for handling mass casualty incidents
-        self.mci_queue = PriorityQueue()
+        self.mci_queue = TriageQueue(self.er_aging_rate)
+
+    def workers_should_stop(self):
+        """Check whether worker threads should exit (end of the day or of the simulation)."""
+        return self.day_over.is_set() or self.simulation_complete.is_set()
 
     def simulate_time(self, seconds):
         """Simulate the passage of time adjusted by simulation speed."""
@@ -135,24 +246,31 @@ class HospitalSimulation:
             # MCI patients get trauma conditions
             trauma_conditions = ["multiple trauma", "severe bleeding", "crush injury",
                                  "head injury", "penetrating trauma", "blast injury"]
-            patient.condition = choice(trauma_conditions)
-            patient.severity = randint(8, 10)  # High severity for MCI patients
+            patient.condition = patient.rng.choice(trauma_conditions)
+            patient.severity = patient.rng.randint(8, 10)  # High severity for MCI patients
             patient.is_mci_patient = True
         else:
             # Regular patient gets random condition
-            patient.condition = choice(all_conditions)
+            patient.condition = patient.rng.choice(all_conditions)
 
             # Assign severity (1-10 scale, with 10 being most severe)
-            if self.is_mci_day and not self.mci_in_progress:
+            if patient.severity is not None:
+                # Keep the acuity an arrival trace recorded without a complaint
+                pass
+            elif self.is_mci_day and not self.mci_in_progress:
                 # During MCI day but not MCI event, normal distribution of severity
-                patient.severity = randint(1, 10)
+                patient.severity = patient.rng.randint(1, 10)
             elif self.is_mci_day and self.mci_in_progress:
                 # During MCI event, non-MCI patients less likely to have high severity
-                patient.severity = randint(1, 8)
+                patient.severity = patient.rng.randint(1, 8)
             else:
                 # Normal day
-                patient.severity = randint(1, 10)
+                patient.severity = patient.rng.randint(1, 10)
 
+        self.assign_department(patient)
+
+    def assign_department(self, patient):
+        """Assign a department based on the patient's condition and severity."""
         # Assign department based on condition
         for dept, conditions in self.departments.items():
             if patient.condition in conditions:
@@ -174,7 +292,7 @@ class HospitalSimulation:
 
     def receptionist_thread(self):
         """Handle patient registration."""
-        while not self.simulation_complete.is_set():
+        while not self.workers_should_stop():
             try:
                 # Try to get a patient from the queue
                 patient_data = self.reception_queue.get(timeout=0.5)
@@ -194,7 +312,7 @@ class HospitalSimulation:
                     continue
 
                 # Simulate registration time
-                registration_time = uniform(3, 6)
+                registration_time = patient.rng.uniform(3, 6)
                 self.simulate_time(registration_time)
 
                 # Update patient record
@@ -216,131 +334,131 @@ class HospitalSimulation:
 
     def nurse_assessment_thread(self):
         """Handle nurse assessment of patients."""
-        while not self.simulation_complete.is_set():
+        while not self.workers_should_stop():
             try:
                 # Try to get a patient from the queue
                 patient = self.assessment_queue.get(timeout=0.5)
-
-                # Simulate assessment time 
-                assessment_time = uniform(30, 60)
-                self.simulate_time(assessment_time)
-
-                # Assign condition and severity if not already set (ambulance patients already have them)
-                if patient.condition is None:
-                    self.assign_condition_and_severity(patient)
-
-                # Update patient record
-                patient.assessment_time = time()
-
-                # Display assessment message
-                print(
-                    f"🩺 ({self.format_time()}) Nurse assessed {patient.name}: {patient.condition}, severity {patient.severity}")
-
-                # Route patient based on severity
-                if patient.severity >= 8:
-                    # ER patient - send to a random ER doctor queue
-                    er_queue_idx = randint(0, self.er_doctors - 1)
-                    self.er_queues[er_queue_idx].put(patient)
-                    print(f"🚨 ({self.format_time()}) Patient {patient.name} sent to ER")
-                else:
-                    # Regular patient - find appropriate department
-                    routed = False
-                    for dept, conditions in self.departments.items():
-                        if patient.condition in conditions:
-                            self.department_queues[dept].put(patient)
-                            print(f"🏥 ({self.format_time()}) Patient {patient.name} routed to {dept}")
-                            routed = True
-                            break
-
-                    # Default to Internal Medicine if no matching department
-                    if not routed:
-                        self.department_queues["Internal Medicine"].put(patient)
-                        print(f"🏥 ({self.format_time()}) Patient {patient.name} routed to Internal Medicine (default)")
-
-                # Mark task as complete
-                self.assessment_queue.task_done()
             except Empty:
                 continue
 
-    def blood_work_thread(self):
-        """Handle blood work tests."""
-        while not self.simulation_complete.is_set():
-            try:
-                # Try to get a patient from the queue
-                patient = self.blood_work_queue.get(timeout=0.5)
-
-                # Simulate blood work time
-                blood_work_time = uniform(5, 10)
-                self.simulate_time(blood_work_time)
-
-                # Update patient record
-                patient.had_blood_work = True
-
-                # Display blood work message
-                print(f"🩸 ({self.format_time()}) Blood work completed for {patient.name}")
+            self.assess_patient(patient)
 
-                # Check if patient also needed an X-ray
-                if hasattr(patient, 'needs_xray') and patient.needs_xray:
-                    self.xray_queue.put(patient)
-                else:
-                    # Continue to doctor
-                    if patient.severity >= 8:
-                        # Send back to ER
-                        er_queue_idx = randint(0, self.er_doctors - 1)
-                        self.er_queues[er_queue_idx].put(patient)
-                    else:
-                        # Send back to department
-                        self.department_queues[patient.department].put(patient)
-
-                # Mark task as complete
-                self.blood_work_queue.task_done()
-            except Empty:
-                continue
+            # Mark task as complete
+            self.assessment_queue.task_done()
 
-    def xray_thread(self):
-        """Handle X-ray tests."""
-        while not self.simulation_complete.is_set():
-            try:
-                # Try to get a patient from the queue
-                patient = self.xray_queue.get(timeout=0.5)
+    def assess_patient(self, patient):
+        """Triage one patient and route them to the ER or their department."""
+        # Simulate assessment time
+        assessment_time = patient.rng.uniform(30, 60)
+        self.simulate_time(assessment_time)
 
-                # Simulate X-ray time
-                xray_time = uniform(5, 10)
-                self.simulate_time(xray_time)
+        # Assign condition and severity if not already set (ambulance patients already have them)
+        if patient.condition is None:
+            self.assign_condition_and_severity(patient)
 
-                # Update patient record
-                patient.had_xray = True
+        # Update patient record
+        patient.assessment_time = time()
 
-                # Display X-ray message
-                print(f"📷 ({self.format_time()}) X-ray completed for {patient.name}")
+        # Display assessment message
+        print(
+            f"🩺 ({self.format_time()}) Nurse assessed {patient.name}: {patient.condition}, severity {patient.severity}")
 
-                # Continue to doctor
-                if patient.severity >= 8:
-                    # Send back to ER
-                    er_queue_idx = randint(0, self.er_doctors - 1)
-                    self.er_queues[er_queue_idx].put(patient)
-                else:
-                    # Send back to department
-                    self.department_queues[patient.department].put(patient)
+        # Route patient based on severity
+        if patient.severity >= 8:
+            # ER patient - send to a random ER doctor queue
+            # (waits here while every ER bed is taken)
+            self.admission.admit(patient, "ER beds", release="Waiting room")
+            er_queue_idx = patient.rng.randint(0, self.er_doctors - 1)
+            self.er_queues[er_queue_idx].put(patient)
+            print(f"🚨 ({self.format_time()}) Patient {patient.name} sent to ER")
+        else:
+            # Regular patient - find appropriate department
+            self.admission.leave(patient, "Waiting room")
+            routed = False
+            for dept, conditions in self.departments.items():
+                if patient.condition in conditions:
+                    self.department_queues[dept].put(patient)
+                    print(f"🏥 ({self.format_time()}) Patient {patient.name} routed to {dept}")
+                    routed = True
+                    break
 
-                # Mark task as complete
-                self.xray_queue.task_done()
-            except Empty:
+            # Default to Internal Medicine if no matching department
+            if not routed:
+                self.department_queues["Internal Medicine"].put(patient)
+                print(f"🏥 ({self.format_time()}) Patient {patient.name} routed to Internal Medicine (default)")
+
+    def lab_analyzer_thread(self, analyzer, run_test):
+        """Run batches of one kind of lab test; `run_test` marks the test as done for a patient."""
+        while not self.workers_should_stop():
+            # Wait for a sample, then for the batch to fill up
+            batch, fill_wait = analyzer.next_batch(fill_timeout=min(analyzer.batch_timeout / self.simulation_speed, 0.5))
+            if not batch:
                 continue
+            if analyzer.batch_size > 1:
+                self.stats.record_event_wait(self.current_day, f"lab batch: {analyzer.name}", fill_wait)
+                print(f"🧪 ({self.format_time()}) {analyzer.name} analyzer running a batch of {len(batch)} samples")
+
+            # The whole batch runs in one analyzer cycle
+            self.simulate_time(uniform(5, 10))
+
+            for patient in batch:
+                run_test(patient)
+                self.lab_test_done(patient, analyzer.name)
+
+            # Mark tasks as complete
+            analyzer.batch_done(batch)
+
+    def blood_work_done(self, patient):
+        patient.had_blood_work = True
+        print(f"🩸 ({self.format_time()}) Blood work completed for {patient.name}")
+
+    def xray_done(self, patient):
+        patient.had_xray = True
+        print(f"📷 ({self.format_time()}) X-ray completed for {patient.name}")
+
+    def order_lab_tests(self, patient, tests):
+        """Send the patient's samples to every ordered test at once (fork)."""
+        patient.pending_tests = set(tests)
+        for test in tests:
+            if test == "Blood work":
+                self.blood_work_analyzer.submit(patient)
+            else:
+                self.xray_analyzer.submit(patient)
+
+    def lab_test_done(self, patient, test):
+        """Send the patient back to their doctor once the last ordered test is done (join)."""
+        with self.lab_join_lock:
+            patient.pending_tests.discard(test)
+            if patient.pending_tests:
+                return
+
+        # Tests are done, continue to doctor
+        patient.tests_done_time = time()
+        self.admission.leave(patient, "Lab backlog")
+        if patient.severity >= 8:
+            # Send back to ER
+            er_queue_idx = patient.rng.randint(0, self.er_doctors - 1)
+            self.er_queues[er_queue_idx].put(patient)
+        else:
+            # Send back to department
+            self.department_queues[patient.department].put(patient)
 
     def surgery_thread(self):
         """Handle surgeries."""
-        while not self.simulation_complete.is_set():
+        while not self.workers_should_stop():
             try:
                 # Try to get a patient from the queue
                 patient = self.surgery_queue.get(timeout=0.5)
 
-                # Simulate surgery time
-                surgery_time = uniform(10, 15)
-                self.simulate_time(surgery_time)
+                # Simulate surgery time in one of the operating rooms
+                with self.available_operating_rooms:
+                    patient.surgery_start_time = time()
+                    surgery_time = patient.rng.uniform(10, 15)
+                    self.simulate_time(surgery_time)
 
                 # Update patient record
                 patient.had_surgery = True
+                patient.surgery_end_time = time()
 
                 # Determine surgery outcome
                 death_chance = 0.25
@@ -353,160 +471,184 @@ class HospitalSimulation:
                     if patient.is_mci_patient:
                         death_chance = 0.50
 
-                if random() < death_chance:
+                if patient.rng.random() < death_chance:
                     patient.dead = True
                     patient.surgery_success = False
                     print(f"💀 ({self.format_time()}) Surgery for {patient.name} failed. Patient died.")
+
+                    # Record statistics and release the patient
+                    self.patient_departed(patient)
                 else:
                     patient.surgery_success = True
                     print(f"✅ ({self.format_time()}) Surgery for {patient.name} successful.")
 
-                    # If successful, patient stays for recovery
-                    recovery_time = 5
-                    self.simulate_time(recovery_time)
-                    print(f"🛌 ({self.format_time()}) {patient.name} in post-surgery recovery.")
-
-                    # Nurse checks on patient
-                    self.simulate_time(2)
-                    print(f"👩‍⚕️ ({self.format_time()}) Nurse checked on {patient.name} after surgery.")
-
-                    # Discharge patient
-                    patient.discharge_time = time()
-                    print(f"🚶 ({self.format_time()}) {patient.name} discharged after surgery.")
-
-                # Record statistics for the current day
-                self.stats.record_visit(self.current_day, patient)
-
-                # If patient was an MCI patient, also record those stats
-                if patient.is_mci_patient:
-                    self.stats.record_mci_patient(patient)
+                    # Recovery happens in the ward, so the operating room takes the next patient right away
+                    self.recovery_queue.put(patient)
 
                 # Mark task as complete
                 self.surgery_queue.task_done()
             except Empty:
                 continue
 
-    def code_blue_thread(self):
-        """Handle Code Blue emergencies."""
-        while not self.simulation_complete.is_set():
+    def recovery_ward_thread(self):
+        """Look after post-op patients in one recovery bed until they are discharged."""
+        while not self.workers_should_stop():
             try:
                 # Try to get a patient from the queue
-                patient = self.code_blue_queue.get(timeout=0.5)
+                patient = self.recovery_queue.get(timeout=0.5)
+            except Empty:
+                continue
 
-                with self.code_blue_lock:
-                    self.code_blue_in_progress = True
-                    print(f"⚠️ ({self.format_time()}) CODE BLUE initiated for {patient.name}")
+            with self.available_recovery_beds:
+                # The patient gives up their surgical bed once a recovery bed is free
+                self.admission.leave(patient, "Surgical beds")
 
-                    # Acquire 2 ER doctors and 1 nurse
-                    for _ in range(2):
-                        self.available_er_doctors.acquire(timeout=1)
-                    self.available_er_nurses.acquire(timeout=1)
+                # Patient stays for recovery
+                recovery_time = 5
+                self.simulate_time(recovery_time)
+                print(f"🛌 ({self.format_time()}) {patient.name} in post-surgery recovery.")
 
-                    # Handle Code Blue event
-                    self.simulate_time(8)  # Code Blue response time
+                # A ward nurse checks on the patient
+                with self.available_recovery_nurses:
+                    self.simulate_time(2)
+                print(f"👩‍⚕️ ({self.format_time()}) Nurse checked on {patient.name} after surgery.")
 
-                    # Determine outcome 
-                    if random() < 0.20:  # 20% survival rate 
-                        patient.code_blue_success = True
-                        print(f"✅ ({self.format_time()}) CODE BLUE successful for {patient.name}. Patient stabilized.")
-                    else:
-                        patient.code_blue_success = False
-                        patient.dead = True
-                        print(f"💀 ({self.format_time()}) CODE BLUE unsuccessful for {patient.name}. Patient died.")
+                # Discharge patient
+                patient.discharge_time = time()
+                print(f"🚶 ({self.format_time()}) {patient.name} discharged after surgery.")
 
-                    # Update patient record
-                    patient.had_code_blue = True
+            # Record statistics and release the patient
+            self.patient_departed(patient)
 
-                    # Release the doctors and nurse
-                    for _ in range(2):
-                        try:
-                            self.available_er_doctors.release()
-                        except:
-                            pass
-                    try:
-                        self.available_er_nurses.release()
-                    except:
-                        pass
+            # Mark task as complete
+            self.recovery_queue.task_done()
+
+    def code_blue_thread(self):
+        """Handle Code Blue emergencies with one of the code blue teams."""
+        while not self.workers_should_stop():
+            try:
+                # Try to get a patient from the queue
+                patient = self.code_blue_queue.get(timeout=0.5)
+            except Empty:
+                continue
+
+            # Assemble a team of 2 ER doctors and 1 nurse
+            team_wait = self.code_blue_pool.assemble()
+            try:
+                self.stats.record_event_wait(self.current_day, "code_blue", team_wait)
+                print(f"⚠️ ({self.format_time()}) CODE BLUE team assembled for {patient.name}")
 
-                    self.code_blue_in_progress = False
+                # Handle Code Blue event
+                self.simulate_time(8)  # Code Blue response time
 
-                # If patient survived, continue treatment
-                if not patient.dead:
-                    er_queue_idx = randint(0, self.er_doctors - 1)
-                    self.er_queues[er_queue_idx].put(patient)
+                # Determine outcome 
+                if patient.rng.random() < 0.20:  # 20% survival rate 
+                    patient.code_blue_success = True
+                    print(f"✅ ({self.format_time()}) CODE BLUE successful for {patient.name}. Patient stabilized.")
                 else:
-                    # Record statistics for the dead patient
-                    self.stats.record_visit(self.current_day, patient)
+                    patient.code_blue_success = False
+                    patient.dead = True
+                    print(f"💀 ({self.format_time()}) CODE BLUE unsuccessful for {patient.name}. Patient died.")
 
-                    # If patient was an MCI patient, also record those stats
-                    if patient.is_mci_patient:
-                        self.stats.record_mci_patient(patient)
+                # Update patient record
+                patient.had_code_blue = True
+            finally:
+                # Return exactly the doctors and nurse that were taken
+                self.code_blue_pool.disband()
+
+            # If patient survived, continue treatment
+            if not patient.dead:
+                er_queue_idx = patient.rng.randint(0, self.er_doctors - 1)
+                self.er_queues[er_queue_idx].put(patient)
+            else:
+                # Record statistics for the dead patient
+                self.patient_departed(patient)
+
+            # Mark task as complete
+            self.code_blue_queue.task_done()
+
+    def acquire_offload_team(self):
+        """Wait for an ER doctor and nurse to take over a patient from an ambulance crew.
+
+        Both are taken at once or not at all, so a waiting crew never holds a
+        doctor while the nurses are busy (or the other way round). Crews try
+        for the pair without blocking and otherwise wait, holding nothing,
+        until an ER doctor or nurse is released. Returns False if the day ends
+        first.
+        """
+        with self.er_staff_released:
+            while not self.workers_should_stop():
+                if self.available_er_doctors.acquire(blocking=False):
+                    if self.available_er_nurses.acquire(blocking=False):
+                        return True
+                    self.available_er_doctors.release()
 
-                # Mark task as complete
-                self.code_blue_queue.task_done()
-            except Empty:
-                continue
-            except Exception as e:
-                # Ensure the code blue in progress flag is reset if an error occurs
-                self.code_blue_in_progress = False
-                continue
+                # Waiting gives up the condition's lock; the timeout only notices the end of the day
+                self.er_staff_released.wait(timeout=0.5)
+        return False
 
-    def ambulance_thread(self):
-        """Handle ambulance arrivals."""
-        while not self.simulation_complete.is_set():
+    def notify_er_staff_released(self):
+        with self.er_staff_released:
+            self.er_staff_released.notify_all()
+
+    def ambulance_crew_thread(self):
+        """Offload ambulance patients to the ER; one thread per crew."""
+        while not self.workers_should_stop():
             try:
                 # Try to get an ambulance from the queue
-                ambulance_data = self.ambulance_queue.get(timeout=0.5)
-                day, _ = ambulance_data
+                day, patient = self.ambulance_queue.get(timeout=0.5)
+            except Empty:
+                continue
 
-                # Create a new patient
-                patient = Patient(self.generate_patient_name(), time())
-                patient.came_by_ambulance = True
+            try:
+                with self.available_ambulance_crews:
+                    patient.came_by_ambulance = True
 
-                # Try to acquire an ER doctor and nurse
-                doctor_acquired = self.available_er_doctors.acquire(timeout=1)
-                nurse_acquired = self.available_er_nurses.acquire(timeout=1)
+                    # The crew stays with the patient until the ER takes over
+                    team_acquired = self.acquire_offload_team()
+                    try:
+                        self.stats.record_event_wait(day, "ambulance offload", time() - patient.arrival_time)
 
-                # Simulate ambulance handling time
-                self.simulate_time(uniform(3, 6))
+                        # Simulate ambulance handling time
+                        self.simulate_time(patient.rng.uniform(3, 6))
 
-                # Assign condition and severity
-                self.assign_condition_and_severity(patient)
+                        # Assign condition and severity (trace patients already have them)
+                        if patient.condition is None:
+                            recorded_severity = patient.severity
+                            self.assign_condition_and_severity(patient)
 
-                # Force severity to be high for ambulance patients
-                if patient.severity < 7:
-                    patient.severity = randint(7, 10)
+                            # Force severity to be high for ambulance patients (unless a trace recorded it)
+                            if recorded_severity is None and patient.severity < 7:
+                                patient.severity = patient.rng.randint(7, 10)
 
-                print(
-                    f"🚑 ({self.format_time()}) Ambulance arrived with {patient.name}: {patient.condition}, severity {patient.severity}")
+                        print(
+                            f"🚑 ({self.format_time()}) Ambulance arrived with {patient.name}: {patient.condition}, severity {patient.severity}")
+                    finally:
+                        # Release the doctor and nurse
+                        if team_acquired:
+                            self.available_er_doctors.release()
+                            self.available_er_nurses.release()
 
-                # Release the doctor and nurse if acquired
-                if doctor_acquired:
-                    try:
-                        self.available_er_doctors.release()
-                    except:
-                        pass
-                if nurse_acquired:
-                    try:
-                        self.available_er_nurses.release()
-                    except:
-                        pass
+                # Divert the ambulance to another hospital if every ER bed is taken
+                if not self.admission.try_admit(patient, "ER beds"):
+                    print(f"↪️ ({self.format_time()}) ER full, ambulance with {patient.name} diverted")
+                    self.in_flight.departed()
+                    continue
 
                 # Send to appropriate ER queue
-                er_queue_idx = randint(0, self.er_doctors - 1)
+                er_queue_idx = patient.rng.randint(0, self.er_doctors - 1)
                 self.er_queues[er_queue_idx].put(patient)
-
+            except Exception as error:
+                # Continue even if there's an error, but let the patient go
+                self.patient_lost(patient, error)
+                continue
+            finally:
                 # Mark ambulance task as complete
                 self.ambulance_queue.task_done()
-            except Empty:
-                continue
-            except Exception:
-                # Continue even if there's an error
-                continue
 
     def mci_assistant_thread(self, department):
         """Thread for regular department doctors helping during MCI."""
-        while not self.simulation_complete.is_set():
+        while not self.workers_should_stop():
             # Wait for signal that MCI assistance is needed
             if not self.mci_assistance_needed.is_set():
                 sleep(0.1)
@@ -521,7 +663,7 @@ class HospitalSimulation:
                     pass
 
                 # Keep doctor occupied with MCI until it's over
-                while self.mci_in_progress and not self.simulation_complete.is_set():
+                while self.mci_in_progress and not self.workers_should_stop():
                     try:
                         # Try to get a patient from MCI queue
                         patient = self.mci_queue.get(timeout=0.5)
@@ -533,24 +675,26 @@ class HospitalSimulation:
                         patient.waiting_time = patient.doctor_start_time - patient.arrival_time
 
                         # Simulate doctor examination time
-                        examination_time = uniform(5, 10)
+                        examination_time = patient.rng.uniform(5, 10)
                         self.simulate_time(examination_time)
 
                         print(
                             f"👨‍⚕️ ({self.format_time()}) Doctor from {department} examined MCI patient {patient.name}")
 
                         # Higher chance for surgery for MCI patients
-                        surgery_needed = random() < 0.50  # 50% chance for surgery
+                        surgery_needed = patient.rng.random() < 0.50  # 50% chance for surgery
 
                         if surgery_needed:
                             print(f"🔪 ({self.format_time()}) MCI patient {patient.name} needs surgery")
+                            patient.doctor_end_time = time()
+                            self.admission.admit(patient, "Surgical beds", release="ER beds")
                             self.surgery_queue.put(patient)
                         else:
                             # No surgery needed
                             patient.doctor_end_time = time()
 
                             # Determine if patient survives (higher death chance during MCI)
-                            if random() < 0.30:  # 30% chance of death without surgery 
+                            if patient.rng.random() < 0.30:  # 30% chance of death without surgery 
                                 patient.dead = True
                                 print(f"💀 ({self.format_time()}) MCI patient {patient.name} died during treatment")
                             else:
@@ -558,8 +702,7 @@ class HospitalSimulation:
                                 print(f"🚶 ({self.format_time()}) MCI patient {patient.name} discharged after treatment")
 
                             # Record visit statistics
-                            self.stats.record_visit(self.current_day, patient)
-                            self.stats.record_mci_patient(patient)
+                            self.patient_departed(patient)
 
                         # Mark task as done
                         self.mci_queue.task_done()
@@ -574,23 +717,67 @@ class HospitalSimulation:
                 except:
                     pass
 
-    def regular_doctor_thread(self, department):
-        """Thread for regular department doctors."""
-        while not self.simulation_complete.is_set():
+    @staticmethod
+    def waiting_patients(queue):
+        """Patients waiting in a department, ER or MCI queue."""
+        with queue.mutex:
+            return [entry[-1] if isinstance(entry, tuple) else entry for entry in queue.queue]
+
+    def staff_pool_status(self):
+        """Queue depth, doctors and longest wait (minutes) of every department and the ER."""
+        now = time()
+        pools = {dept: ([self.department_queues[dept]], self.available_regular_doctors[dept])
+                 for dept in self.departments}
+        pools["ER"] = (self.er_queues + [self.mci_queue], self.available_er_doctors)
+
+        status = {}
+        for pool, (queues, doctors) in pools.items():
+            waiting = [patient for queue in queues for patient in self.waiting_patients(queue)]
+            oldest = min((patient.arrival_time for patient in waiting), default=now)
+            status[pool] = {"depth": len(waiting), "doctors": doctors.capacity,
+                            "idle": doctors.capacity - doctors.in_use,
+                            "longest_wait": (now - oldest) * MINUTES_PER_SECOND}
+        return status
+
+    def lend_doctor(self, source, target, recall):
+        """Start a doctor from the `source` pool working for `target` until `recall` is set."""
+        thread = Thread(target=self.loaned_doctor_thread, args=(source, target, recall))
+        thread.daemon = True
+        thread.start()
+        self.loan_threads.append(thread)
+
+    def loaned_doctor_thread(self, source, target, recall):
+        """Doctor on loan: works the target's queue, taking a doctor from the source pool per patient."""
+        doctors = self.available_er_doctors if source == "ER" else self.available_regular_doctors[source]
+        if target == "ER":
+            self.er_doctor_thread(None, doctors, recall)
+        else:
+            self.regular_doctor_thread(target, doctors, recall)
+
+    def staff_scheduler_thread(self):
+        """Run the staff scheduler for the day and wait for doctors still on loan."""
+        self.staff_scheduler.run(self.workers_should_stop)
+        for thread in self.loan_threads:
+            thread.join()
+        self.loan_threads = []
+
+    def regular_doctor_thread(self, department, doctors=None, recall=None):
+        """Thread for regular department doctors.
+
+        A doctor lent by the staff scheduler takes `doctors` from their own
+        pool and works until `recall` is set.
+        """
+        doctors = doctors or self.available_regular_doctors[department]
+        recall = recall or Event()
+        while not self.workers_should_stop() and not recall.is_set():
+            patient = None
+            doctor_held = False
             try:
-                # Acquire a doctor from the department
-                if not self.available_regular_doctors[department].acquire(timeout=0.5):
-                    continue
-
                 # If MCI is in progress and assistance is needed, this doctor might be reassigned
-                if self.is_mci_day and self.mci_in_progress and self.mci_assistance_needed.is_set():
-                    # 30% chance for regular doctors to be reassigned to MCI
+                if (self.staff_scheduler is None and self.is_mci_day and self.mci_in_progress
+                        and self.mci_assistance_needed.is_set()):
+                    # 30% chance for regular doctors to leave their slot to mci_assistant_thread
                     if random() < 0.30:
-                        # Release the doctor slot to be handled by mci_assistant_thread
-                        try:
-                            self.available_regular_doctors[department].release()
-                        except:
-                            pass
                         sleep(0.1)  # Wait a bit before trying again
                         continue
 
@@ -598,13 +785,13 @@ class HospitalSimulation:
                 try:
                     patient = self.department_queues[department].get(timeout=0.5)
                 except Empty:
-                    # If no patients, release the doctor
-                    try:
-                        self.available_regular_doctors[department].release()
-                    except:
-                        pass
                     continue
 
+                # Acquire a doctor from the department (idle doctors do not hold a slot,
+                # so the ledger only counts time spent with patients)
+                doctors.acquire()
+                doctor_held = True
+
                 # Mark the time doctor starts seeing patient
                 patient.doctor_start_time = time()
 
@@ -612,16 +799,18 @@ class HospitalSimulation:
                 patient.waiting_time = patient.doctor_start_time - patient.arrival_time
 
                 # Simulate doctor examination time 
-                examination_time = uniform(20, 40)
+                examination_time = patient.rng.uniform(20, 40)
                 self.simulate_time(examination_time)
 
                 print(f"👨‍⚕️ ({self.format_time()}) Doctor in {department} examined {patient.name}")
 
                 # Check if surgery is needed 
-                surgery_needed = random() < 0.30
+                surgery_needed = patient.rng.random() < 0.30
 
                 if surgery_needed:
                     print(f"🔪 ({self.format_time()}) {patient.name} needs surgery")
+                    patient.doctor_end_time = time()
+                    self.admission.admit(patient, "Surgical beds")
                     self.surgery_queue.put(patient)
                 else:
                     # No surgery needed, patient can be discharged
@@ -630,32 +819,39 @@ class HospitalSimulation:
                     print(f"🚶 ({self.format_time()}) {patient.name} discharged from {department}")
 
                     # Record visit statistics
-                    self.stats.record_visit(self.current_day, patient)
+                    self.patient_departed(patient)
+                patient = None
 
                 # Release the doctor
-                try:
-                    self.available_regular_doctors[department].release()
-                except:
-                    pass
+                doctors.release()
+                doctor_held = False
 
                 # Mark task as done
                 self.department_queues[department].task_done()
-            except Exception:
-                # If there's an error, make sure to release the doctor
-                try:
-                    self.available_regular_doctors[department].release()
-                except:
-                    pass
+            except Exception as error:
+                # If there's an error, make sure to release the doctor and let the patient go
+                if doctor_held:
+                    doctors.release()
+                if patient is not None:
+                    self.patient_lost(patient, error)
                 continue
 
-    def er_doctor_thread(self, queue_idx):
-        """Thread for ER doctors."""
-        while not self.simulation_complete.is_set():
+    def er_doctor_thread(self, queue_idx, doctors=None, recall=None):
+        """Thread for ER doctors.
+
+        A doctor lent by the staff scheduler has no queue of their own
+        (queue_idx None) and serves the longest ER queue, taking `doctors`
+        from their own pool until `recall` is set.
+        """
+        doctors = doctors or self.available_er_doctors
+        recall = recall or Event()
+        lent = queue_idx is None
+        while not self.workers_should_stop() and not recall.is_set():
+            if lent:
+                queue_idx = max(range(self.er_doctors), key=lambda i: self.er_queues[i].qsize())
+            patient = None
+            doctor_held = False
             try:
-                # Acquire an ER doctor
-                if not self.available_er_doctors.acquire(timeout=0.5):
-                    continue
-
                 # Check if there's an MCI patient with priority
                 mci_patient = None
                 if self.is_mci_day and self.mci_in_progress:
@@ -673,13 +869,13 @@ class HospitalSimulation:
                     try:
                         patient = self.er_queues[queue_idx].get(timeout=0.5)
                     except Empty:
-                        # No patients in queue, release doctor and continue
-                        try:
-                            self.available_er_doctors.release()
-                        except:
-                            pass
                         continue
 
+                # Acquire an ER doctor (an idle doctor does not hold a slot, so
+                # code blue teams can take doctors out of the pool)
+                doctors.acquire()
+                doctor_held = True
+
                 # Mark the time doctor starts seeing patient
                 patient.doctor_start_time = time()
 
@@ -687,17 +883,16 @@ class HospitalSimulation:
                 patient.waiting_time = patient.doctor_start_time - patient.arrival_time
 
                 # Check for Code Blue event 
-                code_blue = random() < 0.15
+                code_blue = patient.rng.random() < 0.15
 
-                if code_blue and not self.code_blue_in_progress:
+                if code_blue and self.code_blue_pool.has_free_team():
                     print(f"⚠️ ({self.format_time()}) Code Blue initiated for {patient.name}")
                     self.code_blue_queue.put(patient)
+                    patient = None
 
                     # Release the doctor for now
-                    try:
-                        self.available_er_doctors.release()
-                    except:
-                        pass
+                    doctors.release()
+                    doctor_held = False
 
                     # Mark task as done
                     if mci_patient:
@@ -707,12 +902,12 @@ class HospitalSimulation:
                     continue
 
                 # Check if patient needs tests before seeing doctor (50% chance)
-                tests_needed = random() < 0.50
+                tests_needed = patient.rng.random() < 0.50
 
                 if tests_needed:
                     # Needs blood work, x-ray, or both
-                    needs_blood_work = choice([True, False])
-                    needs_xray = choice([True, False])
+                    needs_blood_work = patient.rng.choice([True, False])
+                    needs_xray = patient.rng.choice([True, False])
 
                     if not needs_blood_work and not needs_xray:
                         needs_blood_work = True  # Ensure at least one test is needed
@@ -720,22 +915,27 @@ class HospitalSimulation:
                     patient.needs_blood_work = needs_blood_work
                     patient.needs_xray = needs_xray
 
+                    # The first order marks the start of the lab stage
+                    if patient.tests_ordered_time is None:
+                        patient.tests_ordered_time = time()
+
+                    # Wait for room in the lab backlog (the doctor stays with the patient meanwhile)
+                    self.admission.admit(patient, "Lab backlog")
+
                     if needs_blood_work and needs_xray:
                         print(f"🔬 ({self.format_time()}) ER patient {patient.name} needs both blood work and X-ray")
-                        patient.needs_xray = True  # Flag for blood work thread to send to X-ray after
-                        self.blood_work_queue.put(patient)
+                        self.order_lab_tests(patient, ("Blood work", "X-ray"))
                     elif needs_blood_work:
                         print(f"🔬 ({self.format_time()}) ER patient {patient.name} needs blood work")
-                        self.blood_work_queue.put(patient)
+                        self.order_lab_tests(patient, ("Blood work",))
                     elif needs_xray:
                         print(f"🔬 ({self.format_time()}) ER patient {patient.name} needs X-ray")
-                        self.xray_queue.put(patient)
+                        self.order_lab_tests(patient, ("X-ray",))
+                    patient = None
 
                     # Release the doctor while patient gets tests
-                    try:
-                        self.available_er_doctors.release()
-                    except:
-                        pass
+                    doctors.release()
+                    doctor_held = False
 
                     # Mark task as done
                     if mci_patient:
@@ -745,7 +945,7 @@ class HospitalSimulation:
                     continue
 
                 # Simulate doctor examination time
-                examination_time = uniform(5, 10)
+                examination_time = patient.rng.uniform(5, 10)
                 self.simulate_time(examination_time)
 
                 print(f"👨‍⚕️ ({self.format_time()}) ER Doctor examined {patient.name}")
@@ -753,12 +953,14 @@ class HospitalSimulation:
                 # Check if surgery is needed
                 # For MCI patients, higher chance of surgery
                 if patient.is_mci_patient:
-                    surgery_needed = random() < 0.50
+                    surgery_needed = patient.rng.random() < 0.50
                 else:
-                    surgery_needed = random() < 0.30
+                    surgery_needed = patient.rng.random() < 0.30
 
                 if surgery_needed:
                     print(f"🔪 ({self.format_time()}) ER patient {patient.name} needs surgery")
+                    patient.doctor_end_time = time()
+                    self.admission.admit(patient, "Surgical beds", release="ER beds")
                     self.surgery_queue.put(patient)
                 else:
                     # No surgery needed, patient can be discharged
@@ -766,38 +968,40 @@ class HospitalSimulation:
                     patient.discharge_time = time()
 
                     # For MCI patients, higher chance of death even without surgery
-                    if patient.is_mci_patient and random() < 0.30:
+                    if patient.is_mci_patient and patient.rng.random() < 0.30:
                         patient.dead = True
                         print(f"💀 ({self.format_time()}) MCI patient {patient.name} died during treatment")
                     else:
                         print(f"🚶 ({self.format_time()}) ER patient {patient.name} discharged")
 
                     # Record visit statistics
-                    self.stats.record_visit(self.current_day, patient)
-
-                    # If patient was an MCI patient, also record those stats
-                    if patient.is_mci_patient:
-                        self.stats.record_mci_patient(patient)
+                    self.patient_departed(patient)
+                patient = None
 
                 # Release the doctor
-                try:
-                    self.available_er_doctors.release()
-                except:
-                    pass
+                doctors.release()
+                doctor_held = False
 
                 # Mark task as done
                 if mci_patient:
                     self.mci_queue.task_done()
                 else:
                     self.er_queues[queue_idx].task_done()
-            except Exception:
-                # If there's an error, make sure to release the doctor
-                try:
-                    self.available_er_doctors.release()
-                except:
-                    pass
+            except Exception as error:
+                # If there's an error, make sure to release the doctor and let the patient go
+                if doctor_held:
+                    doctors.release()
+                if patient is not None:
+                    self.patient_lost(patient, error)
                 continue
 
+    def create_patient(self, *stream_key):
+        """Create a patient arriving now; with common random numbers they draw from the stream for `stream_key`."""
+        patient = Patient(self.generate_patient_name(), time())
+        if self.random_streams is not None:
+            patient.rng = self.random_streams.for_patient(*stream_key)
+        return patient
+
     def generate_regular_patients(self, day):
         """Generate regular patients throughout the day."""
         # Get interval between patient arrivals (scaled by simulation speed)
@@ -814,9 +1018,11 @@ class HospitalSimulation:
                 break
 
             # Create a new patient
-            patient = Patient(self.generate_patient_name(), time())
+            patient = self.create_patient("walk-in", day, i)
+            self.in_flight.arrived()
 
-            # Send to reception
+            # Wait for room in the waiting room, then send to reception
+            self.admission.admit(patient, "Waiting room")
             self.reception_queue.put((day, patient))
 
             # Wait for next patient
@@ -837,12 +1043,144 @@ class HospitalSimulation:
             if self.simulation_complete.is_set():
                 break
 
-            # Send ambulance to queue
-            self.ambulance_queue.put((day, i))
+            # Send ambulance to queue; the patient arrives at the ambulance bay now
+            self.in_flight.arrived()
+            self.ambulance_queue.put((day, self.create_patient("ambulance", day, i)))
 
             # Wait for next ambulance
             self.simulate_time(interval)
 
+    def use_admission_control(self, er_beds=None, surgical_beds=None, lab_backlog=None, waiting_room=None):
+        """Limit stage capacities; None leaves a stage unlimited.
+
+        A full stage blocks the thread trying to hand a patient to it, so the
+        queue before it stops moving (backpressure up to patient arrivals).
+        Ambulances are diverted instead of waiting when the ER beds are full.
+        Blocks and diversions are recorded as event waits.
+        """
+        capacities = {"ER beds": er_beds, "Surgical beds": surgical_beds, "Lab backlog": lab_backlog,
+                      "Waiting room": waiting_room}
+        self.admission = AdmissionControl(
+            self.ledger, capacities,
+            on_block=lambda stage, wait: self.stats.record_event_wait(self.current_day, f"blocked: {stage}", wait),
+            on_divert=lambda stage: self.stats.record_event_wait(self.current_day, f"diverted: {stage}", 0))
+
+    def use_staff_scheduler(self, sla_wait=60.0, max_queue_per_doctor=2.0, interval=0.5, max_moves=1, min_loan=2.0):
+        """Lend doctors from quiet pools to departments or the ER when their waits pass `sla_wait` minutes.
+
+        Replaces the MCI assistant threads: during an MCI the ER borrows
+        doctors like any other overloaded pool. Every loan and return is
+        recorded in the staff_reassignments table.
+        """
+        self.staff_scheduler = StaffScheduler(
+            self.staff_pool_status, self.lend_doctor, sla_wait=sla_wait, max_queue_per_doctor=max_queue_per_doctor,
+            interval=interval, max_moves=max_moves, min_loan=min_loan,
+            on_reassign=lambda action, source, target, pool: self.stats.record_reassignment(
+                self.current_day, action, source, target, pool["depth"], pool["longest_wait"]))
+
+    def use_common_random_numbers(self, seed, antithetic=False):
+        """Give every patient their own random stream derived from `seed` and their arrival.
+
+        Runs of different configurations with the same seed then see the same
+        patients with the same service times and outcomes. antithetic=True
+        mirrors every draw (U becomes 1 - U) for the second run of an
+        antithetic pair.
+        """
+        self.random_streams = RandomStreams(seed, antithetic)
+
+    def use_analytic_check(self, tolerance=0.25):
+        """After the run, compare utilization and waits with the analytic M/M/c network estimate.
+
+        Differences larger than `tolerance` (relative) are printed.
+        """
+        self.analytic_check = tolerance
+
+    def use_er_aging(self, rate):
+        """Let waiting ER and MCI patients gain `rate` severity points per minute so none starve."""
+        self.er_aging_rate = rate
+        for queue in self.er_queues + [self.mci_queue]:
+            queue.set_aging_rate(rate)
+
+    def use_lab_batching(self, batch_size, batch_timeout):
+        """Run blood samples in batches of up to `batch_size`, waiting at most `batch_timeout` to fill one."""
+        self.lab_batch_size = batch_size
+        self.lab_batch_timeout = batch_timeout
+        self.blood_work_analyzer.batch_size = max(1, batch_size)
+        self.blood_work_analyzer.batch_timeout = batch_timeout
+
+    def scenario(self):
+        """Return the settings that define this run."""
+        scenario = {name: getattr(self, name) for name in self.SCENARIO_SETTINGS}
+        scenario["departments"] = sorted(self.departments)
+        scenario["arrival_trace"] = self.arrival_trace.path if self.arrival_trace is not None else None
+        scenario["capacities"] = self.admission.capacities
+        return scenario
+
+    def use_arrival_trace(self, path, **trace_options):
+        """Replay arrivals from a CSV/JSONL trace instead of generating them.
+
+        Options are passed to ArrivalTrace (field names, acuity scale, ...).
+        Trace day N is simulated as day N of the run, counted from the first
+        arrival's date. Gaps between arrivals are waited out in full, so a
+        trace day takes 86400 * trace_time_scale / simulation_speed seconds;
+        lower trace_time_scale to replay faster.
+        """
+        self.arrival_trace = ArrivalTrace(path, self.departments, **trace_options)
+        self.trace_arrivals = iter(self.arrival_trace)
+        self.trace_pending = None
+        self.trace_day_zero = None
+
+    def replay_trace_arrivals(self, day):
+        """Feed one day of trace arrivals to the reception and ambulance queues in timestamp order.
+
+        Each gap between arrivals is scaled by trace_time_scale and the
+        simulation speed and slept in full, without simulate_time()'s cap, so
+        the trace's bursts and lulls are reproduced rather than flattened.
+        """
+        previous_timestamp = None
+
+        while not self.simulation_complete.is_set():
+            # Take the arrival held back at the end of the previous day, or read the next one
+            arrival = self.trace_pending or next(self.trace_arrivals, None)
+            self.trace_pending = None
+            if arrival is None:
+                break
+
+            if self.trace_day_zero is None:
+                # Day 0 starts at midnight (UTC) of the first arrival
+                self.trace_day_zero = arrival.timestamp - arrival.timestamp % (24 * 60 * 60)
+            if previous_timestamp is None:
+                previous_timestamp = self.trace_day_zero + day * 24 * 60 * 60
+
+            # Arrivals for a later day wait for that day
+            if int((arrival.timestamp - self.trace_day_zero) // (24 * 60 * 60)) > day:
+                self.trace_pending = arrival
+                break
+
+            # Wait for the gap between arrivals (cut short if the simulation is stopped)
+            gap = max(0, arrival.timestamp - previous_timestamp) * self.trace_time_scale
+            self.simulation_complete.wait(gap / self.simulation_speed)
+            self.current_time += gap
+            previous_timestamp = max(previous_timestamp, arrival.timestamp)
+
+            # Create the patient with the recorded acuity and complaint
+            patient = self.create_patient("trace", arrival.timestamp)
+            patient.condition = arrival.condition
+            patient.severity = arrival.severity
+            if patient.condition is not None:
+                if patient.severity is None:
+                    patient.severity = patient.rng.randint(1, 10)
+                self.assign_department(patient)
+            # Without a complaint the nurse assessment (or ambulance crew) picks the condition,
+            # and the severity too if none was recorded
+            self.in_flight.arrived()
+
+            if arrival.by_ambulance:
+                self.ambulance_queue.put((day, patient))
+            else:
+                self.admission.admit(patient, "Waiting room")
+                self.reception_queue.put((day, patient))
+
     def generate_mci_patients(self):
         """Generate a surge of patients during Mass Casualty Incident."""
         with self.mci_lock:
@@ -864,12 +1202,15 @@ class HospitalSimulation:
                 # Create a batch of patients
                 for j in range(min(batch_size, self.mci_patients - i)):
                     # Create a new patient with high severity
-                    patient = Patient(self.generate_patient_name(), time())
+                    patient = self.create_patient("mci", i + j)
 
                     # Assign as MCI patient with trauma condition
                     self.assign_condition_and_severity(patient, is_mci=True)
+                    self.in_flight.arrived()
+                    self.mci_in_flight.arrived()
 
-                    # Send directly to MCI queue
+                    # Send directly to MCI queue once an ER bed is free
+                    self.admission.admit(patient, "ER beds")
                     self.mci_queue.put(patient)
 
                 # Brief interval between batches
@@ -877,30 +1218,58 @@ class HospitalSimulation:
 
             print(f"🚨 MCI patient surge complete. Total: {self.mci_patients} patients")
 
-            # Wait for most MCI queue to be processed (with timeout to prevent hanging)
-            start_time = time()
-            timeout = 10  # Seconds to wait for MCI queue processing
-
-            while not self.mci_queue.empty() and time() - start_time < timeout:
-                self.simulate_time(1)
-
-            # Force completion even if not all patients were processed
-            while not self.mci_queue.empty():
-                try:
-                    patient = self.mci_queue.get_nowait()
-                    # Mark as dead for statistics
-                    patient.dead = True
-                    self.stats.record_visit(self.current_day, patient)
-                    self.stats.record_mci_patient(patient)
-                    self.mci_queue.task_done()
-                except:
-                    break
+            # The MCI is resolved once every MCI patient has been discharged or died
+            self.mci_in_flight.wait_until_drained()
 
             # MCI is over
             print(f"🚨 Mass Casualty Incident has been resolved on Day {self.current_day + 1}.")
             self.mci_in_progress = False
             self.mci_assistance_needed.clear()
 
+    def patient_departed(self, patient):
+        """Free the patient's stage slots and hand their final disposition to the stats recorder."""
+        self.admission.discharge(patient)
+        self.departure_queue.put((self.current_day, patient))
+
+    def patient_lost(self, patient, error):
+        """Record a patient whose visit failed with `error` as a failed visit, so the day can still drain.
+
+        They depart like any other patient: their stage slots are freed and
+        the stats recorder counts the failed visit and takes them out of the
+        in-flight counts, the MCI one included.
+        """
+        print(f"❗ ({self.format_time()}) Visit of {patient.name} failed: {error!r}")
+        patient.visit_failed = True
+        self.patient_departed(patient)
+
+    def stats_recorder_thread(self):
+        """Record departures in batches with one combined stats write per day and batch.
+
+        Patients leave the in-flight count only once recorded, so a day never
+        ends with departures still waiting here.
+        """
+        while not self.workers_should_stop():
+            try:
+                batch = self.departure_queue.get_batch(self.stats_batch_size, timeout=0.5)
+            except Empty:
+                continue
+
+            try:
+                by_day = {}
+                for day, patient in batch:
+                    by_day.setdefault(day, []).append(patient)
+                for day, patients in by_day.items():
+                    self.stats.record_visits(day, patients)
+
+                # MCI patients also count towards the MCI totals
+                self.stats.record_mci_patients([patient for _, patient in batch if patient.is_mci_patient])
+            finally:
+                for _, patient in batch:
+                    if patient.is_mci_patient:
+                        self.mci_in_flight.departed()
+                    self.in_flight.departed()
+                self.departure_queue.batch_done(len(batch))
+
     def format_time(self):
         """Format the current simulation time as Day/Hour:Minute."""
         day = self.current_day + 1
@@ -909,6 +1278,84 @@ class HospitalSimulation:
         minutes = int((seconds_in_day % 3600) / 60)
         return f"Day {day} {hours:02d}:{minutes:02d}"
 
+    def front_desk_thread_specs(self):
+        """Reception, nurse assessment, ambulance and stats recorder workers as (target, args) pairs."""
+        specs = []
+
+        # Receptionist threads
+        specs += [(self.receptionist_thread, ())] * self.receptionists
+
+        # Nurse assessment threads
+        specs += [(self.nurse_assessment_thread, ())] * self.receptionists
+
+        # Ambulance crew threads
+        specs += [(self.ambulance_crew_thread, ())] * self.ambulance_crews
+
+        # Statistics recorder thread
+        specs.append((self.stats_recorder_thread, ()))
+        return specs
+
+    def er_thread_specs(self):
+        """ER doctors, labs, surgery, recovery and code blue workers as (target, args) pairs."""
+        specs = []
+
+        # Blood analyzer and X-ray machine threads
+        specs += [(self.lab_analyzer_thread, (self.blood_work_analyzer, self.blood_work_done))] * self.blood_analyzers
+        specs += [(self.lab_analyzer_thread, (self.xray_analyzer, self.xray_done))] * self.xray_machines
+
+        # Surgery threads (one per operating room) and one recovery ward thread per bed
+        specs += [(self.surgery_thread, ())] * self.operating_rooms
+        specs += [(self.recovery_ward_thread, ())] * self.recovery_beds
+
+        # One code blue thread per team
+        specs += [(self.code_blue_thread, ())] * self.code_blue_teams
+
+        # ER doctor threads
+        specs += [(self.er_doctor_thread, (i,)) for i in range(self.er_doctors)]
+        return specs
+
+    def department_thread_specs(self, departments, mci_assistants=True):
+        """Doctor workers for the given departments as (target, args) pairs."""
+        specs = []
+
+        # MCI assistant threads for each department (the staff scheduler lends doctors instead)
+        if self.is_mci_day and mci_assistants and self.staff_scheduler is None:
+            specs += [(self.mci_assistant_thread, (dept,)) for dept in departments]
+
+        # Regular doctor threads for each department
+        for dept in departments:
+            specs += [(self.regular_doctor_thread, (dept,))] * self.doctors_per_department
+        return specs
+
+    def worker_thread_specs(self):
+        """Every worker thread needed for one day."""
+        specs = self.front_desk_thread_specs() + self.er_thread_specs() + self.department_thread_specs(self.departments)
+
+        # Staff scheduler thread
+        if self.staff_scheduler is not None:
+            specs.append((self.staff_scheduler_thread, ()))
+        return specs
+
+    def start_worker_threads(self):
+        """Start the day's worker threads."""
+        threads = []
+        for target, args in self.worker_thread_specs():
+            thread = Thread(target=target, args=args)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def stop_worker_threads(self, threads):
+        """Stop the day's worker threads once every patient has left."""
+        self.day_over.set()
+        for thread in threads:
+            thread.join()
+
+    def collect_utilization(self):
+        """Utilization report for the day that just ended, busiest resource first."""
+        return self.ledger.collect()
+
     def simulate_day(self, day):
         """Simulate a full day in the hospital."""
         self.current_day = day
@@ -918,90 +1365,29 @@ class HospitalSimulation:
         self.is_mci_day = (day == self.stats.mci_day)
         self.mci_in_progress = False
 
+        # Start a fresh utilization window for the day
+        self.ledger.start_window()
+        self.day_over.clear()
+
         print(f"\n🏥 === Day {day + 1} Starting === 🏥")
         if self.is_mci_day:
             print(f"⚠️ This is the Mass Casualty Incident day!")
 
         # Start threads for the day
-        threads = []
-
-        # Start receptionist threads
-        for i in range(self.receptionists):
-            thread = Thread(target=self.receptionist_thread)
-            thread.daemon = True
-            thread.start()
-            threads.append(thread)
-
-        # Start nurse assessment threads
-        for i in range(self.receptionists):
-            thread = Thread(target=self.nurse_assessment_thread)
-            thread.daemon = True
-            thread.start()
-            threads.append(thread)
-
-        # Start blood work and X-ray threads
-        for i in range(3):
-            thread = Thread(target=self.blood_work_thread)
-            thread.daemon = True
-            thread.start()
-            threads.append(thread)
-
-        for i in range(2):
-            thread = Thread(target=self.xray_thread)
-            thread.daemon = True
-            thread.start()
-            threads.append(thread)
-
-        # Start surgery threads
-        for i in range(5):
-            thread = Thread(target=self.surgery_thread)
-            thread.daemon = True
-            thread.start()
-            threads.append(thread)
-
-        # Start code blue thread
-        code_blue_thread = Thread(target=self.code_blue_thread)
-        code_blue_thread.daemon = True
-        code_blue_thread.start()
-        threads.append(code_blue_thread)
+        threads = self.start_worker_threads()
 
-        # Start ambulance thread
-        ambulance_thread = Thread(target=self.ambulance_thread)
-        ambulance_thread.daemon = True
-        ambulance_thread.start()
-        threads.append(ambulance_thread)
+        # Start patient and ambulance arrivals (replayed from a trace if one is loaded)
+        if self.arrival_trace is not None:
+            arrival_targets = [self.replay_trace_arrivals]
+        else:
+            arrival_targets = [self.generate_regular_patients, self.generate_ambulance_arrivals]
 
-        # Start MCI assistant threads for each department
-        if self.is_mci_day:
-            for dept in self.departments:
-                thread = Thread(target=self.mci_assistant_thread, args=(dept,))
-                thread.daemon = True
-                thread.start()
-                threads.append(thread)
-
-        # Start regular doctor threads for each department
-        for dept in self.departments:
-            for i in range(self.doctors_per_department):
-                thread = Thread(target=self.regular_doctor_thread, args=(dept,))
-                thread.daemon = True
-                thread.start()
-                threads.append(thread)
-
-        # Start ER doctor threads
-        for i in range(self.er_doctors):
-            thread = Thread(target=self.er_doctor_thread, args=(i,))
+        arrival_threads = []
+        for target in arrival_targets:
+            thread = Thread(target=target, args=(day,))
             thread.daemon = True
             thread.start()
-            threads.append(thread)
-
-        # Start patient and ambulance generation
-        patient_thread = Thread(target=self.generate_regular_patients, args=(day,))
-        patient_thread.daemon = True
-        patient_thread.start()
-
-        ambulance_gen_thread = Thread(target=self.generate_ambulance_arrivals, args=(day,))
-        ambulance_gen_thread.daemon = True
-        ambulance_gen_thread.start()
+            arrival_threads.append(thread)
 
         # Start MCI if this is the MCI day (after a delay)
         if self.is_mci_day:
@@ -1013,79 +1399,90 @@ class HospitalSimulation:
             mci_thread.daemon = True
             mci_thread.start()
 
-            # Wait for MCI thread but with timeout to prevent hanging
-            mci_thread.join(timeout=10)
-
-        # Short wait for patient generation
-        try:
-            patient_thread.join(timeout=5)
-            ambulance_gen_thread.join(timeout=5)
-        except:
-            pass
-
-        # Wait for all queues to be empty or timeout
-        all_queues = [
-            self.reception_queue,
-            self.assessment_queue,
-            self.blood_work_queue,
-            self.xray_queue,
-            self.surgery_queue,
-            self.ambulance_queue,
-            self.code_blue_queue,
-            self.mci_queue
-        ]
-        all_queues.extend(self.department_queues.values())
-        all_queues.extend(self.er_queues)
-
-        # Wait until all queues are empty (with timeout)
-        max_wait_time = 30
-        start_wait_time = time()
-
-        while any(not q.empty() for q in all_queues):
-            self.simulate_time(1)  # Check every 1 simulated seconds
-
-            # Add a timeout mechanism to prevent infinite waiting
-            if time() - start_wait_time > max_wait_time:
-                print(f"⚠️ Timeout reached for day {day + 1}, forcing day completion")
-                # Force-empty any remaining queues
-                for q in all_queues:
-                    try:
-                        while not q.empty():
-                            q.get_nowait()
-                            q.task_done()
-                    except:
-                        pass
-                break
+            # Wait until every MCI patient has been treated
+            mci_thread.join()
 
-        print(f"\n✅ Day {day + 1} complete!")
+        # Wait until all arrivals for the day have been generated
+        for thread in arrival_threads:
+            thread.join()
 
-    def run_simulation(self):
-        """Run the full hospital simulation for multiple days."""
-        print("🏥 Multi-Day Hospital Simulation Started 🏥")
+        # The day is over as soon as the last patient has left the hospital
+        while not self.in_flight.wait_until_drained(timeout=10):
+            print(f"⏳ Day {day + 1}: waiting for {len(self.in_flight)} patients still in the hospital")
 
-        # Set a timeout for the entire simulation
+        # Stop the day's worker threads so long runs do not accumulate threads
+        self.stop_worker_threads(threads)
+
+        # Write the rest of the day's patient facts
+        self.stats.flush_patient_facts()
+
+        # Store the day's utilization report and point out the busiest resource
+        utilization = self.collect_utilization()
+        self.stats.record_resource_utilization(day, utilization)
+        busiest = utilization[0]
+        print(f"📈 Day {day + 1} busiest resource: {busiest['resource']} "
+              f"({busiest['utilization'] * 100:.1f}% utilized, avg queue {busiest['avg_queue_length']:.2f})")
+
+        print(f"\n✅ Day {day + 1} complete!")
+
+    def simulate_days(self):
+        """Simulate every day, up to the optional wall-clock limit, without any reporting."""
         simulation_start = time()
-        timeout = 300
 
         for day in range(self.days):
-            # Check for timeout
-            if time() - simulation_start > timeout:
-                print("⚠️ Simulation timeout reached, generating final statistics...")
+            # Check for the optional wall-clock limit
+            if self.max_runtime is not None and time() - simulation_start > self.max_runtime:
+                print("⚠️ Simulation time limit reached, generating final statistics...")
                 break
 
-            # Run simulation for this day
+            # Run simulation for this day (it ends once every patient has left and its threads have stopped)
             self.simulate_day(day)
 
-            # Add a small delay between days to ensure proper completion
-            sleep(1)
-
         # Signal simulation completion
         self.simulation_complete.set()
 
         # Give threads more time to terminate
         sleep(2)
 
+    def run_simulation(self):
+        """Run the full hospital simulation for multiple days."""
+        print("🏥 Multi-Day Hospital Simulation Started 🏥")
+
+        # Store this run's settings next to its results
+        self.stats.set_scenario(self.scenario())
+
+        # Start the live dashboard if requested
+        dashboard = None
+        if self.dashboard_port is not None:
+            dashboard = StatsDashboard(self.stats, port=self.dashboard_port)
+            dashboard.start()
+
+        self.simulate_days()
+
+        if dashboard is not None:
+            dashboard.stop()
+
+        # Close the run and apply the retention policy to older runs
+        self.stats.finish_run()
+
+        # Export the results for notebooks if requested
+        if self.export_formats:
+            ResultExporter(self.stats.db_name, self.stats.run_id, self.export_dir).export(self.export_formats)
+
         # Visualize the data
         self.stats.visualize_data()
 
+        # Show where patients spend their time
+        StageAnalytics(self.stats.db_name, self.stats.run_id).print_report()
+
+        # Point out where the run and the analytic queueing model disagree
+        if self.analytic_check is not None:
+            estimate = AnalyticModel(self).estimate()
+            utilization, waits = measured_from_statistics(self.stats)
+            print_estimate(estimate, compare_with_simulation(estimate, utilization, waits, self.analytic_check))
+
+        # Build the per-day and per-department HTML report if requested
+        if self.html_report_dir:
+            HtmlReport(self.stats, self.html_report_dir).build()
+
         print("\n🏥 Hospital Simulation Complete 🏥")
\ No newline at end of file
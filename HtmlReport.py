@@ -0,0 +1,271 @@
+import hashlib
+import html
+import json
+import os
+import re
+from multiprocessing import Pool
+
+from matplotlib.figure import Figure
+
+from StageAnalytics import STAGES, StageAnalytics
+
+
+# Bump when the drawing code changes so every figure is rendered again
+RENDER_VERSION = 1
+
+MANIFEST_NAME = "manifest.json"
+
+# Daily counters shown on each day's page, as (data key, label)
+DAY_COUNTERS = (("total_visits_per_day", "Visits"), ("ambulance_arrivals_per_day", "Ambulances"),
+                ("er_patients_per_day", "ER"), ("surgeries_per_day", "Surgeries"), ("xrays_per_day", "X-rays"),
+                ("blood_works_per_day", "Blood works"), ("code_blues_per_day", "Code blues"),
+                ("deaths_per_day", "Deaths"))
+
+
+def _bar(ax, labels, values, title, ylabel, rotate=False):
+    ax.bar([str(label) for label in labels], values)
+    ax.set_title(title)
+    ax.set_ylabel(ylabel)
+    if rotate:
+        ax.tick_params(axis="x", rotation=45)
+        for label in ax.get_xticklabels():
+            label.set_horizontalalignment("right")
+
+
+def _wait_bars(ax, waits, title, xlabel):
+    """Draw p50/p90 waiting times from {label: {"p50": ..., "p90": ...}}."""
+    labels = list(waits)
+    positions = range(len(labels))
+    ax.bar([p - 0.2 for p in positions], [waits[label]["p50"] for label in labels], width=0.4, label="p50")
+    ax.bar([p + 0.2 for p in positions], [waits[label]["p90"] for label in labels], width=0.4, label="p90")
+    ax.set_xticks(list(positions))
+    ax.set_xticklabels([str(label) for label in labels])
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel("Wait (minutes)")
+    if labels:
+        ax.legend()
+
+
+def render_overview(figure, payload):
+    period = payload["period_name"]
+    series = payload["series"]
+    x = list(range(1, len(series["total_visits_per_day"]) + 1))
+    axs = figure.subplots(2, 3)
+    _bar(axs[0, 0], x, series["total_visits_per_day"], f"Total Visits per {period}", "Number of Visits")
+    _bar(axs[0, 1], x, payload["avg_waits"], f"Average Waiting Time per {period}", "Time (minutes)")
+    _bar(axs[0, 2], x, series["ambulance_arrivals_per_day"], f"Ambulance Arrivals per {period}",
+         "Number of Ambulances")
+    _bar(axs[1, 0], x, series["deaths_per_day"], f"Deaths per {period}", "Number of Deaths")
+    axs[1, 1].bar(x, series["surgeries_per_day"], label="Total Surgeries")
+    axs[1, 1].bar(x, series["surgery_success_per_day"], label="Successful")
+    axs[1, 1].set_title(f"Surgeries per {period} and Outcomes")
+    axs[1, 1].legend()
+    axs[1, 2].bar(x, series["code_blues_per_day"], label="Total Code Blues")
+    axs[1, 2].bar(x, series["code_blue_success_per_day"], label="Successful")
+    axs[1, 2].set_title(f"Code Blues per {period} and Outcomes")
+    axs[1, 2].legend()
+    for ax in axs.flat:
+        ax.set_xlabel(period)
+
+
+def render_day(figure, payload):
+    axs = figure.subplots(2, 2)
+    _bar(axs[0, 0], [label for _, label in DAY_COUNTERS], payload["counters"], "Events", "Count", rotate=True)
+    _bar(axs[0, 1], list(payload["conditions"]), list(payload["conditions"].values()), "Conditions",
+         "Number of Patients", rotate=True)
+    _bar(axs[1, 0], list(payload["departments"]), list(payload["departments"].values()), "Departments",
+         "Number of Patients", rotate=True)
+    _wait_bars(axs[1, 1], payload["waits_by_severity"], "Waiting Time by Severity", "Severity")
+
+
+def render_department(figure, payload):
+    axs = figure.subplots(1, 3)
+    days = list(range(1, len(payload["patients_per_day"]) + 1))
+    _bar(axs[0], days, payload["patients_per_day"], "Patients per Day", "Number of Patients")
+    axs[0].set_xlabel("Day")
+    _wait_bars(axs[1], payload["waits_by_day"], "Waiting Time per Day", "Day")
+    _bar(axs[2], STAGES, [payload["stages"].get(stage, 0) for stage in STAGES], "Minutes per Patient by Stage",
+         "Minutes", rotate=True)
+
+
+def render_mci(figure, payload):
+    axs = figure.subplots(1, 3)
+    _bar(axs[0], ["Patients", "Survivals", "Deaths"], payload["totals"], "MCI Outcomes", "Count")
+    _bar(axs[1], list(payload["departments"]), list(payload["departments"].values()), "MCI Patients by Department",
+         "Number of Patients", rotate=True)
+    _wait_bars(axs[2], payload["waits_by_severity"], "MCI Waiting Time by Severity", "Severity")
+
+
+RENDERERS = {"overview": (render_overview, (16, 9)), "day": (render_day, (14, 10)),
+             "department": (render_department, (16, 5)), "mci": (render_mci, (16, 5))}
+
+
+def render_figure(kind, title, payload, path):
+    """Draw one figure to a PNG; runs in a worker process."""
+    draw, size = RENDERERS[kind]
+    figure = Figure(figsize=size)
+    figure.suptitle(title, fontsize=14)
+    draw(figure, payload)
+    figure.tight_layout()
+    figure.savefig(path)
+    return path
+
+
+class HtmlReport:
+    """Static HTML report with overview, per-day, per-department and MCI figures.
+
+    Figures are drawn in a process pool. Each figure's input data is hashed
+    and kept in a manifest next to the report, so figures whose data did not
+    change since the last build are not drawn again.
+    """
+
+    def __init__(self, stats, output_dir="report", processes=None):
+        self.stats = stats
+        self.output_dir = output_dir
+        self.processes = processes or os.cpu_count() or 1
+
+    @staticmethod
+    def slug(text):
+        return re.sub(r"[^a-z0-9]+", "_", str(text).lower()).strip("_")
+
+    @staticmethod
+    def _waits(percentiles):
+        """Keep p50/p90 of percentile results keyed by the last group column, in label order."""
+        ordered = sorted(percentiles.items(), key=lambda item: [(value is None, value) for value in item[0]])
+        return {key[-1]: {"p50": summary["p50"], "p90": summary["p90"]} for key, summary in ordered}
+
+    def figure_specs(self):
+        """Return (name, kind, title, payload) for every figure in the report."""
+        stats = self.stats
+        data = stats.fetch_data_from_db()
+        facts = stats.patient_facts
+        days = stats.days
+
+        period, period_name = stats.report_period()
+        series = {key: stats.rollup(values, period) for key, values in data.items()
+                  if key.endswith("_per_day") and isinstance(values, list)}
+        avg_waits = [total / count if count else 0
+                     for count, total in zip(series["wait_counts_per_day"], series["wait_totals_per_day"])]
+        specs = [("overview", "overview", f"Hospital Simulation: {days}-Day Statistics",
+                  {"period_name": period_name, "series": series, "avg_waits": avg_waits})]
+
+        # One grouped query per slice, split up per figure afterwards
+        day_severity_waits = facts.percentiles("wait_min", (50, 90), ("day", "severity"))
+        day_department_waits = facts.percentiles("wait_min", (50, 90), ("department", "day"))
+
+        for day in range(days):
+            waits = {key: summary for key, summary in day_severity_waits.items() if key[0] == day}
+            payload = {
+                "counters": [data[key][day] for key, _ in DAY_COUNTERS],
+                "conditions": dict(sorted(data["conditions_per_day"][day].items())),
+                "departments": dict(sorted(data["patients_per_department"][day].items())),
+                "waits_by_severity": self._waits(waits),
+            }
+            specs.append((f"day_{day + 1:03d}", "day", f"Day {day + 1}", payload))
+
+        stages = StageAnalytics(stats.db_name, stats.run_id).breakdown(("department",))
+        per_department = data["patients_per_department"]
+        departments = sorted({department for day in range(days) for department in per_department[day]})
+        for department in departments:
+            # Days are shown 1-based like everywhere else in the report
+            waits = {(day + 1,): summary for (name, day), summary in day_department_waits.items()
+                     if name == department}
+            breakdown = stages.get((department,), {})
+            payload = {
+                "patients_per_day": [per_department[day].get(department, 0) for day in range(days)],
+                "waits_by_day": self._waits(waits),
+                "stages": {stage: breakdown[stage] for stage in STAGES if stage in breakdown},
+            }
+            specs.append((f"department_{self.slug(department)}", "department", department, payload))
+
+        if stats.mci_day < days:
+            mci_departments = facts.counts(("department",), day=stats.mci_day, is_mci=True)
+            payload = {
+                "totals": [data["mci_patients"], data["mci_survivals"], data["mci_deaths"]],
+                "departments": {key[0]: count for key, count in sorted(mci_departments.items())},
+                "waits_by_severity": self._waits(facts.percentiles("wait_min", (50, 90), ("severity",),
+                                                                   day=stats.mci_day, is_mci=True)),
+            }
+            specs.append(("mci", "mci", f"Mass Casualty Incident (Day {stats.mci_day + 1})", payload))
+        return specs
+
+    @staticmethod
+    def fingerprint(kind, title, payload):
+        text = json.dumps([RENDER_VERSION, kind, title, payload], sort_keys=True, default=str)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.output_dir, MANIFEST_NAME), encoding="utf-8") as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError):
+            return {}
+
+    def build(self):
+        """Render changed figures in parallel and write index.html; returns its path."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        specs = self.figure_specs()
+        previous = self._load_manifest()
+
+        manifest, jobs = {}, []
+        for name, kind, title, payload in specs:
+            digest = self.fingerprint(kind, title, payload)
+            manifest[name] = digest
+            path = os.path.join(self.output_dir, f"{name}.png")
+            if previous.get(name) != digest or not os.path.exists(path):
+                jobs.append((kind, title, payload, path))
+
+        if jobs:
+            with Pool(min(self.processes, len(jobs))) as pool:
+                pool.starmap(render_figure, jobs)
+
+        with open(os.path.join(self.output_dir, MANIFEST_NAME), "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+
+        index_path = os.path.join(self.output_dir, "index.html")
+        with open(index_path, "w", encoding="utf-8") as index_file:
+            index_file.write(self.page(specs, manifest))
+
+        print(f"📄 HTML report written to {index_path} "
+              f"({len(jobs)} figures drawn, {len(specs) - len(jobs)} unchanged)")
+        return index_path
+
+    def page(self, specs, manifest):
+        """Assemble the static HTML page around the figures."""
+        sections = {"overview": [], "mci": [], "day": [], "department": []}
+        for name, kind, title, _ in specs:
+            # The hash in the URL keeps browsers from showing a stale cached image
+            title = html.escape(title)
+            sections[kind].append(f'<figure><img src="{name}.png?v={manifest[name][:12]}" alt="{title}">'
+                                  f'<figcaption>{title}</figcaption></figure>')
+
+        headings = (("overview", "Overview"), ("mci", "Mass Casualty Incident"), ("day", "Days"),
+                    ("department", "Departments"))
+        body = "".join(f'<h2 id="{kind}">{heading}</h2><div class="grid {kind}">{"".join(sections[kind])}</div>'
+                       for kind, heading in headings if sections[kind])
+        links = " | ".join(f'<a href="#{kind}">{heading}</a>' for kind, heading in headings if sections[kind])
+
+        return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Hospital Simulation Report - Run {self.stats.run_id}</title>
+<style>
+  body {{ font-family: sans-serif; margin: 20px; color: #222; }}
+  h2 {{ border-bottom: 1px solid #ccc; }}
+  .grid {{ display: flex; flex-wrap: wrap; gap: 16px; }}
+  .grid.day figure {{ width: 560px; }}
+  figure {{ margin: 0; }}
+  figure img {{ width: 100%; }}
+  .overview figure, .mci figure, .department figure {{ width: 100%; max-width: 1400px; }}
+  figcaption {{ font-size: 13px; color: #555; }}
+</style>
+</head>
+<body>
+<h1>🏥 Hospital Simulation Report - Run {self.stats.run_id}, {self.stats.days} days</h1>
+<p>{links}</p>
+{body}
+</body>
+</html>
+"""
@@ -0,0 +1,39 @@
+from threading import Event, Lock
+
+
+class InFlightCounter:
+    """Count patients that have arrived but not yet reached a final disposition."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.count = 0
+
+        # Set whenever no patient is in flight
+        self.drained = Event()
+        self.drained.set()
+
+    def arrived(self, count=1):
+        """Register patients entering the hospital."""
+        with self.lock:
+            self.count += count
+            if self.count > 0:
+                self.drained.clear()
+
+    def departed(self, count=1):
+        """Register patients leaving the hospital (discharged or dead)."""
+        with self.lock:
+            self.count -= count
+            if self.count < 0:
+                # More departures than arrivals means a patient was recorded twice
+                print(f"⚠️ In-flight patient count went negative ({self.count}), resetting to 0")
+                self.count = 0
+            if self.count == 0:
+                self.drained.set()
+
+    def wait_until_drained(self, timeout=None):
+        """Block until every patient in flight has left. Returns False on timeout."""
+        return self.drained.wait(timeout)
+
+    def __len__(self):
+        with self.lock:
+            return self.count
@@ -0,0 +1,47 @@
+from queue import Empty, Queue
+from time import perf_counter
+
+
+class LabAnalyzer:
+    """Sample queue for one kind of lab test, served in analyzer batches.
+
+    A batch starts with the first waiting sample and is run once it holds
+    batch_size samples or batch_timeout seconds have passed since that first
+    sample, whichever comes first. A batch size of 1 serves samples one by one.
+    """
+
+    def __init__(self, name, batch_size=1, batch_timeout=0.0):
+        self.name = name
+        self.batch_size = max(1, batch_size)
+        self.batch_timeout = batch_timeout
+        self.samples = Queue()
+
+    def submit(self, patient):
+        self.samples.put(patient)
+
+    def next_batch(self, timeout=0.5, fill_timeout=None):
+        """Return (batch of patients, seconds spent filling it).
+
+        The batch is empty if no sample arrived within `timeout`. `fill_timeout`
+        overrides batch_timeout, e.g. to scale it to the simulation speed.
+        """
+        fill_timeout = self.batch_timeout if fill_timeout is None else fill_timeout
+        try:
+            batch = [self.samples.get(timeout=timeout)]
+        except Empty:
+            return [], 0.0
+
+        # Fill the batch until it is full or the first sample has waited long enough
+        start = perf_counter()
+        while len(batch) < self.batch_size:
+            remaining = fill_timeout - (perf_counter() - start)
+            try:
+                batch.append(self.samples.get(timeout=remaining) if remaining > 0 else self.samples.get_nowait())
+            except Empty:
+                break
+        return batch, perf_counter() - start
+
+    def batch_done(self, batch):
+        """Mark a batch's samples as processed in the sample queue."""
+        for _ in batch:
+            self.samples.task_done()
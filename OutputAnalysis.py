@@ -0,0 +1,90 @@
+import numpy as np
+
+# Two-sided 95% Student t quantiles by degrees of freedom (larger samples use the normal quantile)
+T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+        12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042}
+
+
+def t_quantile(dof):
+    if dof > 30:
+        return 1.96
+    return T_95[max(d for d in T_95 if d <= dof)]
+
+
+def confidence_interval(values):
+    """Mean and 95% confidence half-width of independent observations."""
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return (float(values.mean()) if len(values) else 0.0), float("inf")
+    return float(values.mean()), float(t_quantile(len(values) - 1) * values.std(ddof=1) / np.sqrt(len(values)))
+
+
+def mser_truncation(values, batch_size=5):
+    """Number of leading observations to drop as warm-up, by the MSER-5 rule.
+
+    The series is cut into batch means of batch_size observations. For each
+    candidate cut d in the first half, MSER is the variance of the remaining
+    batch means divided by their count; the cut with the smallest MSER
+    balances dropping biased early values against keeping enough data.
+    """
+    values = np.asarray(values, dtype=float)
+    batches = len(values) // batch_size
+    means = values[:batches * batch_size].reshape(batches, batch_size).mean(axis=1)
+    return mser_batch_cut(means) * batch_size
+
+
+def mser_batch_cut(means):
+    """Number of leading batch means to drop by the MSER rule (see mser_truncation)."""
+    means = np.asarray(means, dtype=float)
+    batches = len(means)
+    if batches < 4:
+        return 0
+
+    # Sums over each tail z[d:], from the cumulative sums of the reversed series
+    tail_sums = np.cumsum(means[::-1])[::-1]
+    tail_squares = np.cumsum((means ** 2)[::-1])[::-1]
+    remaining = np.arange(batches, 0, -1)
+    mser = (tail_squares - tail_sums ** 2 / remaining) / remaining ** 2
+
+    return int(np.argmin(mser[:batches // 2 + 1]))
+
+
+def steady_state(values, batch_size=5):
+    """Drop the MSER warm-up from a series in arrival order; returns (kept values, dropped count)."""
+    dropped = mser_truncation(values, batch_size)
+    return list(values[dropped:]), dropped
+
+
+class SequentialStopping:
+    """Stopping rule for replications: stop once the 95% confidence interval is narrow enough.
+
+    The target is an absolute half_width, a relative_half_width (fraction of
+    the mean), or both (either one met stops). At least min_replications are
+    run before the rule is checked, and never more than max_replications.
+    """
+
+    def __init__(self, half_width=None, relative_half_width=None, min_replications=5, max_replications=100):
+        if half_width is None and relative_half_width is None:
+            raise ValueError("SequentialStopping needs a half_width or a relative_half_width")
+        self.half_width = half_width
+        self.relative_half_width = relative_half_width
+        self.min_replications = max(2, min_replications)
+        self.max_replications = max_replications
+        self.values = []
+
+    def add(self, value):
+        self.values.append(value)
+
+    def interval(self):
+        """(mean, half-width) of the values so far."""
+        return confidence_interval(self.values)
+
+    def precise(self):
+        if len(self.values) < self.min_replications:
+            return False
+        mean, half_width = self.interval()
+        return ((self.half_width is not None and half_width <= self.half_width)
+                or (self.relative_half_width is not None and half_width <= self.relative_half_width * abs(mean)))
+
+    def done(self):
+        return len(self.values) >= self.max_replications or self.precise()
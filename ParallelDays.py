@@ -0,0 +1,117 @@
+import os
+import random
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from multiprocessing import get_all_start_methods, get_context
+from time import time
+
+from HospitalSimulation import HospitalSimulation
+from Replication import CAPACITY_ARGUMENTS
+from Statistics import Statistics
+
+
+def simulate_day_shard(days, simulation_speed, day, mci_day, seed, settings, capacities, scheduler_options,
+                       shard_directory):
+    """Entry point of a day process: simulate one day into a database of its own.
+
+    Returns (day, shard database, run ID, elapsed seconds).
+    """
+    start = time()
+    random.seed(f"{seed}:{day}")
+
+    stats = Statistics(os.path.join(shard_directory, f"day_{day}.db"), days)
+    stats.mci_day = mci_day
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        simulation = HospitalSimulation(days, simulation_speed, stats=stats, settings=settings)
+        if capacities:
+            simulation.use_admission_control(**capacities)
+        if scheduler_options is not None:
+            simulation.use_staff_scheduler(**scheduler_options)
+        simulation.simulate_day(day)
+    stats.flush_patient_facts()
+    return day, stats.db_name, stats.run_id, time() - start
+
+
+def simulate_day_job(job):
+    return simulate_day_shard(*job)
+
+
+def day_process_context():
+    """Start day processes from a clean server process.
+
+    Forking this process directly would copy locks held by its other
+    threads (the pool's own handlers, the dashboard) into the child, where
+    they are never released.
+    """
+    if "forkserver" in get_all_start_methods():
+        context = get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return get_context("spawn")
+
+
+class ParallelDaysSimulation(HospitalSimulation):
+    """Hospital simulation that runs its days side by side in worker processes.
+
+    Days start with an empty hospital and share nothing but the statistics
+    and the MCI day, so each one runs in a fresh process with its own seed
+    (derived from the run seed and the day) and writes a database of its
+    own. Finished days are merged into this run's statistics as they come
+    in; the report and everything after it run on the merged store.
+    """
+
+    def __init__(self, days=7, simulation_speed=1.0, worker_processes=None, seed=None, stats=None, settings=None):
+        super().__init__(days, simulation_speed, stats=stats, settings=settings)
+        self.worker_processes = max(1, worker_processes or os.cpu_count() or 1)
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.staff_scheduler_options = None
+
+    def use_staff_scheduler(self, **options):
+        # Each day process builds its own scheduler from the same options
+        super().use_staff_scheduler(**options)
+        self.staff_scheduler_options = options
+
+    def day_settings(self):
+        """Settings a day process needs to rebuild this simulation."""
+        settings = {name: getattr(self, name) for name in self.SCENARIO_SETTINGS}
+        del settings["days"], settings["simulation_speed"]
+        settings.update(departments=self.departments, random_streams=self.random_streams)
+        return settings
+
+    def simulate_days(self):
+        """Simulate every day in worker processes and merge each finished day into the statistics."""
+        if self.arrival_trace is not None:
+            # A trace is read front to back, one day after the other
+            print("⚠️ Trace replay needs the days in order; simulating them one after another")
+            return super().simulate_days()
+
+        simulation_start = time()
+        capacities = {CAPACITY_ARGUMENTS[stage]: capacity for stage, capacity in self.admission.capacities.items()}
+        shard_directory = tempfile.mkdtemp(prefix="hospital_days_")
+        jobs = [(self.days, self.simulation_speed, day, self.stats.mci_day, self.seed, self.day_settings(),
+                 capacities, self.staff_scheduler_options, shard_directory) for day in range(self.days)]
+
+        # The MCI day takes longest, so it starts first
+        jobs.sort(key=lambda job: job[2] != self.stats.mci_day)
+
+        print(f"🧩 Simulating {self.days} days in {min(self.worker_processes, self.days)} processes "
+              f"(seed {self.seed})")
+        try:
+            # Leaving the pool stops days still running once the time limit is hit
+            with day_process_context().Pool(min(self.worker_processes, self.days), maxtasksperchild=1) as pool:
+                for day, db_name, run_id, elapsed in pool.imap_unordered(simulate_day_job, jobs):
+                    self.stats.merge_run(db_name, run_id)
+                    os.remove(db_name)
+                    print(f"✅ Day {day + 1} complete in {elapsed:.1f}s"
+                          + (" (Mass Casualty Incident day)" if day == self.stats.mci_day else ""))
+
+                    # Check for the optional wall-clock limit
+                    if self.max_runtime is not None and time() - simulation_start > self.max_runtime:
+                        print("⚠️ Simulation time limit reached, generating final statistics...")
+                        break
+        finally:
+            shutil.rmtree(shard_directory, ignore_errors=True)
+
+        # Signal simulation completion
+        self.simulation_complete.set()
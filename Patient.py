@@ -1,3 +1,6 @@
+import random
+
+
 class Patient:
     def __init__(self, name, arrival_time):
         self.name = name
@@ -10,7 +13,14 @@ class Patient:
         self.doctor_start_time = None
         self.doctor_end_time = None
         self.discharge_time = None
+        self.tests_ordered_time = None
+        self.tests_done_time = None
+        self.surgery_start_time = None
+        self.surgery_end_time = None
+        self.held_stages = []  # Capacity-limited stages the patient holds a slot in
+        self.pending_tests = set()  # Lab tests ordered but not finished yet
         self.dead = False
+        self.visit_failed = False  # The visit broke off with an error; the outcome is unknown
         self.had_surgery = False
         self.surgery_success = None
         self.had_blood_work = False
@@ -20,6 +30,7 @@ class Patient:
         self.came_by_ambulance = False
         self.waiting_time = 0
         self.is_mci_patient = False
+        self.rng = random  # Source of this patient's random draws: the shared generator or their own stream
 
     def __lt__(self, other):
         # For ER priority queue - higher severity patients come first
@@ -0,0 +1,255 @@
+import sqlite3
+from itertools import groupby
+
+
+# Columns of the fact table, in insert order
+FACT_COLUMNS = ("run_id", "day", "name", "department", "condition", "severity", "came_by_ambulance", "is_mci",
+                "had_blood_work", "had_xray", "had_surgery", "surgery_success", "had_code_blue",
+                "code_blue_success", "dead", "arrival_time", "registration_min", "assessment_min",
+                "doctor_start_min", "doctor_end_min", "discharge_min", "wait_min", "tests_ordered_min",
+                "tests_done_min", "surgery_start_min", "surgery_end_min")
+
+# Stage timestamps added after the first release of the table
+ADDED_FACT_COLUMNS = ("tests_ordered_min", "tests_done_min", "surgery_start_min", "surgery_end_min")
+
+# Numeric columns that can be summarized with percentiles
+METRICS = ("severity", "registration_min", "assessment_min", "doctor_start_min", "doctor_end_min",
+           "discharge_min", "wait_min", "tests_ordered_min", "tests_done_min", "surgery_start_min",
+           "surgery_end_min")
+
+# Columns that can be used to group or filter (flags are 0/1)
+DIMENSIONS = ("run_id", "day", "department", "condition", "severity", "came_by_ambulance", "is_mci",
+              "had_blood_work", "had_xray", "had_surgery", "surgery_success", "had_code_blue", "code_blue_success", "dead")
+
+# Report minutes per wall-clock second, as used for waiting times in Statistics
+MINUTES_PER_SECOND = 1800 / 60
+
+
+class PatientFactTable:
+    """Per-patient fact table with covering indexes and a grouped percentile/count query API.
+
+    Times are stored as report minutes after the patient's arrival, so
+    doctor_start_min is the waiting time and discharge_min the length of stay.
+    Queries are limited to this table's run unless run_id is passed as a filter.
+    """
+
+    def __init__(self, db_name, run_id=None):
+        self.db_name = db_name
+        self.run_id = run_id
+
+    @staticmethod
+    def create(cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS patient_facts (
+                id INTEGER PRIMARY KEY,
+                run_id INTEGER,
+                day INTEGER,
+                name TEXT,
+                department TEXT,
+                condition TEXT,
+                severity INTEGER,
+                came_by_ambulance INTEGER,
+                is_mci INTEGER,
+                had_blood_work INTEGER,
+                had_xray INTEGER,
+                had_surgery INTEGER,
+                surgery_success INTEGER,
+                had_code_blue INTEGER,
+                code_blue_success INTEGER,
+                dead INTEGER,
+                arrival_time REAL,
+                registration_min REAL,
+                assessment_min REAL,
+                doctor_start_min REAL,
+                doctor_end_min REAL,
+                discharge_min REAL,
+                wait_min REAL,
+                tests_ordered_min REAL,
+                tests_done_min REAL,
+                surgery_start_min REAL,
+                surgery_end_min REAL
+            )
+        """)
+
+        # Covering indexes for the usual slices within a run: by department and day, by day, and by acuity
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_facts_department
+            ON patient_facts (run_id, department, day, came_by_ambulance, is_mci, severity, wait_min)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_facts_day
+            ON patient_facts (run_id, day, severity, came_by_ambulance, department, wait_min)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_facts_severity
+            ON patient_facts (run_id, severity, came_by_ambulance, is_mci, wait_min)
+        """)
+
+    def row(self, day, patient):
+        """Build the fact row for a patient who has left the hospital."""
+        def minutes_after_arrival(timestamp):
+            if timestamp is None or patient.arrival_time is None:
+                return None
+            return (timestamp - patient.arrival_time) * MINUTES_PER_SECOND
+
+        def flag(value):
+            return None if value is None else int(bool(value))
+
+        return (self.run_id, day, patient.name, patient.department, patient.condition, patient.severity,
+                flag(patient.came_by_ambulance), flag(patient.is_mci_patient), flag(patient.had_blood_work),
+                flag(patient.had_xray), flag(patient.had_surgery), flag(patient.surgery_success),
+                flag(patient.had_code_blue), flag(patient.code_blue_success), flag(patient.dead),
+                patient.arrival_time, minutes_after_arrival(patient.registration_time),
+                minutes_after_arrival(patient.assessment_time), minutes_after_arrival(patient.doctor_start_time),
+                minutes_after_arrival(patient.doctor_end_time), minutes_after_arrival(patient.discharge_time),
+                minutes_after_arrival(patient.doctor_start_time), minutes_after_arrival(patient.tests_ordered_time),
+                minutes_after_arrival(patient.tests_done_time), minutes_after_arrival(patient.surgery_start_time),
+                minutes_after_arrival(patient.surgery_end_time))
+
+    @staticmethod
+    def insert(cursor, rows):
+        """Bulk insert fact rows with one executemany call."""
+        placeholders = ", ".join("?" for _ in FACT_COLUMNS)
+        cursor.executemany(f"INSERT INTO patient_facts ({', '.join(FACT_COLUMNS)}) VALUES ({placeholders})", rows)
+
+    def _where(self, filters):
+        """Translate keyword filters into a WHERE clause.
+
+        Dimension names match exactly (a list or tuple matches any of its
+        values); severity_min / severity_max bound the severity. run_id=None
+        queries every run.
+        """
+        filters = dict(filters)
+        filters.setdefault("run_id", self.run_id)
+        if filters["run_id"] is None:
+            del filters["run_id"]
+
+        clauses, params = [], []
+        for key, value in filters.items():
+            if key == "severity_min":
+                clauses.append("severity >= ?")
+                params.append(value)
+            elif key == "severity_max":
+                clauses.append("severity <= ?")
+                params.append(value)
+            elif key in DIMENSIONS:
+                if isinstance(value, (list, tuple, set)):
+                    clauses.append(f"{key} IN ({', '.join('?' for _ in value)})")
+                    params.extend(int(v) if isinstance(v, bool) else v for v in value)
+                else:
+                    clauses.append(f"{key} = ?")
+                    params.append(int(value) if isinstance(value, bool) else value)
+            else:
+                raise ValueError(f"Unknown patient fact filter: {key}")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    @staticmethod
+    def _check_columns(group_by, metric=None):
+        for column in group_by:
+            if column not in DIMENSIONS:
+                raise ValueError(f"Cannot group patient facts by {column}")
+        if metric is not None and metric not in METRICS:
+            raise ValueError(f"Unknown patient fact metric: {metric}")
+
+    def _connect(self):
+        return sqlite3.connect(f"file:{self.db_name}?mode=ro", uri=True)
+
+    def fetch(self, columns, **filters):
+        """Return the raw values of the given columns for the matching patients."""
+        for column in columns:
+            if column not in FACT_COLUMNS:
+                raise ValueError(f"Unknown patient fact column: {column}")
+        where, params = self._where(filters)
+
+        conn = self._connect()
+        try:
+            return conn.execute(f"SELECT {', '.join(columns)} FROM patient_facts{where}", params).fetchall()
+        finally:
+            conn.close()
+
+    def counts(self, group_by=(), **filters):
+        """Count patients per group, e.g. counts(["department"], dead=True)."""
+        group_by = list(group_by)
+        self._check_columns(group_by)
+        where, params = self._where(filters)
+        columns = ", ".join(group_by + ["COUNT(*)"])
+        group = f" GROUP BY {', '.join(group_by)}" if group_by else ""
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(f"SELECT {columns} FROM patient_facts{where}{group}", params).fetchall()
+        finally:
+            conn.close()
+        return {tuple(row[:-1]): row[-1] for row in rows}
+
+    def percentiles(self, metric="wait_min", percentiles=(50, 90), group_by=(), **filters):
+        """Percentiles of a metric per group.
+
+        Example: p90 wait for severity >= 8 ambulance patients in Cardiology
+        on the MCI day:
+            facts.percentiles("wait_min", [90], department="Cardiology",
+                              severity_min=8, came_by_ambulance=True, day=mci_day)
+
+        Returns {group tuple: {"count": n, "mean": m, "p50": ..., ...}}.
+        Values are read in index order, one group at a time, so only a
+        single group's values are in memory at once.
+        """
+        group_by = list(group_by)
+        self._check_columns(group_by, metric)
+        where, params = self._where(filters)
+        where += (" AND " if where else " WHERE ") + f"{metric} IS NOT NULL"
+        columns = ", ".join(group_by + [metric])
+        order = ", ".join(group_by + [metric])
+
+        results = {}
+        conn = self._connect()
+        try:
+            cursor = conn.execute(f"SELECT {columns} FROM patient_facts{where} ORDER BY {order}", params)
+            width = len(group_by)
+            for key, rows in groupby(cursor, key=lambda row: tuple(row[:width])):
+                values = [row[width] for row in rows]
+                summary = {"count": len(values), "mean": sum(values) / len(values)}
+                for p in percentiles:
+                    summary[f"p{p:g}"] = self.percentile(values, p)
+                results[key] = summary
+        finally:
+            conn.close()
+        return results
+
+    def batch_means(self, metric="wait_min", batch_size=5, max_batches=200, **filters):
+        """Each day's values of a metric in arrival order, summed into consecutive batches.
+
+        Batches hold batch_size patients, grown on busy days so no day has
+        more than max_batches. The sums are computed in SQL and read one day
+        at a time, so memory stays flat however long the run is.
+        Yields (day, day batch size, [(count, total) per batch]).
+        """
+        self._check_columns((), metric)
+        where, params = self._where(filters)
+        where += (" AND " if where else " WHERE ") + f"{metric} IS NOT NULL AND arrival_time IS NOT NULL"
+
+        conn = self._connect()
+        try:
+            days = conn.execute(f"SELECT day, COUNT(*) FROM patient_facts{where} GROUP BY day ORDER BY day",
+                                params).fetchall()
+            for day, count in days:
+                day_batch_size = max(batch_size, -(-count // max_batches))
+                batches = conn.execute(f"""
+                    SELECT COUNT(*), SUM({metric}) FROM (
+                        SELECT {metric}, (ROW_NUMBER() OVER (ORDER BY arrival_time, id) - 1) / ? AS batch
+                        FROM patient_facts{where} AND day = ?
+                    ) GROUP BY batch ORDER BY batch
+                """, [day_batch_size] + params + [day]).fetchall()
+                yield day, day_batch_size, batches
+        finally:
+            conn.close()
+
+    @staticmethod
+    def percentile(sorted_values, p):
+        """Linearly interpolated percentile of an already sorted list."""
+        if not sorted_values:
+            return None
+        position = (len(sorted_values) - 1) * p / 100
+        lower = int(position)
+        upper = min(lower + 1, len(sorted_values) - 1)
+        return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
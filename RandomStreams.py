@@ -0,0 +1,41 @@
+from random import Random
+
+
+class PatientRandom(Random):
+    """Random number stream of one patient.
+
+    Every draw, including randint() and choice(), is made from a single
+    uniform U, so an antithetic stream (which returns 1 - U instead of U)
+    mirrors all of the patient's service times and outcomes.
+    """
+
+    def __init__(self, seed, antithetic=False):
+        self.antithetic = antithetic
+        super().__init__(seed)
+
+    def random(self):
+        u = super().random()
+        return 1.0 - u if self.antithetic else u
+
+    def randint(self, a, b):
+        return a + min(int(self.random() * (b - a + 1)), b - a)
+
+    def choice(self, seq):
+        return seq[min(int(self.random() * len(seq)), len(seq) - 1)]
+
+
+class RandomStreams:
+    """Per-patient random number streams for common random numbers.
+
+    A patient's stream is seeded from the run seed and a key naming the
+    arrival (e.g. the 12th walk-in of day 3), so the same patient gets the
+    same draws in every configuration run with the same seed, whatever order
+    the worker threads happen to run in.
+    """
+
+    def __init__(self, seed, antithetic=False):
+        self.seed = seed
+        self.antithetic = antithetic
+
+    def for_patient(self, *key):
+        return PatientRandom(":".join(map(str, (self.seed,) + key)), self.antithetic)
@@ -0,0 +1,519 @@
+import argparse
+import ipaddress
+import os
+import random
+import secrets
+import socket
+from collections import Counter, deque
+from contextlib import redirect_stdout
+from itertools import count, groupby
+from multiprocessing import Process
+from multiprocessing.managers import BaseManager
+from threading import Event, Lock, Thread
+from time import sleep, time
+
+import numpy as np
+
+from HospitalSimulation import HospitalSimulation
+from OutputAnalysis import SequentialStopping, steady_state
+from PatientFacts import MINUTES_PER_SECOND
+from ResultCache import ResultCache
+from Statistics import Statistics
+
+# Keyword arguments of use_admission_control() for each limited stage
+CAPACITY_ARGUMENTS = {"ER beds": "er_beds", "Surgical beds": "surgical_beds", "Lab backlog": "lab_backlog",
+                      "Waiting room": "waiting_room"}
+
+# Only for coordinators on the loopback interface; anything reachable from other machines needs a key of its own
+DEFAULT_AUTHKEY = b"hospital-replications"
+
+
+def is_loopback(host):
+    """Whether `host` only accepts connections from this machine."""
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+class ReplicationStats:
+    """Statistics stand-in that keeps a replication's totals in memory instead of a database."""
+
+    def __init__(self, days, mci_day=None):
+        self.days = days
+        self.mci_day = mci_day if mci_day is not None else random.randint(0, days - 1)
+        self.lock = Lock()
+        self.run_id = None
+        self.db_name = None
+
+        self.totals = Counter()
+        self.waits = []             # (day, arrival_time, wait in minutes)
+        self.event_waits = {}
+        self.utilization = {}
+        self.reassignments = 0
+
+    def record_visits(self, day, patients):
+        with self.lock:
+            self.totals["total_visits"] += len(patients)
+            for column, counts in Statistics.VISIT_COUNTERS:
+                self.totals[column] += sum(1 for patient in patients if counts(patient))
+            self.waits.extend((day, patient.arrival_time,
+                               (patient.doctor_start_time - patient.arrival_time) * MINUTES_PER_SECOND)
+                              for patient in patients if patient.doctor_start_time and patient.arrival_time)
+
+    def record_mci_patients(self, patients):
+        with self.lock:
+            self.totals["mci_patients"] += len(patients)
+            self.totals["mci_deaths"] += sum(1 for patient in patients if patient.dead)
+
+    def record_event_wait(self, day, event, wait_seconds):
+        wait = wait_seconds * MINUTES_PER_SECOND
+        with self.lock:
+            waits = self.event_waits.setdefault(event, {"count": 0, "total_wait": 0.0, "max_wait": 0.0})
+            waits["count"] += 1
+            waits["total_wait"] += wait
+            waits["max_wait"] = max(waits["max_wait"], wait)
+
+    def record_resource_utilization(self, day, reports):
+        with self.lock:
+            for report in reports:
+                self.utilization.setdefault(report["resource"], []).append(report["utilization"])
+
+    def record_reassignment(self, day, action, source, target, queue_depth, longest_wait):
+        with self.lock:
+            self.reassignments += action == "lend"
+
+    def set_scenario(self, scenario):
+        pass
+
+    def flush_patient_facts(self):
+        pass
+
+    def finish_run(self):
+        pass
+
+    def steady_state_waits(self):
+        """Waits with each day's MSER warm-up dropped, like Statistics.steady_state_waits()."""
+        kept, dropped = [], 0
+        for _, day_waits in groupby(sorted(self.waits), key=lambda wait: wait[0]):
+            waits, day_dropped = steady_state([wait for _, _, wait in day_waits])
+            kept.extend(waits)
+            dropped += day_dropped
+        return {"count": len(kept), "mean": float(np.mean(kept)) if kept else 0.0, "dropped": dropped}
+
+    def summary(self):
+        """Compact result summary: totals, wait percentiles, steady-state wait, event waits and mean utilization."""
+        with self.lock:
+            waits = np.array([wait for _, _, wait in self.waits])
+            summary = dict(self.totals)
+            summary.update({
+                "mci_day": self.mci_day,
+                "waits": {"count": len(waits), "mean": float(waits.mean()) if len(waits) else 0.0,
+                          **{f"p{q}": float(np.percentile(waits, q)) if len(waits) else 0.0 for q in (50, 90, 99)},
+                          "max": float(waits.max()) if len(waits) else 0.0},
+                "steady_waits": self.steady_state_waits(),
+                "event_waits": {event: dict(waits) for event, waits in self.event_waits.items()},
+                "utilization": {resource: sum(values) / len(values) for resource, values in self.utilization.items()},
+                "staff_loans": self.reassignments,
+            })
+            return summary
+
+
+def run_replication(scenario, seed):
+    """Run one headless replication of `scenario` with `seed`; returns its result summary.
+
+    `scenario` holds HospitalSimulation settings (as returned by scenario());
+    output goes to os.devnull and statistics stay in memory. With
+    "common_random_numbers" set, patients draw from per-patient streams of
+    `seed` ("antithetic" mirrors them).
+    """
+    random.seed(seed)
+    scenario = dict(scenario)
+    days = scenario.pop("days", 1)
+    simulation_speed = scenario.pop("simulation_speed", 100.0)
+    capacities = scenario.pop("capacities", None) or {}
+    settings = {name: value for name, value in scenario.items() if name in HospitalSimulation.SCENARIO_SETTINGS}
+    if isinstance(scenario.get("departments"), dict):
+        settings["departments"] = scenario["departments"]
+
+    stats = ReplicationStats(days, scenario.get("mci_day"))
+    start = time()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        simulation = HospitalSimulation(days, simulation_speed, stats=stats, settings=settings)
+        if scenario.get("common_random_numbers"):
+            simulation.use_common_random_numbers(seed, scenario.get("antithetic", False))
+        if capacities:
+            simulation.use_admission_control(**{CAPACITY_ARGUMENTS[stage]: capacity
+                                                for stage, capacity in capacities.items()})
+        simulation.simulate_days()
+
+    summary = stats.summary()
+    summary.update({"seed": seed, "days": days, "elapsed": time() - start})
+    return summary
+
+
+def steady_mean_wait(summary):
+    """Average wait after the warm-up, the default metric for sequential stopping."""
+    return summary["steady_waits"]["mean"]
+
+
+def run_sequential(scenario, stopping, metric=steady_mean_wait, seeds=None, cache=None):
+    """Run replications of `scenario` one after another until `stopping` (a SequentialStopping) is done.
+
+    Returns ({seed: summary}, stopping).
+    """
+    results = {}
+    for seed in seeds if seeds is not None else count():
+        if stopping.done():
+            break
+        if cache is not None:
+            summary = cache.get_or_run(scenario, seed, run_replication)
+        else:
+            summary = run_replication(scenario, seed)
+        results[seed] = summary
+        stopping.add(metric(summary))
+    return results, stopping
+
+
+class JobBoard:
+    """Replication jobs shared with the workers through the coordinator's manager server.
+
+    A worker leases a job when it takes it and renews the lease while the
+    job runs. A job whose lease runs out (the worker died or lost its
+    connection) goes back to the queue, and so does a job that failed, up to
+    max_attempts times. Late results of a requeued job are ignored.
+    """
+
+    def __init__(self, lease_timeout=60.0, max_attempts=3):
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.lock = Lock()
+        self.job_ids = count()
+        self.jobs = {}          # job_id -> (scenario, seed)
+        self.pending = deque()
+        self.leases = {}        # job_id -> (worker, expires)
+        self.attempts = Counter()
+        self.results = {}
+        self.failures = {}      # job_id -> last error, for jobs that ran out of attempts
+        self.closed = False
+
+    def add(self, scenario, seed, summary=None):
+        """Add a job; one with a known `summary` (from the result cache) is done right away."""
+        with self.lock:
+            job_id = next(self.job_ids)
+            self.jobs[job_id] = (scenario, seed)
+            if summary is None:
+                self.pending.append(job_id)
+            else:
+                self.results[job_id] = summary
+            return job_id
+
+    def cancel_pending(self):
+        """Drop the jobs no worker has taken yet; returns how many were dropped."""
+        with self.lock:
+            cancelled = [job_id for job_id in self.pending if job_id not in self.results and job_id in self.jobs]
+            for job_id in cancelled:
+                del self.jobs[job_id]
+            self.pending.clear()
+            return len(cancelled)
+
+    def close(self):
+        """No more jobs will be added; idle workers exit once the queue is empty."""
+        with self.lock:
+            self.closed = True
+
+    def _requeue_expired(self, now):
+        for job_id, (worker, expires) in list(self.leases.items()):
+            if expires < now:
+                del self.leases[job_id]
+                self.pending.appendleft(job_id)
+                print(f"⚠️ Lease on job {job_id} held by {worker} expired, job requeued")
+
+    def take(self, worker):
+        """Lease the next job to `worker`: returns (job_id, scenario, seed), or None if nothing is waiting."""
+        with self.lock:
+            now = time()
+            self._requeue_expired(now)
+            while self.pending:
+                job_id = self.pending.popleft()
+                if job_id in self.results or job_id in self.failures or job_id not in self.jobs:
+                    continue
+                self.leases[job_id] = (worker, now + self.lease_timeout)
+                self.attempts[job_id] += 1
+                scenario, seed = self.jobs[job_id]
+                return job_id, scenario, seed
+            return None
+
+    def renew(self, worker, job_id):
+        """Extend a running job's lease; returns False if the job was taken away from `worker`."""
+        with self.lock:
+            if self.leases.get(job_id, (None,))[0] != worker:
+                return False
+            self.leases[job_id] = (worker, time() + self.lease_timeout)
+            return True
+
+    def finish(self, worker, job_id, summary):
+        with self.lock:
+            if self.leases.get(job_id, (None,))[0] == worker:
+                del self.leases[job_id]
+            if job_id not in self.results:
+                self.results[job_id] = summary
+
+    def fail(self, worker, job_id, error):
+        with self.lock:
+            if self.leases.get(job_id, (None,))[0] != worker:
+                return
+            del self.leases[job_id]
+            if self.attempts[job_id] >= self.max_attempts:
+                self.failures[job_id] = error
+            else:
+                self.pending.append(job_id)
+
+    def finished(self):
+        """True once the board is closed and every job has a result or ran out of attempts."""
+        with self.lock:
+            self._requeue_expired(time())
+            return self.closed and len(self.results) + len(self.failures) == len(self.jobs)
+
+    def lease_length(self):
+        return self.lease_timeout
+
+    def progress(self):
+        with self.lock:
+            return {"jobs": len(self.jobs), "done": len(self.results), "failed": len(self.failures),
+                    "running": len(self.leases), "pending": len(self.pending)}
+
+
+class ReplicationManager(BaseManager):
+    """Manager used by workers to reach a coordinator's job board."""
+
+
+ReplicationManager.register("board")
+
+
+def run_worker(address, authkey=DEFAULT_AUTHKEY, name=None, poll_interval=0.5):
+    """Run jobs from the coordinator at `address` until it has none left; returns the number run."""
+    name = name or f"{socket.gethostname()}:{os.getpid()}"
+    manager = ReplicationManager(address=tuple(address), authkey=authkey)
+    manager.connect()
+    board = manager.board()
+    renew_interval = board.lease_length() / 3
+
+    jobs_run = 0
+    while True:
+        try:
+            job = board.take(name)
+            if job is None:
+                if board.finished():
+                    return jobs_run
+                sleep(poll_interval)
+                continue
+        except (EOFError, ConnectionError):
+            # The coordinator is gone
+            return jobs_run
+
+        job_id, scenario, seed = job
+        done = Event()
+        renewer = Thread(target=renew_lease, args=(address, authkey, name, job_id, done, renew_interval),
+                         daemon=True)
+        renewer.start()
+        try:
+            summary = run_replication(scenario, seed)
+        except Exception as error:
+            done.set()
+            board.fail(name, job_id, repr(error))
+            continue
+        done.set()
+        board.finish(name, job_id, summary)
+        jobs_run += 1
+
+
+def renew_lease(address, authkey, name, job_id, done, interval=5.0):
+    """Keep renewing a job's lease until `done` is set (runs next to the replication)."""
+    manager = ReplicationManager(address=tuple(address), authkey=authkey)
+    manager.connect()
+    board = manager.board()
+    while not done.wait(interval):
+        try:
+            if not board.renew(name, job_id):
+                return
+        except (EOFError, ConnectionError):
+            return
+
+
+class ReplicationCluster:
+    """Coordinator handing (scenario, seed) replication jobs to workers over TCP.
+
+    The job board is served by a multiprocessing manager running in a thread
+    of the coordinator process. Workers on any machine connect with
+    run_worker(address, authkey); start_local_workers() starts some on this
+    machine.
+    """
+
+    def __init__(self, address=("127.0.0.1", 0), authkey=DEFAULT_AUTHKEY, lease_timeout=60.0, max_attempts=3,
+                 cache=None):
+        # The manager unpickles what clients send, so anyone holding the key can run code here
+        if authkey == DEFAULT_AUTHKEY and not is_loopback(address[0]):
+            raise ValueError("A coordinator reachable from other machines needs its own authkey")
+        self.authkey = authkey
+        self.board = JobBoard(lease_timeout, max_attempts)
+        self.cache = cache          # ResultCache serving repeated (scenario, seed) jobs, or None
+        self.cached_jobs = set()
+
+        # A manager class of its own, so several clusters can live in one process
+        manager_class = type("ClusterManager", (BaseManager,), {})
+        manager_class.register("board", callable=lambda: self.board)
+        self.server = manager_class(address=tuple(address), authkey=authkey).get_server()
+        self.address = self.server.address
+        self.workers = []
+
+    def start(self):
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"🛰️ Replication coordinator listening on {self.address[0]}:{self.address[1]}")
+        return self
+
+    def submit(self, scenario, seeds):
+        """Queue one replication of `scenario` per seed; returns the job ids.
+
+        Seeds with a summary in the result cache are not run again.
+        """
+        job_ids = []
+        for seed in seeds:
+            summary = self.cache.get(scenario, seed) if self.cache is not None else None
+            job_id = self.board.add(scenario, seed, summary)
+            if summary is not None:
+                self.cached_jobs.add(job_id)
+            job_ids.append(job_id)
+        return job_ids
+
+    def run_sequential(self, scenario, stopping, metric=steady_mean_wait, seeds=None, parallel=4,
+                       poll_interval=0.5):
+        """Keep `parallel` replications of `scenario` queued until `stopping` (a SequentialStopping) is done.
+
+        Results feed the rule in the order they finish. Once it is done no
+        more jobs are queued, waiting ones are dropped and the running ones
+        are waited for. Returns ({job_id: summary}, {job_id: error}, stopping).
+        """
+        seeds = iter(seeds if seeds is not None else count())
+        submitted = counted = 0
+        seen = set()
+        while not stopping.done():
+            # Top the queue up without queueing more than the rule could still need
+            outstanding = submitted - counted
+            wanted = min(parallel - outstanding, stopping.max_replications - submitted)
+            for _ in range(max(0, wanted)):
+                seed = next(seeds, None)
+                if seed is None:
+                    break
+                self.submit(scenario, [seed])
+                submitted += 1
+            if submitted == counted:
+                break
+
+            sleep(poll_interval)
+            results, failures = dict(self.board.results), dict(self.board.failures)
+            for job_id in sorted(results.keys() - seen):
+                stopping.add(metric(results[job_id]))
+            counted += len((results.keys() | failures.keys()) - seen)
+            seen |= results.keys() | failures.keys()
+
+        dropped = self.board.cancel_pending()
+        mean, half_width = stopping.interval()
+        print(f"🎯 Stopped after {len(stopping.values)} replications: {mean:.2f} ± {half_width:.2f}"
+              + (f" ({dropped} queued replications dropped)" if dropped else ""))
+        results, failures = self.wait(poll_interval)
+        return results, failures, stopping
+
+    def start_local_workers(self, count):
+        """Start `count` worker processes on this machine."""
+        for i in range(count):
+            process = Process(target=run_worker, args=(self.address, self.authkey, f"local-{i}"), daemon=True)
+            process.start()
+            self.workers.append(process)
+        return self.workers
+
+    def wait(self, poll_interval=1.0, timeout=None):
+        """Close the board and wait for every job; returns ({job_id: summary}, {job_id: error})."""
+        self.board.close()
+        start = time()
+        reported = None
+        while not self.board.finished():
+            if timeout is not None and time() - start > timeout:
+                break
+            progress = self.board.progress()
+            if progress != reported:
+                print(f"⏳ {progress['done']}/{progress['jobs']} replications done, {progress['running']} running, "
+                      f"{progress['pending']} waiting, {progress['failed']} failed")
+                reported = progress
+            sleep(poll_interval)
+
+        for process in self.workers:
+            process.join(timeout=poll_interval)
+
+        results = dict(self.board.results)
+        if self.cache is not None:
+            served = len(self.cached_jobs & results.keys())
+            for job_id, summary in results.items():
+                if job_id not in self.cached_jobs:
+                    self.cache.put(*self.board.jobs[job_id], summary)
+                    self.cached_jobs.add(job_id)
+            print(f"🗄️ {served} of {len(results)} replications served from the result cache")
+        return results, dict(self.board.failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run hospital simulation replications on several machines.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    coordinator = subcommands.add_parser("coordinator", help="hand out replications and collect the results")
+    coordinator.add_argument("--host", default="127.0.0.1", help="interface to listen on (0.0.0.0 for every one)")
+    coordinator.add_argument("--port", type=int, default=50000)
+    coordinator.add_argument("--replications", type=int, default=10, help="replications (the cap with a target)")
+    coordinator.add_argument("--days", type=int, default=1)
+    coordinator.add_argument("--local-workers", type=int, default=0)
+    coordinator.add_argument("--cache-dir", default=".result_cache", help="result cache directory")
+    coordinator.add_argument("--no-cache", action="store_true", help="run every replication even if cached")
+    coordinator.add_argument("--half-width", type=float, help="stop once the steady-state wait CI is this narrow (min)")
+    coordinator.add_argument("--relative-half-width", type=float, help="... or this fraction of the mean")
+    coordinator.add_argument("--parallel", type=int, default=4, help="replications queued at once with a target")
+
+    worker = subcommands.add_parser("worker", help="run replications for a coordinator")
+    worker.add_argument("address", help="coordinator HOST:PORT")
+
+    arguments = parser.parse_args()
+    authkey = os.environ.get("REPLICATION_AUTHKEY", DEFAULT_AUTHKEY.decode()).encode()
+
+    if arguments.command == "worker":
+        host, port = arguments.address.rsplit(":", 1)
+        print(f"🔧 Worker finished after {run_worker((host, int(port)), authkey)} replications")
+        return
+
+    # Listening beyond this machine takes a secret key; make one up if none was given
+    if "REPLICATION_AUTHKEY" not in os.environ and not is_loopback(arguments.host):
+        authkey = secrets.token_hex(16).encode()
+        print(f"🔑 No REPLICATION_AUTHKEY set; workers need REPLICATION_AUTHKEY={authkey.decode()}")
+
+    cache = None if arguments.no_cache else ResultCache(arguments.cache_dir)
+    cluster = ReplicationCluster((arguments.host, arguments.port), authkey, cache=cache).start()
+    scenario = {"days": arguments.days, "simulation_speed": 100.0}
+    cluster.start_local_workers(arguments.local_workers)
+    if arguments.half_width is not None or arguments.relative_half_width is not None:
+        stopping = SequentialStopping(arguments.half_width, arguments.relative_half_width,
+                                      max_replications=arguments.replications)
+        results, failures, _ = cluster.run_sequential(scenario, stopping, parallel=arguments.parallel)
+    else:
+        cluster.submit(scenario, range(arguments.replications))
+        results, failures = cluster.wait()
+
+    visits = [summary["total_visits"] for summary in results.values()]
+    waits = [summary["waits"]["mean"] for summary in results.values()]
+    steady_waits = [steady_mean_wait(summary) for summary in results.values()]
+    print(f"\n=== {len(results)} Replications ({len(failures)} failed) ===")
+    if results:
+        print(f"Visits per replication: {np.mean(visits):.1f} ± {np.std(visits):.1f}")
+        print(f"Average wait: {np.mean(waits):.1f} ± {np.std(waits):.1f} minutes")
+        print(f"Average wait after warm-up: {np.mean(steady_waits):.1f} ± {np.std(steady_waits):.1f} minutes")
+
+
+if __name__ == "__main__":
+    main()
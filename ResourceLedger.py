@@ -0,0 +1,192 @@
+from bisect import bisect_right
+from threading import Lock, Semaphore
+from time import perf_counter
+
+
+# Upper bounds (seconds) of the acquire wait-time histogram buckets
+WAIT_BUCKETS = (0.001, 0.01, 0.1, 1.0, 10.0)
+WAIT_BUCKET_LABELS = ("<1ms", "1-10ms", "10-100ms", "0.1-1s", "1-10s", ">10s")
+
+
+class InstrumentedSemaphore:
+    """Drop-in Semaphore wrapper that keeps a busy/wait ledger for one resource."""
+
+    def __init__(self, name, value=1, primitive=None):
+        self.name = name
+        self.capacity = value
+        self._primitive = primitive if primitive is not None else Semaphore(value)
+
+        # Called after every release, e.g. to wake threads that need this and another resource
+        self.on_release = None
+
+        # Protects the counters below; never held while blocking on the resource
+        self._ledger_lock = Lock()
+        self.in_use = 0
+        self.waiting = 0
+        self._reset(perf_counter())
+
+    def _reset(self, now):
+        self._window_start = now
+        self._last_change = now
+        self.busy_time = 0.0        # integral of units in use over time
+        self.queue_time = 0.0       # integral of waiting threads over time
+        self.peak_in_use = self.in_use
+        self.peak_waiting = self.waiting
+        self.acquisitions = 0
+        self.failed_acquires = 0    # non-blocking attempts or timeouts that got nothing
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.wait_histogram = [0] * len(WAIT_BUCKET_LABELS)
+        self.unmatched_releases = 0
+
+    def _advance(self, now):
+        elapsed = now - self._last_change
+        self.busy_time += elapsed * self.in_use
+        self.queue_time += elapsed * self.waiting
+        self._last_change = now
+
+    def _record_acquired(self, now, wait):
+        self._advance(now)
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        self.acquisitions += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.wait_histogram[bisect_right(WAIT_BUCKETS, wait)] += 1
+
+    def acquire(self, blocking=True, timeout=None):
+        # Fast path: the resource is free, no waiting to account for
+        if self._primitive.acquire(False):
+            with self._ledger_lock:
+                self._record_acquired(perf_counter(), 0.0)
+            return True
+
+        if not blocking:
+            with self._ledger_lock:
+                self.failed_acquires += 1
+            return False
+
+        start = perf_counter()
+        with self._ledger_lock:
+            self._advance(start)
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+
+        acquired = False
+        try:
+            if timeout is None:
+                acquired = self._primitive.acquire()
+            else:
+                acquired = self._primitive.acquire(True, timeout)
+        finally:
+            now = perf_counter()
+            with self._ledger_lock:
+                self._advance(now)
+                self.waiting -= 1
+                if acquired:
+                    self._record_acquired(now, now - start)
+                else:
+                    self.failed_acquires += 1
+        return acquired
+
+    def release(self, n=1):
+        with self._ledger_lock:
+            self._advance(perf_counter())
+            for _ in range(n):
+                if self.in_use > 0:
+                    self.in_use -= 1
+                else:
+                    # Released more often than acquired: capacity is leaking upward
+                    self.unmatched_releases += 1
+
+        if n == 1:
+            self._primitive.release()
+        else:
+            self._primitive.release(n)
+        if self.on_release is not None:
+            self.on_release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def snapshot(self, reset=False):
+        """Summarize the ledger since the last reset, optionally starting a new window."""
+        with self._ledger_lock:
+            now = perf_counter()
+            self._advance(now)
+            elapsed = now - self._window_start
+
+            capacity_time = self.capacity * elapsed
+            report = {
+                "resource": self.name,
+                "capacity": self.capacity,
+                "elapsed": elapsed,
+                "utilization": self.busy_time / capacity_time if capacity_time > 0 else 0.0,
+                "avg_in_use": self.busy_time / elapsed if elapsed > 0 else 0.0,
+                "peak_in_use": self.peak_in_use,
+                "avg_queue_length": self.queue_time / elapsed if elapsed > 0 else 0.0,
+                "peak_queue_length": self.peak_waiting,
+                "acquisitions": self.acquisitions,
+                "failed_acquires": self.failed_acquires,
+                "avg_wait": self.total_wait / self.acquisitions if self.acquisitions else 0.0,
+                "max_wait": self.max_wait,
+                "wait_histogram": dict(zip(WAIT_BUCKET_LABELS, self.wait_histogram)),
+                "unmatched_releases": self.unmatched_releases,
+            }
+
+            if reset:
+                self._reset(now)
+        return report
+
+
+class InstrumentedLock(InstrumentedSemaphore):
+    """Drop-in Lock wrapper with the same ledger as InstrumentedSemaphore."""
+
+    def __init__(self, name):
+        super().__init__(name, 1, primitive=Lock())
+
+    def release(self, n=1):
+        with self._ledger_lock:
+            self._advance(perf_counter())
+            if self.in_use > 0:
+                self.in_use -= 1
+            else:
+                self.unmatched_releases += 1
+
+        # A plain Lock still raises on release of an unlocked lock
+        self._primitive.release()
+
+    def locked(self):
+        return self._primitive.locked()
+
+
+class ResourceLedger:
+    """Registry of instrumented resources that produces per-day utilization reports."""
+
+    def __init__(self):
+        self.resources = []
+
+    def semaphore(self, name, value=1):
+        resource = InstrumentedSemaphore(name, value)
+        self.resources.append(resource)
+        return resource
+
+    def lock(self, name):
+        resource = InstrumentedLock(name)
+        self.resources.append(resource)
+        return resource
+
+    def start_window(self):
+        """Discard what was measured so far and start a fresh reporting window."""
+        for resource in self.resources:
+            resource.snapshot(reset=True)
+
+    def collect(self, reset=True):
+        """Return one report per resource, busiest first."""
+        reports = [resource.snapshot(reset=reset) for resource in self.resources]
+        reports.sort(key=lambda report: report["utilization"], reverse=True)
+        return reports
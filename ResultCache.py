@@ -0,0 +1,112 @@
+import glob
+import hashlib
+import json
+import os
+from threading import Lock
+
+# Source files whose contents make up the code version
+CODE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+_code_version = None
+
+
+def code_version():
+    """Hash of every module of the simulation, so a code change invalidates cached results."""
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(CODE_DIRECTORY, "*.py"))):
+            digest.update(os.path.basename(path).encode())
+            with open(path, "rb") as source:
+                digest.update(source.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+class ResultCache:
+    """On-disk cache of replication summaries, addressed by a hash of scenario, seed and code version.
+
+    Each summary is a JSON file named after its key. A read refreshes the
+    file's modification time, and once the cache grows past max_bytes the
+    least recently used files are removed. Several processes can share a
+    directory: files are written to a temporary name and renamed into place.
+    """
+
+    def __init__(self, directory=".result_cache", max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(os.path.getsize(path) for path in self._files())
+
+    @staticmethod
+    def key(scenario, seed):
+        document = json.dumps({"scenario": scenario, "seed": seed, "code": code_version()},
+                              sort_keys=True, default=str)
+        return hashlib.sha256(document.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _files(self):
+        return glob.glob(os.path.join(self.directory, "*", "*.json"))
+
+    def get(self, scenario, seed):
+        """Return the cached summary of (scenario, seed), or None."""
+        path = self._path(self.key(scenario, seed))
+        try:
+            with open(path) as file:
+                summary = json.load(file)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return summary
+
+    def put(self, scenario, seed, summary):
+        path = self._path(self.key(scenario, seed))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(summary, file)
+        size = os.path.getsize(temporary)
+        os.replace(temporary, path)
+
+        with self.lock:
+            self.size += size
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Remove least recently used summaries until the cache is under 90% of max_bytes."""
+        entries = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+
+    def get_or_run(self, scenario, seed, run):
+        """Return the cached summary of (scenario, seed), running run(scenario, seed) on a miss."""
+        summary = self.get(scenario, seed)
+        if summary is None:
+            summary = run(scenario, seed)
+            self.put(scenario, seed, summary)
+        return summary
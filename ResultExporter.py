@@ -0,0 +1,191 @@
+import csv
+import os
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet export is optional
+    pyarrow = None
+
+
+# Tables exported for a run; all of them carry a run_id column
+EXPORT_TABLES = ("runs", "daily_stats", "conditions", "mci_stats", "daily_waits", "patients_per_department",
+                 "event_waits", "resource_utilization", "patient_facts")
+
+EXPORT_FORMATS = ("npz", "csv", "parquet")
+
+
+class ResultExporter:
+    """Stream one run's stats tables and patient facts out in columnar form.
+
+    Rows are read in chunks of chunk_rows, so memory use does not grow with
+    the size of the run. NPZ files hold one array per column (NULL becomes
+    NaN in numeric columns and "" in text columns); Parquet needs pyarrow.
+    """
+
+    CHUNK_ROWS = 50000
+
+    def __init__(self, db_name, run_id, output_dir="exports", chunk_rows=None):
+        self.db_name = db_name
+        self.run_id = run_id
+        self.output_dir = output_dir
+        self.chunk_rows = chunk_rows or self.CHUNK_ROWS
+
+    def _connect(self):
+        return sqlite3.connect(f"file:{self.db_name}?mode=ro", uri=True)
+
+    def _path(self, table, extension):
+        return os.path.join(self.output_dir, f"run{self.run_id}_{table}.{extension}")
+
+    def _columns(self, conn, table):
+        """Return (name, kind) pairs where kind is "int", "float" or "text"."""
+        columns = []
+        for _, name, declared, _, _, _ in conn.execute(f"PRAGMA table_info({table})"):
+            declared = declared.upper()
+            if "INT" in declared:
+                kind = "int"
+            elif "REAL" in declared:
+                kind = "float"
+            else:
+                kind = "text"
+            columns.append((name, kind))
+        return columns
+
+    def _run_filter(self, conn, table):
+        """WHERE clause that reads the run's rows as a rowid range scan.
+
+        A run's rows are inserted together, so scanning its rowid range in
+        table order avoids both a full table scan and sorting the index
+        matches; the unary + keeps SQLite from using a run_id index instead.
+        """
+        first, last = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table} WHERE run_id = ?",
+                                   (self.run_id,)).fetchone()
+        return "WHERE rowid BETWEEN ? AND ? AND +run_id = ?", (first or 0, last or 0, self.run_id)
+
+    def _chunks(self, conn, table, columns):
+        """Yield lists of row tuples for this run, chunk_rows at a time."""
+        names = ", ".join(name for name, _ in columns)
+        where, params = self._run_filter(conn, table)
+        cursor = conn.execute(f"SELECT {names} FROM {table} {where} ORDER BY rowid", params)
+        while True:
+            rows = cursor.fetchmany(self.chunk_rows)
+            if not rows:
+                break
+            yield rows
+
+    def _column_dtypes(self, conn, table, columns):
+        """Pick a numpy dtype per column from one aggregate pass over the run's rows."""
+        aggregates = []
+        for name, kind in columns:
+            if kind == "text":
+                aggregates.append(f"MAX(LENGTH({name}))")
+            else:
+                aggregates.append(f"SUM({name} IS NULL)")
+        where, params = self._run_filter(conn, table)
+        values = conn.execute(f"SELECT COUNT(*), {', '.join(aggregates)} FROM {table} {where}", params).fetchone()
+
+        dtypes = []
+        for (name, kind), value in zip(columns, values[1:]):
+            if kind == "text":
+                dtypes.append(np.dtype(f"U{max(1, value or 0)}"))
+            elif kind == "int" and not value:
+                dtypes.append(np.dtype(np.int64))
+            else:
+                # Integer columns with NULLs (e.g. unknown flags) are stored as float with NaN
+                dtypes.append(np.dtype(np.float64))
+        return values[0], dtypes
+
+    def export_npz(self, table, compress=False):
+        """Write one .npy member per column into run<id>_<table>.npz."""
+        path = self._path(table, "npz")
+        conn = self._connect()
+        try:
+            columns = self._columns(conn, table)
+            row_count, dtypes = self._column_dtypes(conn, table, columns)
+
+            with tempfile.TemporaryDirectory(dir=self.output_dir) as scratch:
+                # One pass over the rows appends each column to its own raw file
+                raw_files = [open(os.path.join(scratch, name), "wb") for name, _ in columns]
+                try:
+                    for rows in self._chunks(conn, table, columns):
+                        for values, dtype, raw_file in zip(zip(*rows), dtypes, raw_files):
+                            if dtype.kind == "U":
+                                values = ["" if value is None else value for value in values]
+                            np.asarray(values, dtype=dtype).tofile(raw_file)
+                finally:
+                    for raw_file in raw_files:
+                        raw_file.close()
+
+                # Each raw file gets an .npy header and is streamed into the archive
+                compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+                with zipfile.ZipFile(path, "w", compression=compression, allowZip64=True) as archive:
+                    for (name, _), dtype in zip(columns, dtypes):
+                        with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+                            header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False,
+                                      "shape": (row_count,)}
+                            np.lib.format.write_array_header_1_0(member, header)
+                            with open(os.path.join(scratch, name), "rb") as raw_file:
+                                shutil.copyfileobj(raw_file, member, 1024 * 1024)
+        finally:
+            conn.close()
+        return path
+
+    def export_csv(self, table):
+        """Write run<id>_<table>.csv with a header row."""
+        path = self._path(table, "csv")
+        conn = self._connect()
+        try:
+            columns = self._columns(conn, table)
+            with open(path, "w", newline="", encoding="utf-8") as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow([name for name, _ in columns])
+                for rows in self._chunks(conn, table, columns):
+                    writer.writerows(rows)
+        finally:
+            conn.close()
+        return path
+
+    def export_parquet(self, table):
+        """Write run<id>_<table>.parquet, one row group per chunk; needs pyarrow."""
+        if pyarrow is None:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+        path = self._path(table, "parquet")
+        arrow_types = {"int": pyarrow.int64(), "float": pyarrow.float64(), "text": pyarrow.string()}
+        conn = self._connect()
+        try:
+            columns = self._columns(conn, table)
+            schema = pyarrow.schema([(name, arrow_types[kind]) for name, kind in columns])
+            with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+                for rows in self._chunks(conn, table, columns):
+                    arrays = [pyarrow.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+                    writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
+        finally:
+            conn.close()
+        return path
+
+    def export(self, formats=EXPORT_FORMATS, tables=EXPORT_TABLES):
+        """Export every table in every requested format and return {format: [paths]}.
+
+        Parquet is skipped with a notice when pyarrow is not installed.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        exporters = {"npz": self.export_npz, "csv": self.export_csv, "parquet": self.export_parquet}
+
+        paths = {}
+        for file_format in formats:
+            if file_format not in exporters:
+                raise ValueError(f"Unknown export format: {file_format}")
+            if file_format == "parquet" and pyarrow is None:
+                print("⚠️ pyarrow is not installed, skipping Parquet export")
+                continue
+            paths[file_format] = [exporters[file_format](table) for table in tables]
+
+        print(f"📦 Exported run {self.run_id} to {self.output_dir}/ ({', '.join(paths)})")
+        return paths
@@ -0,0 +1,92 @@
+import numpy as np
+
+from OutputAnalysis import t_quantile
+from Replication import run_replication
+
+
+def mean_wait(summary):
+    """Default comparison metric: average wait in minutes."""
+    return summary["waits"]["mean"]
+
+
+def compare_scenarios(scenario_a, scenario_b, seeds, metric=mean_wait, antithetic=False, cluster=None, cache=None):
+    """Compare `metric` between two scenarios using common random numbers.
+
+    Both scenarios run once per seed with the same per-patient random
+    streams, so every patient arrives with the same acuity, complaint and
+    service times in A and B and the difference reflects the configuration,
+    not the noise. With antithetic=True each seed also runs with mirrored
+    streams and the pair is averaged. Runs go through `cluster` (a started
+    ReplicationCluster) when given, else one after another in this process;
+    `cache` is a ResultCache for the serial runs (a cluster uses its own).
+
+    Returns the mean difference A - B with its 95% confidence interval, the
+    variance of the paired differences, the variance independent runs would
+    have had and the resulting variance reduction factor.
+    """
+    seeds = list(seeds)
+    mirrors = (False, True) if antithetic else (False,)
+    runs = [(label, scenario, mirrored) for label, scenario in (("a", scenario_a), ("b", scenario_b))
+            for mirrored in mirrors]
+
+    # Run every (scenario, stream) combination for every seed
+    results = {}
+    if cluster is None:
+        for label, scenario, mirrored in runs:
+            crn_scenario = dict(scenario, common_random_numbers=True, antithetic=mirrored)
+            for seed in seeds:
+                if cache is not None:
+                    summary = cache.get_or_run(crn_scenario, seed, run_replication)
+                else:
+                    summary = run_replication(crn_scenario, seed)
+                results[label, mirrored, seed] = metric(summary)
+    else:
+        job_ids = {}
+        for label, scenario, mirrored in runs:
+            crn_scenario = dict(scenario, common_random_numbers=True, antithetic=mirrored)
+            for seed, job_id in zip(seeds, cluster.submit(crn_scenario, seeds)):
+                job_ids[job_id] = (label, mirrored, seed)
+        summaries, _ = cluster.wait()
+        for job_id, summary in summaries.items():
+            results[job_ids[job_id]] = metric(summary)
+
+    # Keep seeds whose runs all finished; an antithetic pair counts as one observation
+    seeds = [seed for seed in seeds if all((label, mirrored, seed) in results for label, _, mirrored in runs)]
+    if len(seeds) < 2:
+        raise ValueError("compare_scenarios() needs at least two seeds whose runs all finished")
+    a = np.array([np.mean([results["a", mirrored, seed] for mirrored in mirrors]) for seed in seeds])
+    b = np.array([np.mean([results["b", mirrored, seed] for mirrored in mirrors]) for seed in seeds])
+    differences = a - b
+
+    # Independent runs would add up the scenarios' variances (halved again for independent pairs)
+    paired_variance = float(differences.var(ddof=1))
+    scenario_variance = np.array([[results[label, mirrored, seed] for seed in seeds]
+                                  for label, _, mirrored in runs]).var(axis=1, ddof=1)
+    independent_variance = float(scenario_variance.sum() / len(mirrors) ** 2)
+    reduction = independent_variance / paired_variance if paired_variance > 0 else float("inf")
+
+    half_width = t_quantile(len(seeds) - 1) * np.sqrt(paired_variance / len(seeds))
+    return {
+        "replications": len(seeds),
+        "antithetic": antithetic,
+        "mean_a": float(a.mean()),
+        "mean_b": float(b.mean()),
+        "difference": float(differences.mean()),
+        "ci_95": (float(differences.mean() - half_width), float(differences.mean() + half_width)),
+        "paired_variance": paired_variance,
+        "independent_variance": independent_variance,
+        "variance_reduction": reduction,
+        "equivalent_replications": len(seeds) * reduction,
+    }
+
+
+def print_comparison(comparison, name_a="A", name_b="B", unit="min"):
+    low, high = comparison["ci_95"]
+    method = "common random numbers + antithetic pairs" if comparison["antithetic"] else "common random numbers"
+    print(f"\n=== {name_a} vs {name_b} ({comparison['replications']} replications, {method}) ===")
+    print(f"{name_a}: {comparison['mean_a']:.2f} {unit}   {name_b}: {comparison['mean_b']:.2f} {unit}")
+    print(f"Difference: {comparison['difference']:+.2f} {unit} (95% CI {low:+.2f} to {high:+.2f})")
+    print(f"Variance of difference: {comparison['paired_variance']:.3f} paired vs "
+          f"{comparison['independent_variance']:.3f} independent")
+    print(f"📉 Variance reduced {comparison['variance_reduction']:.1f}x, worth about "
+          f"{comparison['equivalent_replications']:.0f} independent replications")
@@ -0,0 +1,107 @@
+from threading import Event, Lock
+from time import perf_counter, sleep
+
+
+class StaffScheduler:
+    """Central scheduler that lends doctors from quiet pools to overloaded ones.
+
+    Every interval it reads each pool's status: queue depth, doctors on duty,
+    idle doctors and the wait of the longest-waiting patient in minutes. A
+    pool is overloaded when that wait passes the SLA target or its queue per
+    doctor passes max_queue_per_doctor; it then borrows a doctor from the
+    quietest pool with an empty queue and idle doctors. A loan is recalled
+    once the borrower's queue is empty or the lender gets busy again.
+
+    Reallocation is rate limited: at most max_moves loans or recalls per
+    interval, and a loan lasts at least min_loan seconds before it is
+    recalled, so doctors do not bounce between pools.
+    """
+
+    def __init__(self, status, lend, sla_wait=60.0, max_queue_per_doctor=2.0, interval=0.5, max_moves=1,
+                 min_loan=2.0, lenders=None, on_reassign=None):
+        self.status = status              # () -> {pool: {"depth", "doctors", "idle", "longest_wait"}}
+        self.lend = lend                  # (source, target, recall Event) -> starts the loaned doctor
+        self.sla_wait = sla_wait
+        self.max_queue_per_doctor = max_queue_per_doctor
+        self.interval = interval
+        self.max_moves = max_moves
+        self.min_loan = min_loan
+        self.lenders = lenders            # Pools allowed to lend (default: every pool)
+        self.on_reassign = on_reassign    # called with (action, source, target, pool status)
+
+        self.lock = Lock()
+        self.loans = []                   # [(source, target, started, recall Event)]
+
+    def overloaded(self, pool):
+        return (pool["longest_wait"] > self.sla_wait
+                or pool["depth"] > self.max_queue_per_doctor * max(pool["doctors"], 1))
+
+    def loans_from(self, source):
+        return sum(1 for loan in self.loans if loan[0] == source)
+
+    def loans_to(self, target):
+        return sum(1 for loan in self.loans if loan[1] == target)
+
+    def step(self):
+        """Recall finished loans, then lend doctors to overloaded pools; returns the moves made."""
+        status = self.status()
+        now = perf_counter()
+        moves = 0
+
+        with self.lock:
+            # Recall loans whose borrower caught up or whose lender needs its doctor back
+            for loan in list(self.loans):
+                if moves >= self.max_moves:
+                    break
+                source, target, started, recall = loan
+                if now - started < self.min_loan:
+                    continue
+                if status[target]["depth"] == 0 or self.overloaded(status[source]):
+                    recall.set()
+                    self.loans.remove(loan)
+                    moves += 1
+                    self._reassigned("return", source, target, status[target])
+
+            # Most overdue pools borrow first
+            targets = sorted((pool for pool in status if self.overloaded(status[pool])),
+                             key=lambda pool: -status[pool]["longest_wait"])
+            for target in targets:
+                if moves >= self.max_moves:
+                    break
+
+                # Quiet pools with an idle doctor not already out on loan
+                lenders = [pool for pool in (self.lenders or status)
+                           if pool != target and not self.loans_to(pool) and status[pool]["depth"] == 0
+                           and status[pool]["idle"] - self.loans_from(pool) > 1]
+                if not lenders:
+                    break
+                source = max(lenders, key=lambda pool: status[pool]["idle"] - self.loans_from(pool))
+
+                recall = Event()
+                self.lend(source, target, recall)
+                self.loans.append((source, target, now, recall))
+                moves += 1
+                self._reassigned("lend", source, target, status[target])
+        return moves
+
+    def _reassigned(self, action, source, target, pool):
+        if action == "lend":
+            print(f"🔁 Doctor from {source} lent to {target} (queue {pool['depth']}, "
+                  f"longest wait {pool['longest_wait']:.0f} min)")
+        else:
+            print(f"🔁 Doctor from {source} returned from {target}")
+        if self.on_reassign is not None:
+            self.on_reassign(action, source, target, pool)
+
+    def run(self, should_stop):
+        """Run a step every interval until should_stop() is true, then recall every loan."""
+        while not should_stop():
+            self.step()
+            sleep(self.interval)
+        self.recall_all()
+
+    def recall_all(self):
+        with self.lock:
+            for _, _, _, recall in self.loans:
+                recall.set()
+            self.loans = []
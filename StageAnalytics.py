@@ -0,0 +1,220 @@
+import sqlite3
+
+import numpy as np
+
+from PatientFacts import MINUTES_PER_SECOND, PatientFactTable
+
+
+# Stage timestamps in visit order, as minutes after arrival
+TIME_COLUMNS = ("registration_min", "assessment_min", "tests_ordered_min", "tests_done_min", "doctor_start_min",
+                "doctor_end_min", "surgery_start_min", "surgery_end_min", "discharge_min")
+
+# Stages a visit is split into; reception and triage include their own queues
+STAGES = ("reception", "triage", "doctor_queue", "labs", "lab_return_queue", "treatment", "surgery_queue",
+          "surgery", "recovery")
+
+# Stages that are nothing but waiting
+QUEUE_STAGES = ("doctor_queue", "lab_return_queue", "surgery_queue")
+
+# Severity from which patients are treated by ER doctors instead of their department
+ER_SEVERITY = 8
+
+
+class StageAnalytics:
+    """Split each visit of a run into stages and find the stage that limits throughput.
+
+    Stage durations come from the patient fact table and are computed for all
+    patients at once with numpy. A stage a patient skipped (e.g. labs) is NaN
+    for that patient and counts as zero minutes in the per-patient breakdown.
+    """
+
+    def __init__(self, db_name, run_id):
+        self.db_name = db_name
+        self.run_id = run_id
+        self.facts = PatientFactTable(db_name, run_id)
+
+    @staticmethod
+    def stage_durations(times):
+        """Turn an (n, len(TIME_COLUMNS)) array of timestamps into (n, len(STAGES)) durations."""
+        (registration, assessment, tests_ordered, tests_done, doctor_start, doctor_end, surgery_start,
+         surgery_end, discharge) = times.T
+
+        # Ambulance and MCI patients skip reception and triage and queue from arrival
+        queue_start = np.where(np.isnan(assessment), 0.0, assessment)
+        first_doctor = np.where(np.isnan(tests_ordered), doctor_start, tests_ordered)
+
+        durations = np.column_stack([
+            registration,                   # reception
+            assessment - registration,      # triage
+            first_doctor - queue_start,     # doctor_queue
+            tests_done - tests_ordered,     # labs
+            doctor_start - tests_done,      # lab_return_queue
+            doctor_end - doctor_start,      # treatment
+            surgery_start - doctor_end,     # surgery_queue
+            surgery_end - surgery_start,    # surgery
+            np.where(np.isnan(surgery_end), np.nan, discharge - surgery_end),  # recovery, after surgery only
+        ])
+
+        # Timestamps taken by different threads can be a hair out of order
+        return np.maximum(durations, 0.0)
+
+    def load(self, group_by=(), **filters):
+        """Return (group labels, stage durations) for the matching patients."""
+        rows = self.facts.fetch(tuple(group_by) + TIME_COLUMNS, **filters)
+        width = len(group_by)
+        labels = [row[:width] for row in rows]
+        times = np.array([row[width:] for row in rows], dtype=float).reshape(len(rows), len(TIME_COLUMNS))
+        return labels, self.stage_durations(times)
+
+    @staticmethod
+    def _group_index(labels):
+        """Map group labels to consecutive integers; returns (groups, index array)."""
+        positions = {}
+        index = np.fromiter((positions.setdefault(label, len(positions)) for label in labels), dtype=np.int64,
+                            count=len(labels))
+        return list(positions), index
+
+    def breakdown(self, group_by=("department",), **filters):
+        """Average minutes per patient spent in each stage, per group.
+
+        Returns {group: {"count": n, "total": minutes, "bottleneck": stage,
+        <stage>: minutes, ...}}; the stage minutes add up to the total.
+        """
+        labels, durations = self.load(group_by, **filters)
+        groups, index = self._group_index(labels)
+
+        sums = np.zeros((len(groups), len(STAGES)))
+        np.add.at(sums, index, np.nan_to_num(durations))
+        counts = np.bincount(index, minlength=len(groups))
+
+        results = {}
+        for position, group in enumerate(groups):
+            per_patient = sums[position] / counts[position]
+            summary = {"count": int(counts[position]), "total": float(per_patient.sum()),
+                       "bottleneck": STAGES[int(per_patient.argmax())]}
+            summary.update(zip(STAGES, per_patient.tolist()))
+            results[group] = summary
+        return results
+
+    def _connect(self):
+        return sqlite3.connect(f"file:{self.db_name}?mode=ro", uri=True)
+
+    def observation_minutes(self):
+        """Length of the measured periods in report minutes (the days' utilization windows)."""
+        conn = self._connect()
+        try:
+            row = conn.execute("""
+                SELECT SUM(elapsed) FROM (
+                    SELECT MAX(elapsed) AS elapsed FROM resource_utilization WHERE run_id = ? GROUP BY day
+                )
+            """, (self.run_id,)).fetchone()
+        finally:
+            conn.close()
+        if row[0]:
+            return row[0] * MINUTES_PER_SECOND
+
+        # Compacted runs: fall back to the span from first arrival to last departure of each day
+        spans = {}
+        for day, arrival, discharge in self.facts.fetch(("day", "arrival_time", "discharge_min")):
+            end = arrival + (discharge or 0) / MINUTES_PER_SECOND
+            first, last = spans.get(day, (arrival, end))
+            spans[day] = (min(first, arrival), max(last, end))
+        return sum(last - first for first, last in spans.values()) * MINUTES_PER_SECOND
+
+    def littles_law(self):
+        """Check L = lambda * W for every stage and against the ledger's doctor occupancy.
+
+        Per stage: lambda is patients through the stage per minute, W their
+        mean minutes in it, and L = lambda * W the average number of patients
+        in the stage. For treatment, L per care unit is compared with the
+        average number of busy doctors the resource ledger measured; a large
+        relative error means doctors are held outside treatment (ambulance
+        handoffs, code blues, MCI duty) or timestamps are missing.
+        """
+        window = self.observation_minutes()
+        labels, durations = self.load(("department", "severity", "is_mci"))
+        if not window or not len(labels):
+            return {"window": window, "stages": {}, "doctors": []}
+
+        through = ~np.isnan(durations)
+        totals = np.nan_to_num(durations).sum(axis=0)
+        stages = {}
+        for position, stage in enumerate(STAGES):
+            patients = int(through[:, position].sum())
+            stages[stage] = {
+                "arrival_rate": patients / window,
+                "mean_minutes": totals[position] / patients if patients else 0.0,
+                "in_stage": totals[position] / window,
+            }
+
+        # Treatment minutes per care unit (the ER or a department's doctors)
+        units = ["ER" if is_mci or (severity or 0) >= ER_SEVERITY else department
+                 for department, severity, is_mci in labels]
+        groups, index = self._group_index(units)
+        treatment = np.bincount(index, weights=np.nan_to_num(durations[:, STAGES.index("treatment")]),
+                                minlength=len(groups))
+
+        conn = self._connect()
+        try:
+            ledger = dict(conn.execute("""
+                SELECT resource, SUM(avg_in_use * elapsed) / SUM(elapsed)
+                FROM resource_utilization WHERE run_id = ? AND elapsed > 0 GROUP BY resource
+            """, (self.run_id,)).fetchall())
+        finally:
+            conn.close()
+
+        doctors = []
+        for position, unit in enumerate(groups):
+            resource = f"{unit} doctors"
+            if resource not in ledger:
+                continue
+            little = treatment[position] / window
+            measured = ledger[resource]
+            doctors.append({"resource": resource, "little_in_use": float(little), "ledger_in_use": measured,
+                            "relative_error": (little - measured) / measured if measured else None})
+        return {"window": window, "stages": stages, "doctors": doctors}
+
+    def bottleneck(self, littles_law=None):
+        """Return the stage holding the most patients on average (largest L = lambda * W)."""
+        littles_law = littles_law or self.littles_law()
+        if not littles_law["stages"]:
+            return None
+        return max(littles_law["stages"], key=lambda stage: littles_law["stages"][stage]["in_stage"])
+
+    def print_report(self):
+        """Print the stage breakdown, the Little's law check and the bottleneck."""
+        littles_law = self.littles_law()
+        if not littles_law["stages"]:
+            print("\n=== Stage Breakdown ===\nNo patient facts recorded for this run")
+            return
+
+        print("\n=== Stage Breakdown (minutes per patient) ===")
+        print(f"{'Department':<20}{'Patients':>9}" + "".join(f"{stage[:11]:>12}" for stage in STAGES)
+              + f"{'Total':>9}")
+        departments = self.breakdown(("department",))
+        for (department,), summary in sorted(departments.items(), key=lambda item: -item[1]["total"]):
+            print(f"{department or '-':<20}{summary['count']:>9}"
+                  + "".join(f"{summary[stage]:>12.1f}" for stage in STAGES) + f"{summary['total']:>9.1f}")
+
+        print("\nBy severity:")
+        for (severity,), summary in sorted(self.breakdown(("severity",)).items(), key=lambda item: item[0][0] or 0):
+            print(f"  Severity {severity}: {summary['total']:.1f} min, mostly {summary['bottleneck']} "
+                  f"({summary[summary['bottleneck']]:.1f} min)")
+
+        print(f"\n=== Little's Law (L = λW over {littles_law['window']:.0f} min) ===")
+        for stage, check in littles_law["stages"].items():
+            marker = "  ⏳" if stage in QUEUE_STAGES else ""
+            print(f"  {stage:<18} λ={check['arrival_rate']:.3f}/min  W={check['mean_minutes']:.1f} min  "
+                  f"L={check['in_stage']:.2f}{marker}")
+        for check in littles_law["doctors"]:
+            error = check["relative_error"]
+            print(f"  {check['resource']:<30} λW={check['little_in_use']:.2f}  "
+                  f"ledger={check['ledger_in_use']:.2f}  "
+                  + (f"({error:+.0%})" if error is not None else ""))
+
+        stage = self.bottleneck(littles_law)
+        share = littles_law["stages"][stage]["in_stage"] / sum(check["in_stage"]
+                                                               for check in littles_law["stages"].values())
+        worst = max(departments.items(), key=lambda item: item[1][stage])
+        print(f"\n🚧 Bottleneck: {stage} holds {share:.0%} of patients in the hospital on average; "
+              f"worst in {worst[0][0]} ({worst[1][stage]:.1f} min per patient)")
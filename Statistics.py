@@ -1,28 +1,87 @@
+import json
 import sqlite3
 from threading import Lock
+from time import time
 from random import randint
-from collections import defaultdict
+from collections import Counter, defaultdict
 
 from matplotlib import pyplot as plt
 
+from OutputAnalysis import mser_batch_cut
+from PatientFacts import ADDED_FACT_COLUMNS, MINUTES_PER_SECOND, PatientFactTable
+
 
 class Statistics:
-    def __init__(self, db_name="hospital_stats.db"):
+    # Per-day series longer than this are rolled up to weeks, then months, in reports
+    MAX_DAILY_BARS = 31
+    MAX_WEEKLY_BARS = 26
+
+    # Patient fact rows are buffered and written with one bulk insert per batch
+    FACT_BATCH_SIZE = 500
+
+    # Tables whose rows carry the data version of their last change
+    VERSIONED_TABLES = ("daily_stats", "conditions", "mci_stats", "daily_waits", "patients_per_department",
+                        "event_waits", "resource_utilization")
+
+    # Every table keyed by run_id (patient_facts, resource_utilization and staff_reassignments are the detailed ones)
+    RUN_TABLES = VERSIONED_TABLES + ("patient_facts", "staff_reassignments")
+    DETAIL_TABLES = ("patient_facts", "resource_utilization", "staff_reassignments")
+
+    # Bumped when the layout changes; older files are rebuilt on open
+    SCHEMA_VERSION = 2
+
+    # Retention: runs kept at all, and runs that keep their per-patient detail
+    KEEP_RUNS = 200
+    KEEP_DETAILED_RUNS = 20
+
+    def __init__(self, db_name="hospital_stats.db", days=7, scenario=None, keep_runs=None, keep_detailed_runs=None):
         self.db_name = db_name
+        self.days = days
         self.lock = Lock()
-        self.mci_day = randint(0, 6)  # Random day for MCI
+        self.mci_day = randint(0, days - 1)  # Random day for MCI
+        self.keep_runs = keep_runs if keep_runs is not None else self.KEEP_RUNS
+        self.keep_detailed_runs = keep_detailed_runs if keep_detailed_runs is not None else self.KEEP_DETAILED_RUNS
 
         # Initialize the database
         self._initialize_database()
 
+        # Register this run; every row it writes is keyed by run_id
+        self.run_id = self._start_run(scenario)
+
+        # Per-patient fact table and its insert buffer
+        self.patient_facts = PatientFactTable(db_name, self.run_id)
+        self.fact_buffer = []
+
+        # Every write bumps the data version so readers can ask for changes only
+        self.data_version = self._current_data_version()
+
     def _initialize_database(self):
+        self._upgrade_schema()
+
         with sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
 
+            # Write-ahead logging lets dashboard reads run alongside the simulation's writes
+            cursor.execute("PRAGMA journal_mode=WAL")
+
+            # One row per simulation run with its scenario settings
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    started_at REAL,
+                    finished_at REAL,
+                    days INTEGER,
+                    mci_day INTEGER,
+                    scenario TEXT,
+                    compacted INTEGER DEFAULT 0
+                )
+            """)
+
             # Create tables
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS daily_stats (
-                    day INTEGER PRIMARY KEY,
+                    run_id INTEGER,
+                    day INTEGER,
                     total_visits INTEGER DEFAULT 0,
                     ambulance_arrivals INTEGER DEFAULT 0,
                     deaths INTEGER DEFAULT 0,
@@ -33,325 +92,640 @@ class Statistics:
                     blood_works INTEGER DEFAULT 0,
                     code_blues INTEGER DEFAULT 0,
                     code_blue_success INTEGER DEFAULT 0,
-                    survivals INTEGER DEFAULT 0
+                    survivals INTEGER DEFAULT 0,
+                    failed_visits INTEGER DEFAULT 0,
+                    version INTEGER DEFAULT 0,
+                    PRIMARY KEY (run_id, day)
                 )
             """)
 
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS conditions (
+                    run_id INTEGER,
                     day INTEGER,
                     condition TEXT,
                     count INTEGER DEFAULT 0,
-                    PRIMARY KEY (day, condition)
+                    version INTEGER DEFAULT 0,
+                    PRIMARY KEY (run_id, day, condition)
                 )
             """)
 
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS mci_stats (
-                    mci_day INTEGER PRIMARY KEY,
+                    run_id INTEGER PRIMARY KEY,
+                    mci_day INTEGER,
                     mci_patients INTEGER DEFAULT 0,
                     mci_deaths INTEGER DEFAULT 0,
-                    mci_survivals INTEGER DEFAULT 0
+                    mci_survivals INTEGER DEFAULT 0,
+                    version INTEGER DEFAULT 0
                 )
             """)
 
-            # Create the waiting_times table
+            # Create the daily_waits table (waiting times aggregated per day as they stream in)
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS waiting_times (
+                CREATE TABLE IF NOT EXISTS daily_waits (
+                    run_id INTEGER,
                     day INTEGER,
-                    waiting_time REAL,
-                    PRIMARY KEY (day, waiting_time)
+                    count INTEGER DEFAULT 0,
+                    total_wait REAL DEFAULT 0,
+                    max_wait REAL DEFAULT 0,
+                    version INTEGER DEFAULT 0,
+                    PRIMARY KEY (run_id, day)
                 )
             """)
 
             # Create the patients_per_department table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS patients_per_department (
+                    run_id INTEGER,
                     day INTEGER,
                     department TEXT,
                     count INTEGER DEFAULT 0,
-                    PRIMARY KEY (day, department)
+                    version INTEGER DEFAULT 0,
+                    PRIMARY KEY (run_id, day, department)
                 )
             """)
 
-            # Insert initial MCI day
+            # Create the event_waits table (queue time before special events start)
             cursor.execute("""
-                INSERT OR IGNORE INTO mci_stats (mci_day) VALUES (?)
-            """, (self.mci_day,))
+                CREATE TABLE IF NOT EXISTS event_waits (
+                    run_id INTEGER,
+                    day INTEGER,
+                    event TEXT,
+                    count INTEGER DEFAULT 0,
+                    total_wait REAL DEFAULT 0,
+                    max_wait REAL DEFAULT 0,
+                    version INTEGER DEFAULT 0,
+                    PRIMARY KEY (run_id, day, event)
+                )
+            """)
 
-    def record_visit(self, day, patient):
-        with self.lock, sqlite3.connect(self.db_name) as conn:
+            # Create the resource_utilization table (one row per resource per day)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS resource_utilization (
+                    run_id INTEGER,
+                    day INTEGER,
+                    resource TEXT,
+                    capacity INTEGER,
+                    utilization REAL,
+                    avg_in_use REAL,
+                    peak_in_use INTEGER,
+                    avg_queue_length REAL,
+                    peak_queue_length INTEGER,
+                    acquisitions INTEGER,
+                    failed_acquires INTEGER,
+                    avg_wait REAL,
+                    max_wait REAL,
+                    wait_histogram TEXT,
+                    unmatched_releases INTEGER,
+                    elapsed REAL,
+                    version INTEGER DEFAULT 0,
+                    PRIMARY KEY (run_id, day, resource)
+                )
+            """)
+
+            # Create the staff_reassignments table (one row per doctor lent or returned)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS staff_reassignments (
+                    run_id INTEGER,
+                    day INTEGER,
+                    recorded_at REAL,
+                    action TEXT,
+                    source TEXT,
+                    target TEXT,
+                    queue_depth INTEGER,
+                    longest_wait REAL
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_staff_reassignments_run ON staff_reassignments (run_id)")
+
+            # Create the per-patient fact table and its indexes
+            PatientFactTable.create(cursor)
+
+            # Add columns introduced since the current schema version
+            self._ensure_column(cursor, "resource_utilization", "elapsed", "REAL")
+            self._ensure_column(cursor, "daily_stats", "failed_visits", "INTEGER DEFAULT 0")
+            for column in ADDED_FACT_COLUMNS:
+                self._ensure_column(cursor, "patient_facts", column, "REAL")
+
+            cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    @staticmethod
+    def _ensure_column(cursor, table, column, declaration):
+        """Add a column to an existing table if it is missing."""
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+    def _upgrade_schema(self):
+        """Rebuild database files written before run IDs existed.
+
+        Their counters were accumulated across runs and cannot be split back
+        into runs, so the old tables are dropped. New files are created with
+        incremental auto-vacuum so deleted runs give their pages back.
+        """
+        conn = sqlite3.connect(self.db_name)
+        try:
+            cursor = conn.cursor()
+            user_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            tables = [row[0] for row in cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+
+            if not tables:
+                # Must be set before the first table is created
+                cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            elif user_version < self.SCHEMA_VERSION:
+                print(f"⚠️ {self.db_name} uses an old schema without run IDs; discarding its tables")
+                for table in tables:
+                    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.commit()
+                cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                cursor.execute("VACUUM")
+        finally:
+            conn.close()
+
+    def _start_run(self, scenario):
+        with sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
 
-            # Update daily stats
             cursor.execute("""
-                INSERT INTO daily_stats (day, total_visits, ambulance_arrivals, deaths, surgeries, 
-                                         surgery_success, er_patients, xrays, blood_works, code_blues, 
-                                         code_blue_success, survivals)
-                VALUES (?, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
-                ON CONFLICT(day) DO NOTHING
-            """, (day,))
+                INSERT INTO runs (started_at, days, mci_day, scenario)
+                VALUES (?, ?, ?, ?)
+            """, (time(), self.days, self.mci_day, json.dumps(scenario or {})))
+            run_id = cursor.lastrowid
 
+            # Insert initial MCI day
             cursor.execute("""
-                UPDATE daily_stats
-                SET total_visits = total_visits + 1
-                WHERE day = ?
-            """, (day,))
+                INSERT INTO mci_stats (run_id, mci_day) VALUES (?, ?)
+            """, (run_id, self.mci_day))
+        return run_id
 
-            # Update conditions
-            if patient.condition:
-                cursor.execute("""
-                    INSERT INTO conditions (day, condition, count)
-                    VALUES (?, ?, 0)
-                    ON CONFLICT(day, condition) DO NOTHING
-                """, (day, patient.condition))
+    def set_scenario(self, scenario):
+        """Store the scenario settings (staffing, arrival rates, ...) of this run."""
+        with self.lock, sqlite3.connect(self.db_name) as conn:
+            conn.execute("UPDATE runs SET scenario = ? WHERE run_id = ?",
+                         (json.dumps(scenario, sort_keys=True, default=str), self.run_id))
 
-                cursor.execute("""
-                    UPDATE conditions
-                    SET count = count + 1
-                    WHERE day = ? AND condition = ?
-                """, (day, patient.condition))
+    def finish_run(self):
+        """Mark the run as finished and apply the retention policy."""
+        self.flush_patient_facts()
+        with self.lock, sqlite3.connect(self.db_name) as conn:
+            conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time(), self.run_id))
+        self.apply_retention()
 
-            # Update other stats
-            if patient.severity is not None and patient.severity >= 8:
-                cursor.execute("""
-                    UPDATE daily_stats
-                    SET er_patients = er_patients + 1
-                    WHERE day = ?
-                """, (day,))
+    def apply_retention(self, keep_runs=None, keep_detailed_runs=None):
+        """Drop runs beyond the newest keep_runs and compact older detailed runs.
 
-            # Record patients per department
-            if patient.department:
-                cursor.execute("""
-                        INSERT INTO patients_per_department (day, department, count)
-                        VALUES (?, ?, 0)
-                        ON CONFLICT(day, department) DO NOTHING
-                    """, (day, patient.department))
+        Compacted runs keep their daily counters but lose the per-patient facts
+        and per-resource utilization rows. Freed pages are returned to the OS
+        with an incremental vacuum.
+        """
+        keep_runs = self.keep_runs if keep_runs is None else keep_runs
+        keep_detailed_runs = self.keep_detailed_runs if keep_detailed_runs is None else keep_detailed_runs
 
-                cursor.execute("""
-                        UPDATE patients_per_department
-                        SET count = count + 1
-                        WHERE day = ? AND department = ?
-                    """, (day, patient.department))
+        with self.lock, sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            run_ids = [row[0] for row in cursor.execute("SELECT run_id FROM runs ORDER BY run_id DESC")]
+
+            dropped = [run_id for run_id in run_ids[keep_runs:] if run_id != self.run_id]
+            compacted = [run_id for run_id in run_ids[keep_detailed_runs:keep_runs] if run_id != self.run_id]
+
+            for run_id in dropped:
+                for table in self.RUN_TABLES:
+                    cursor.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+                cursor.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+
+            for run_id in compacted:
+                for table in self.DETAIL_TABLES:
+                    cursor.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+                cursor.execute("UPDATE runs SET compacted = 1 WHERE run_id = ?", (run_id,))
+
+        if dropped or compacted:
+            self.vacuum(incremental=True)
+        return {"dropped": len(dropped), "compacted": len(compacted)}
+
+    def vacuum(self, incremental=True):
+        """Give free pages back to the file system (VACUUM rebuilds the whole file)."""
+        with self.lock:
+            conn = sqlite3.connect(self.db_name)
+            try:
+                conn.execute("PRAGMA incremental_vacuum" if incremental else "VACUUM")
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _current_data_version(self):
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            versions = [cursor.execute(f"SELECT MAX(version) FROM {table}").fetchone()[0]
+                        for table in self.VERSIONED_TABLES]
+        return max([version for version in versions if version is not None], default=0)
+
+    def _next_version(self):
+        """Return a new data version; call while holding self.lock."""
+        self.data_version += 1
+        return self.data_version
+
+    # daily_stats counters and the patient flag each one counts
+    VISIT_COUNTERS = (("ambulance_arrivals", lambda p: p.came_by_ambulance), ("deaths", lambda p: p.dead),
+                      ("surgeries", lambda p: p.had_surgery),
+                      ("surgery_success", lambda p: p.had_surgery and p.surgery_success),
+                      ("er_patients", lambda p: p.severity is not None and p.severity >= 8),
+                      ("xrays", lambda p: p.had_xray), ("blood_works", lambda p: p.had_blood_work),
+                      ("code_blues", lambda p: p.had_code_blue),
+                      ("code_blue_success", lambda p: p.had_code_blue and p.code_blue_success),
+                      ("survivals", lambda p: not p.dead and not p.visit_failed),
+                      ("failed_visits", lambda p: p.visit_failed))
 
-            if patient.had_surgery:
-                cursor.execute("""
-                    UPDATE daily_stats
-                    SET surgeries = surgeries + 1
-                    WHERE day = ?
-                """, (day,))
-                if patient.surgery_success:
-                    cursor.execute("""
-                        UPDATE daily_stats
-                        SET surgery_success = surgery_success + 1
-                        WHERE day = ?
-                    """, (day,))
-
-            if patient.had_blood_work:
-                cursor.execute("""
-                    UPDATE daily_stats
-                    SET blood_works = blood_works + 1
-                    WHERE day = ?
-                """, (day,))
+    def record_visit(self, day, patient):
+        self.record_visits(day, [patient])
 
-            if patient.had_xray:
-                cursor.execute("""
-                    UPDATE daily_stats
-                    SET xrays = xrays + 1
-                    WHERE day = ?
-                """, (day,))
+    def record_visits(self, day, patients):
+        """Record a batch of departures from one day with one combined update per table."""
+        if not patients:
+            return
 
-            if patient.had_code_blue:
-                cursor.execute("""
-                    UPDATE daily_stats
-                    SET code_blues = code_blues + 1
-                    WHERE day = ?
-                """, (day,))
-                if patient.code_blue_success:
-                    cursor.execute("""
-                        UPDATE daily_stats
-                        SET code_blue_success = code_blue_success + 1
-                        WHERE day = ?
-                    """, (day,))
-
-            if patient.came_by_ambulance:
-                cursor.execute("""
-                    UPDATE daily_stats
-                    SET ambulance_arrivals = ambulance_arrivals + 1
-                    WHERE day = ?
-                """, (day,))
+        # Add the batch up before touching the database
+        counters = {column: sum(1 for patient in patients if counts(patient))
+                    for column, counts in self.VISIT_COUNTERS}
+        conditions = Counter(patient.condition for patient in patients if patient.condition)
+        departments = Counter(patient.department for patient in patients if patient.department)
+        waits = [(patient.doctor_start_time - patient.arrival_time) * MINUTES_PER_SECOND for patient in patients
+                 if patient.doctor_start_time and patient.arrival_time]
 
-            if patient.dead:
-                cursor.execute("""
-                    UPDATE daily_stats
-                    SET deaths = deaths + 1
-                    WHERE day = ?
-                """, (day,))
-            else:
-                cursor.execute("""
-                    UPDATE daily_stats
-                    SET survivals = survivals + 1
-                    WHERE day = ?
-                """, (day,))
-
-            # Record waiting time (if applicable)
-            if patient.doctor_start_time and patient.arrival_time:
-                wait_time = (patient.doctor_start_time - patient.arrival_time) * 1800 / 60
+        with self.lock, sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            version = self._next_version()
+
+            # Update daily stats
+            columns = ["total_visits"] + list(counters)
+            cursor.execute(f"""
+                INSERT INTO daily_stats (run_id, day, {', '.join(columns)}, version)
+                VALUES (?, ?, {', '.join('?' * len(columns))}, ?)
+                ON CONFLICT(run_id, day) DO UPDATE
+                SET {', '.join(f'{column} = {column} + excluded.{column}' for column in columns)},
+                    version = excluded.version
+            """, (self.run_id, day, len(patients), *counters.values(), version))
+
+            # Update conditions
+            cursor.executemany("""
+                INSERT INTO conditions (run_id, day, condition, count, version)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(run_id, day, condition) DO UPDATE
+                SET count = count + excluded.count, version = excluded.version
+            """, [(self.run_id, day, condition, count, version) for condition, count in conditions.items()])
+
+            # Record patients per department
+            cursor.executemany("""
+                INSERT INTO patients_per_department (run_id, day, department, count, version)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(run_id, day, department) DO UPDATE
+                SET count = count + excluded.count, version = excluded.version
+            """, [(self.run_id, day, department, count, version) for department, count in departments.items()])
+
+            # Record waiting times (if applicable)
+            if waits:
                 cursor.execute("""
-                    INSERT INTO waiting_times (day, waiting_time)
-                    VALUES (?, ?)
-                """, (day, wait_time))
+                    INSERT INTO daily_waits (run_id, day, count, total_wait, max_wait, version)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(run_id, day) DO UPDATE
+                    SET count = count + excluded.count,
+                        total_wait = total_wait + excluded.total_wait,
+                        max_wait = MAX(max_wait, excluded.max_wait),
+                        version = excluded.version
+                """, (self.run_id, day, len(waits), sum(waits), max(waits), version))
+
+            # Buffer the patients' fact rows; write a full batch at once
+            self.fact_buffer.extend(self.patient_facts.row(day, patient) for patient in patients)
+            if len(self.fact_buffer) >= self.FACT_BATCH_SIZE:
+                self.patient_facts.insert(cursor, self.fact_buffer)
+                self.fact_buffer = []
+
+    def flush_patient_facts(self):
+        """Write any buffered patient fact rows to the database."""
+        with self.lock:
+            if not self.fact_buffer:
+                return
+            with sqlite3.connect(self.db_name) as conn:
+                self.patient_facts.insert(conn.cursor(), self.fact_buffer)
+            self.fact_buffer = []
+
+    def steady_state_waits(self, batch_size=5):
+        """Waiting time over all days with each day's warm-up dropped.
+
+        Every day starts with empty queues, so its first patients wait less
+        than in steady state. Each day's waits, in arrival order, lose the
+        leading patients picked by the MSER-5 rule. The rule runs on batch
+        means aggregated in the database (batches grow on very busy days),
+        so the patients' waits are never all loaded at once.
+        Returns {"count", "mean", "dropped"}.
+        """
+        self.flush_patient_facts()
+
+        count, total, dropped = 0, 0.0, 0
+        for _, day_batch_size, batches in self.patient_facts.batch_means("wait_min", batch_size):
+            # A trailing partial batch is kept but takes no part in the rule
+            full = [batch_total / batch_count for batch_count, batch_total in batches if batch_count == day_batch_size]
+            cut = mser_batch_cut(full)
+            dropped += sum(batch_count for batch_count, _ in batches[:cut])
+            count += sum(batch_count for batch_count, _ in batches[cut:])
+            total += sum(batch_total for _, batch_total in batches[cut:])
+        return {"count": count, "mean": total / count if count else 0.0, "dropped": dropped}
 
     def record_mci_patient(self, patient):
+        self.record_mci_patients([patient])
+
+    def record_mci_patients(self, patients):
+        """Add a batch of MCI departures to the MCI totals in one update."""
+        if not patients:
+            return
+        deaths = sum(1 for patient in patients if patient.dead)
+        survivals = sum(1 for patient in patients if not patient.dead and not patient.visit_failed)
+        with self.lock, sqlite3.connect(self.db_name) as conn:
+            conn.execute("""
+                UPDATE mci_stats
+                SET mci_patients = mci_patients + ?, mci_deaths = mci_deaths + ?,
+                    mci_survivals = mci_survivals + ?, version = ?
+                WHERE run_id = ?
+            """, (len(patients), deaths, survivals, self._next_version(), self.run_id))
+
+    def merge_run(self, db_name, run_id):
+        """Add a run stored in another database (e.g. one day simulated in a worker process) to this run.
+
+        Rows are copied under this run's ID with a new data version; the
+        other run must cover different days, except for the MCI totals,
+        which are added up.
+        """
+        self.flush_patient_facts()
+        with self.lock:
+            conn = sqlite3.connect(self.db_name)
+            try:
+                conn.execute("ATTACH DATABASE ? AS shard", (db_name,))
+                with conn:
+                    version = self._next_version()
+                    for table in self.RUN_TABLES:
+                        if table == "mci_stats":
+                            continue
+                        columns = [row[1] for row in conn.execute(f"PRAGMA main.table_info({table})")]
+                        copied = [column for column in columns if column not in ("id", "run_id", "version")]
+                        targets, values, params = ["run_id"] + copied, ["?"] + copied, [self.run_id]
+                        if "version" in columns:
+                            targets.append("version")
+                            values.append("?")
+                            params.append(version)
+                        conn.execute(f"""
+                            INSERT INTO main.{table} ({', '.join(targets)})
+                            SELECT {', '.join(values)} FROM shard.{table} WHERE run_id = ?
+                        """, params + [run_id])
+
+                    # MCI patients are counted per run, not per day
+                    mci = conn.execute("SELECT mci_patients, mci_deaths, mci_survivals FROM shard.mci_stats "
+                                       "WHERE run_id = ?", (run_id,)).fetchone()
+                    if mci:
+                        conn.execute("""
+                            UPDATE main.mci_stats
+                            SET mci_patients = mci_patients + ?, mci_deaths = mci_deaths + ?,
+                                mci_survivals = mci_survivals + ?, version = ?
+                            WHERE run_id = ?
+                        """, (*mci, version, self.run_id))
+                conn.execute("DETACH DATABASE shard")
+            finally:
+                conn.close()
+
+    def record_event_wait(self, day, event, wait_seconds):
+        """Record how long an event (e.g. a code blue) waited for its resources."""
+        wait_time = wait_seconds * MINUTES_PER_SECOND
         with self.lock, sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
 
             cursor.execute("""
-                UPDATE mci_stats
-                SET mci_patients = mci_patients + 1
-            """)
-
-            if patient.dead:
-                cursor.execute("""
-                    UPDATE mci_stats
-                    SET mci_deaths = mci_deaths + 1
-                """)
-            else:
-                cursor.execute("""
-                    UPDATE mci_stats
-                    SET mci_survivals = mci_survivals + 1
-                """)
+                INSERT INTO event_waits (run_id, day, event, count, total_wait, max_wait, version)
+                VALUES (?, ?, ?, 1, ?, ?, ?)
+                ON CONFLICT(run_id, day, event) DO UPDATE
+                SET count = count + 1,
+                    total_wait = total_wait + excluded.total_wait,
+                    max_wait = MAX(max_wait, excluded.max_wait),
+                    version = excluded.version
+            """, (self.run_id, day, event, wait_time, wait_time, self._next_version()))
+
+    def record_reassignment(self, day, action, source, target, queue_depth, longest_wait):
+        """Record a doctor lent from `source` to `target` (action "lend") or returned ("return")."""
+        with self.lock, sqlite3.connect(self.db_name) as conn:
+            conn.execute("""
+                INSERT INTO staff_reassignments (run_id, day, recorded_at, action, source, target, queue_depth,
+                                                 longest_wait)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (self.run_id, day, time(), action, source, target, queue_depth, longest_wait))
+
+    def record_resource_utilization(self, day, reports):
+        """Store a day's utilization report produced by ResourceLedger.collect()."""
+        with self.lock, sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            version = self._next_version()
+
+            rows = [(self.run_id, day, r["resource"], r["capacity"], r["utilization"], r["avg_in_use"], r["peak_in_use"],
+                     r["avg_queue_length"], r["peak_queue_length"], r["acquisitions"], r["failed_acquires"],
+                     r["avg_wait"], r["max_wait"], json.dumps(r["wait_histogram"]), r["unmatched_releases"],
+                     r["elapsed"], version)
+                    for r in reports]
+
+            cursor.executemany("""
+                INSERT OR REPLACE INTO resource_utilization (run_id, day, resource, capacity, utilization,
+                                                             avg_in_use, peak_in_use, avg_queue_length,
+                                                             peak_queue_length, acquisitions, failed_acquires,
+                                                             avg_wait, max_wait, wait_histogram,
+                                                             unmatched_releases, elapsed, version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+
+    def fetch_changes(self, since=0):
+        """Return only the rows changed after data version `since`, plus the new version.
+
+        Uses its own read-only connection and never takes self.lock, so polling
+        readers do not hold up the simulation's writers. Every table is read
+        in one transaction, so all of them come from the same snapshot and no
+        row below the returned version can be missed.
+        """
+        changes = {"since": since, "version": since, "run_id": self.run_id, "days": self.days,
+                   "mci_day": self.mci_day}
+        conn = sqlite3.connect(f"file:{self.db_name}?mode=ro", uri=True, isolation_level=None)
+        try:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            for table in self.VERSIONED_TABLES:
+                cursor.execute(f"SELECT * FROM {table} WHERE run_id = ? AND version > ? ORDER BY version",
+                               (self.run_id, since))
+                rows = [dict(row) for row in cursor.fetchall()]
+                changes[table] = rows
+                if rows:
+                    changes["version"] = max(changes["version"], rows[-1]["version"])
+            cursor.execute("COMMIT")
+        finally:
+            conn.close()
+        return changes
 
     def fetch_data_from_db(self):
+        self.flush_patient_facts()
+
         with sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
 
-            # Query total visits per day
-            cursor.execute("SELECT total_visits FROM daily_stats ORDER BY day")
-            total_visits_per_day = [row[0] for row in cursor.fetchall()]
-
-            # Query ambulance arrivals per day
-            cursor.execute("SELECT ambulance_arrivals FROM daily_stats ORDER BY day")
-            ambulance_arrivals_per_day = [row[0] for row in cursor.fetchall()]
-
-            # Query deaths per day
-            cursor.execute("SELECT deaths FROM daily_stats ORDER BY day")
-            deaths_per_day = [row[0] for row in cursor.fetchall()]
-
-            # Query surgeries and successful surgeries per day
-            cursor.execute("SELECT surgeries, surgery_success FROM daily_stats ORDER BY day")
-            surgeries_data = cursor.fetchall()
-            surgeries_per_day = [row[0] for row in surgeries_data]
-            surgery_success_per_day = [row[1] for row in surgeries_data]
-
-            # Query ER patients per day
-            cursor.execute("SELECT er_patients FROM daily_stats ORDER BY day")
-            er_patients_per_day = [row[0] for row in cursor.fetchall()]
-
-            # Query X-rays and blood works per day
-            cursor.execute("SELECT xrays, blood_works FROM daily_stats ORDER BY day")
-            tests_data = cursor.fetchall()
-            xrays_per_day = [row[0] for row in tests_data]
-            blood_works_per_day = [row[1] for row in tests_data]
-
-            # Query code blues and successful code blues per day
-            cursor.execute("SELECT code_blues, code_blue_success FROM daily_stats ORDER BY day")
-            code_blues_data = cursor.fetchall()
-            code_blues_per_day = [row[0] for row in code_blues_data]
-            code_blue_success_per_day = [row[1] for row in code_blues_data]
-
-            # Query survivals per day
-            cursor.execute("SELECT survivals FROM daily_stats ORDER BY day")
-            survivals_per_day = [row[0] for row in cursor.fetchall()]
+            # Query the daily counters; days without any visit stay at 0
+            columns = ["total_visits", "ambulance_arrivals", "deaths", "surgeries", "surgery_success",
+                       "er_patients", "xrays", "blood_works", "code_blues", "code_blue_success", "survivals",
+                       "failed_visits"]
+            per_day = {column: [0] * self.days for column in columns}
+            cursor.execute(f"SELECT day, {', '.join(columns)} FROM daily_stats WHERE run_id = ? AND day < ? "
+                           "ORDER BY day", (self.run_id, self.days))
+            for row in cursor:
+                for column, value in zip(columns, row[1:]):
+                    per_day[column][row[0]] = value
 
             # Query conditions for all days
-            cursor.execute("SELECT day, condition, count FROM conditions")
+            cursor.execute("SELECT day, condition, count FROM conditions WHERE run_id = ?", (self.run_id,))
             conditions_data = cursor.fetchall()
             conditions_per_day = defaultdict(dict)
             for day, condition, count in conditions_data:
                 conditions_per_day[day][condition] = count
 
-            # Ensure all days (0-6) are present in the dictionary
-            for day in range(7):
+            # Ensure all days are present in the dictionary
+            for day in range(self.days):
                 if day not in conditions_per_day:
                     conditions_per_day[day] = {}
 
             # Query MCI stats
-            cursor.execute("SELECT mci_patients, mci_survivals, mci_deaths FROM mci_stats")
+            cursor.execute("SELECT mci_patients, mci_survivals, mci_deaths FROM mci_stats WHERE run_id = ?",
+                           (self.run_id,))
             mci_stats = cursor.fetchone()
             mci_patients, mci_survivals, mci_deaths = mci_stats
 
-            # Query waiting times (if stored in a separate table)
-            cursor.execute("SELECT day, waiting_time FROM waiting_times ORDER BY day")
-            waiting_times_data = cursor.fetchall()
-            waiting_times_per_day = [[] for _ in range(7)]
-            for day, waiting_time in waiting_times_data:
-                waiting_times_per_day[day].append(waiting_time)
+            # Query waiting time aggregates per day
+            wait_counts_per_day = [0] * self.days
+            wait_totals_per_day = [0.0] * self.days
+            cursor.execute("SELECT day, count, total_wait FROM daily_waits WHERE run_id = ? AND day < ?",
+                           (self.run_id, self.days))
+            for day, count, total_wait in cursor:
+                wait_counts_per_day[day] = count
+                wait_totals_per_day[day] = total_wait
 
             # Query patients per department for all days
-            cursor.execute("SELECT day, department, count FROM patients_per_department")
+            cursor.execute("SELECT day, department, count FROM patients_per_department WHERE run_id = ?",
+                           (self.run_id,))
             department_data = cursor.fetchall()
             patients_per_department = defaultdict(lambda: defaultdict(int))
             for day, department, count in department_data:
                 patients_per_department[day][department] = count
 
-            # Ensure all days (0-6) are present in the dictionary
-            for day in range(7):
+            # Ensure all days are present in the dictionary
+            for day in range(self.days):
                 if day not in patients_per_department:
                     patients_per_department[day] = {}
 
-                # Query waiting times for the MCI day
-            cursor.execute("SELECT waiting_time FROM waiting_times WHERE day = ?", (self.mci_day,))
-            mci_waiting_times = [row[0] for row in cursor.fetchall()]
+            # Query event waits summed over all days
+            cursor.execute("""
+                SELECT event, SUM(count), SUM(total_wait), MAX(max_wait)
+                FROM event_waits WHERE run_id = ? GROUP BY event
+            """, (self.run_id,))
+            event_waits = {event: {"count": count, "total_wait": total_wait, "max_wait": max_wait}
+                           for event, count, total_wait, max_wait in cursor.fetchall()}
+
+            # Query doctor loans per lender and borrower
+            cursor.execute("""
+                SELECT source, target, COUNT(*), AVG(longest_wait)
+                FROM staff_reassignments WHERE run_id = ? AND action = 'lend'
+                GROUP BY source, target ORDER BY COUNT(*) DESC
+            """, (self.run_id,))
+            staff_loans = [{"source": source, "target": target, "count": count, "avg_longest_wait": wait}
+                           for source, target, count, wait in cursor.fetchall()]
+
+            # Query resource utilization averaged over all days, busiest first
+            cursor.execute("""
+                SELECT resource, AVG(utilization), AVG(avg_queue_length), MAX(max_wait), SUM(unmatched_releases)
+                FROM resource_utilization
+                WHERE run_id = ?
+                GROUP BY resource
+                ORDER BY AVG(utilization) DESC
+            """, (self.run_id,))
+            resource_utilization = [
+                {"resource": resource, "utilization": utilization, "avg_queue_length": queue_length,
+                 "max_wait": max_wait, "unmatched_releases": unmatched}
+                for resource, utilization, queue_length, max_wait, unmatched in cursor.fetchall()
+            ]
 
         return {
-            "total_visits_per_day": total_visits_per_day,
-            "ambulance_arrivals_per_day": ambulance_arrivals_per_day,
-            "deaths_per_day": deaths_per_day,
-            "surgeries_per_day": surgeries_per_day,
-            "surgery_success_per_day": surgery_success_per_day,
-            "er_patients_per_day": er_patients_per_day,
-            "xrays_per_day": xrays_per_day,
-            "blood_works_per_day": blood_works_per_day,
-            "code_blues_per_day": code_blues_per_day,
-            "code_blue_success_per_day": code_blue_success_per_day,
-            "survivals_per_day": survivals_per_day,
+            "total_visits_per_day": per_day["total_visits"],
+            "ambulance_arrivals_per_day": per_day["ambulance_arrivals"],
+            "deaths_per_day": per_day["deaths"],
+            "surgeries_per_day": per_day["surgeries"],
+            "surgery_success_per_day": per_day["surgery_success"],
+            "er_patients_per_day": per_day["er_patients"],
+            "xrays_per_day": per_day["xrays"],
+            "blood_works_per_day": per_day["blood_works"],
+            "code_blues_per_day": per_day["code_blues"],
+            "code_blue_success_per_day": per_day["code_blue_success"],
+            "survivals_per_day": per_day["survivals"],
+            "failed_visits_per_day": per_day["failed_visits"],
             "conditions_per_day": conditions_per_day,
             "mci_patients": mci_patients,
             "mci_survivals": mci_survivals,
             "mci_deaths": mci_deaths,
-            "waiting_times_per_day": waiting_times_per_day,
+            "wait_counts_per_day": wait_counts_per_day,
+            "wait_totals_per_day": wait_totals_per_day,
             "patients_per_department": patients_per_department,
-            "mci_waiting_times": mci_waiting_times,
+            "event_waits": event_waits,
+            "staff_loans": staff_loans,
+            "resource_utilization": resource_utilization,
         }
 
+    def report_period(self):
+        """Pick the bar width for per-day charts: days, weeks or months."""
+        if self.days <= self.MAX_DAILY_BARS:
+            return 1, "Day"
+        if self.days <= self.MAX_WEEKLY_BARS * 7:
+            return 7, "Week"
+        return 30, "Month"
+
+    @staticmethod
+    def rollup(values, period):
+        """Sum a per-day series into consecutive buckets of `period` days."""
+        if period == 1:
+            return list(values)
+        return [sum(values[start:start + period]) for start in range(0, len(values), period)]
+
     def visualize_data(self):
         print("\n📊 Hospital Simulation Statistics 📊")
 
         data = self.fetch_data_from_db()
 
+        # Long runs are rolled up to weeks or months so the charts stay readable
+        period, period_name = self.report_period()
+        rolled = {key: self.rollup(values, period) for key, values in data.items()
+                  if key.endswith("_per_day") and isinstance(values, list)}
+        x = range(1, len(rolled["total_visits_per_day"]) + 1)
+
         # Calculate average waiting times
         avg_waiting_times = []
-        for day_waiting_times in data["waiting_times_per_day"]:
-            if day_waiting_times:
-                avg_waiting_times.append(int(sum(day_waiting_times) / len(day_waiting_times)))
+        for count, total in zip(rolled["wait_counts_per_day"], rolled["wait_totals_per_day"]):
+            if count:
+                avg_waiting_times.append(int(total / count))
             else:
                 avg_waiting_times.append(0)
 
         # Create figure with multiple subplots
         fig, axs = plt.subplots(4, 3, figsize=(16, 14))
-        fig.suptitle('Hospital Simulation: 7-Day Statistics', fontsize=16)
+        fig.suptitle(f'Hospital Simulation: {self.days}-Day Statistics', fontsize=16)
 
         # Total visits per day
-        axs[0, 0].bar(range(1, 8), data["total_visits_per_day"])
-        axs[0, 0].set_title('Total Visits per Day')
-        axs[0, 0].set_xlabel('Day')
+        axs[0, 0].bar(x, rolled["total_visits_per_day"])
+        axs[0, 0].set_title(f'Total Visits per {period_name}')
+        axs[0, 0].set_xlabel(period_name)
         axs[0, 0].set_ylabel('Number of Visits')
 
         # Average waiting time
-        axs[0, 1].bar(range(1, 8), avg_waiting_times)
-        axs[0, 1].set_title('Average Waiting Time per Day')
-        axs[0, 1].set_xlabel('Day')
+        axs[0, 1].bar(x, avg_waiting_times)
+        axs[0, 1].set_title(f'Average Waiting Time per {period_name}')
+        axs[0, 1].set_xlabel(period_name)
         axs[0, 1].set_ylabel('Time (minutes)')
         max_wait = max(avg_waiting_times)
         y_ticks = list(range(0, max_wait + 20, 10))
@@ -359,51 +733,51 @@ class Statistics:
         axs[0, 1].set_ylim(bottom=0)
 
         # Ambulance arrivals
-        axs[0, 2].bar(range(1, 8), data["ambulance_arrivals_per_day"])
-        axs[0, 2].set_title('Ambulance Arrivals per Day')
-        axs[0, 2].set_xlabel('Day')
+        axs[0, 2].bar(x, rolled["ambulance_arrivals_per_day"])
+        axs[0, 2].set_title(f'Ambulance Arrivals per {period_name}')
+        axs[0, 2].set_xlabel(period_name)
         axs[0, 2].set_ylabel('Number of Ambulances')
 
         # Deaths per day
-        axs[1, 0].bar(range(1, 8), data["deaths_per_day"])
-        axs[1, 0].set_title('Deaths per Day')
-        axs[1, 0].set_xlabel('Day')
+        axs[1, 0].bar(x, rolled["deaths_per_day"])
+        axs[1, 0].set_title(f'Deaths per {period_name}')
+        axs[1, 0].set_xlabel(period_name)
         axs[1, 0].set_ylabel('Number of Deaths')
 
         # Number of surgeries and outcomes
-        axs[1, 1].bar(range(1, 8), data["surgeries_per_day"], label='Total Surgeries')
-        axs[1, 1].bar(range(1, 8), data["surgery_success_per_day"], label='Successful')
-        axs[1, 1].set_title('Surgeries per Day and Outcomes')
-        axs[1, 1].set_xlabel('Day')
+        axs[1, 1].bar(x, rolled["surgeries_per_day"], label='Total Surgeries')
+        axs[1, 1].bar(x, rolled["surgery_success_per_day"], label='Successful')
+        axs[1, 1].set_title(f'Surgeries per {period_name} and Outcomes')
+        axs[1, 1].set_xlabel(period_name)
         axs[1, 1].set_ylabel('Number of Surgeries')
         axs[1, 1].legend()
 
         # Number of ER patients
-        axs[1, 2].bar(range(1, 8), data["er_patients_per_day"])
-        axs[1, 2].set_title('ER Patients per Day')
-        axs[1, 2].set_xlabel('Day')
+        axs[1, 2].bar(x, rolled["er_patients_per_day"])
+        axs[1, 2].set_title(f'ER Patients per {period_name}')
+        axs[1, 2].set_xlabel(period_name)
         axs[1, 2].set_ylabel('Number of Patients')
 
         # Number of X-rays and blood works
-        axs[2, 0].bar(range(1, 8), data["xrays_per_day"], label='X-rays')
-        axs[2, 0].bar(range(1, 8), data["blood_works_per_day"], bottom=data["xrays_per_day"], label='Blood Works')
-        axs[2, 0].set_title('X-rays and Blood Works per Day')
-        axs[2, 0].set_xlabel('Day')
+        axs[2, 0].bar(x, rolled["xrays_per_day"], label='X-rays')
+        axs[2, 0].bar(x, rolled["blood_works_per_day"], bottom=rolled["xrays_per_day"], label='Blood Works')
+        axs[2, 0].set_title(f'X-rays and Blood Works per {period_name}')
+        axs[2, 0].set_xlabel(period_name)
         axs[2, 0].set_ylabel('Number of Tests')
         axs[2, 0].legend()
 
         # Number of code blues and outcomes
-        axs[2, 1].bar(range(1, 8), data["code_blues_per_day"], label='Total Code Blues')
-        axs[2, 1].bar(range(1, 8), data["code_blue_success_per_day"], label='Successful')
-        axs[2, 1].set_title('Code Blues per Day and Outcomes')
-        axs[2, 1].set_xlabel('Day')
+        axs[2, 1].bar(x, rolled["code_blues_per_day"], label='Total Code Blues')
+        axs[2, 1].bar(x, rolled["code_blue_success_per_day"], label='Successful')
+        axs[2, 1].set_title(f'Code Blues per {period_name} and Outcomes')
+        axs[2, 1].set_xlabel(period_name)
         axs[2, 1].set_ylabel('Number of Code Blues')
         axs[2, 1].legend()
 
         # Survivals per day
-        axs[2, 2].bar(range(1, 8), data["survivals_per_day"])
-        axs[2, 2].set_title('Survivals per Day')
-        axs[2, 2].set_xlabel('Day')
+        axs[2, 2].bar(x, rolled["survivals_per_day"])
+        axs[2, 2].set_title(f'Survivals per {period_name}')
+        axs[2, 2].set_xlabel(period_name)
         axs[2, 2].set_ylabel('Number of Survivals')
 
         # Plot conditions for Day 1 as an example
@@ -438,7 +812,7 @@ class Statistics:
         print(f"Statistics visualization saved as 'hospital_statistics.png'")
 
         # Print textual summary
-        print("\n=== 7-Day Hospital Simulation Summary ===")
+        print(f"\n=== {self.days}-Day Hospital Simulation Summary ===")
         total_patients = sum(data["total_visits_per_day"])
         total_deaths = sum(data["deaths_per_day"])
         death_rate = (total_deaths / total_patients) * 100 if total_patients > 0 else 0
@@ -452,12 +826,58 @@ class Statistics:
         Successful Code Blues: {sum(data["code_blue_success_per_day"])}
         """)
 
+        failed_visits = sum(data["failed_visits_per_day"])
+        if failed_visits:
+            print(f"❗ Failed Visits: {failed_visits} (recorded without an outcome)")
+
+        code_blue_waits = data["event_waits"].get("code_blue")
+        if code_blue_waits and code_blue_waits["count"]:
+            avg_team_wait = code_blue_waits["total_wait"] / code_blue_waits["count"]
+            print(f"Average Code Blue Team Wait: {avg_team_wait:.1f} minutes "
+                  f"(max {code_blue_waits['max_wait']:.1f} minutes)")
+
+        offload_waits = data["event_waits"].get("ambulance offload")
+        if offload_waits and offload_waits["count"]:
+            avg_offload = offload_waits["total_wait"] / offload_waits["count"]
+            print(f"Average Ambulance Offload Delay: {avg_offload:.1f} minutes "
+                  f"(max {offload_waits['max_wait']:.1f} minutes, {offload_waits['count']} ambulances)")
+
+        # Admission control: hand-offs blocked by a full stage and diverted ambulances
+        for event, waits in sorted(data["event_waits"].items()):
+            if event.startswith("blocked: ") and waits["count"]:
+                print(f"{event[len('blocked: '):]} full: {waits['count']} hand-offs blocked, "
+                      f"avg {waits['total_wait'] / waits['count']:.1f} minutes (max {waits['max_wait']:.1f})")
+            elif event.startswith("diverted: "):
+                print(f"{event[len('diverted: '):]} full: {waits['count']} ambulances diverted")
+            elif event.startswith("lab batch: ") and waits["count"]:
+                print(f"{event[len('lab batch: '):]} analyzer: {waits['count']} batches, "
+                      f"avg {waits['total_wait'] / waits['count']:.1f} minutes to fill (max {waits['max_wait']:.1f})")
+
+        # Doctors lent by the staff scheduler
+        for loan in data["staff_loans"]:
+            print(f"{loan['source']} lent {loan['count']} doctors to {loan['target']} "
+                  f"(longest wait at the time avg {loan['avg_longest_wait']:.0f} minutes)")
+
         # Average waiting time overall
-        all_waiting_times = [time for day_times in data["waiting_times_per_day"] for time in day_times]
-        if all_waiting_times:
-            avg_wait = sum(all_waiting_times) / len(all_waiting_times)
+        total_waits = sum(data["wait_counts_per_day"])
+        if total_waits:
+            avg_wait = sum(data["wait_totals_per_day"]) / total_waits
             print(f"Average Waiting Time: {int(avg_wait)} minutes")
 
+            steady = self.steady_state_waits()
+            if steady["dropped"] and steady["count"]:
+                print(f"Average Waiting Time after warm-up: {int(steady['mean'])} minutes "
+                      f"(first {steady['dropped']} of {steady['count'] + steady['dropped']} patients dropped)")
+
+        # Resource utilization (busiest first)
+        if data["resource_utilization"]:
+            print("\n=== Resource Utilization ===")
+            for resource in data["resource_utilization"]:
+                print(f"{resource['resource']:<28} {resource['utilization'] * 100:5.1f}% busy, "
+                      f"avg queue {resource['avg_queue_length']:.2f}, "
+                      f"max wait {resource['max_wait'] * 1000:.1f} ms, "
+                      f"unmatched releases {resource['unmatched_releases']}")
+
         # MCI day statistics
         print(f"""
         \n=== Mass Casualty Incident (Day {self.mci_day + 1}) ===
@@ -466,6 +886,6 @@ class Statistics:
         MCI Deaths: {data["mci_deaths"]}
         """)
 
-        if data["mci_waiting_times"]:
-            avg_mci_wait = sum(data["mci_waiting_times"]) / len(data["mci_waiting_times"])
+        if self.mci_day < self.days and data["wait_counts_per_day"][self.mci_day]:
+            avg_mci_wait = data["wait_totals_per_day"][self.mci_day] / data["wait_counts_per_day"][self.mci_day]
             print(f"Average Waiting Time during MCI: {int(avg_mci_wait)} minutes")
\ No newline at end of file
@@ -0,0 +1,42 @@
+from heapq import heapify, heappop, heappush
+from itertools import count
+from queue import PriorityQueue
+from time import time
+
+from PatientFacts import MINUTES_PER_SECOND
+
+
+class TriageQueue(PriorityQueue):
+    """ER/MCI priority queue ordered by precomputed tuple keys.
+
+    Entries are (priority, arrival, sequence, patient) tuples, so heap
+    comparisons never reach Patient.__lt__. With aging_rate > 0 a waiting
+    patient gains aging_rate severity points per report minute waited. Since
+    every entry ages at the same rate, the order only depends on
+    aging_rate * arrival - severity, which is fixed when the patient is queued.
+    """
+
+    def __init__(self, aging_rate=0.0, maxsize=0):
+        super().__init__(maxsize)
+        self.aging_rate = aging_rate
+        self.epoch = time()  # Keeps the aged keys small
+        self.sequence = count()
+
+    def key(self, patient):
+        arrival = (patient.arrival_time or time()) - self.epoch
+        severity = patient.severity or 0
+        return self.aging_rate * MINUTES_PER_SECOND * arrival - severity, arrival
+
+    def set_aging_rate(self, rate):
+        """Change aging_rate and re-key the patients already waiting, keeping ties in arrival order."""
+        with self.mutex:
+            self.aging_rate = rate
+            self.queue = [self.key(patient) + (sequence, patient) for _, _, sequence, patient in self.queue]
+            heapify(self.queue)
+
+    def _put(self, patient):
+        priority, arrival = self.key(patient)
+        heappush(self.queue, (priority, arrival, next(self.sequence), patient))
+
+    def _get(self):
+        return heappop(self.queue)[-1]
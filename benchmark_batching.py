@@ -0,0 +1,96 @@
+import os
+import tempfile
+from queue import Empty
+from random import choice, randint, random, seed
+from threading import Thread
+from time import perf_counter, time
+
+from BatchQueue import BatchQueue
+from Patient import Patient
+from Statistics import Statistics
+
+# A normal day (100 walk-ins and 50 ambulances) at 10x volume
+PATIENTS_PER_DAY = 10 * (100 + 50)
+
+CONDITIONS = ("heart attack", "stroke", "broken arm", "pneumonia", "appendicitis", "hernia", "flu")
+DEPARTMENTS = ("Cardiology", "Neurology", "Orthopedics", "Pulmonology", "Gastroenterology", "General Surgery",
+               "Internal Medicine")
+
+
+def make_patients(count):
+    """Departed patients with random outcomes."""
+    start = time()
+    patients = []
+    for i in range(count):
+        patient = Patient(f"Patient {i}", start)
+        patient.severity = randint(1, 10)
+        patient.condition = choice(CONDITIONS)
+        patient.department = choice(DEPARTMENTS)
+        patient.registration_time = start + 1
+        patient.assessment_time = start + 2
+        patient.doctor_start_time = start + 3
+        patient.doctor_end_time = patient.discharge_time = start + 4
+        patient.had_blood_work = random() < 0.3
+        patient.had_xray = random() < 0.3
+        patient.came_by_ambulance = random() < 0.3
+        patient.dead = random() < 0.05
+        patients.append(patient)
+    return patients
+
+
+def recorder_rate(patients, producers, batch_size):
+    """Hand departures from `producers` threads to one stats recorder; returns patients recorded per second.
+
+    Like stats_recorder_thread(), the recorder takes up to batch_size
+    departures per wake-up (one get() when batch_size is 1) and records
+    them with one combined stats write.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        stats = Statistics(os.path.join(directory, "benchmark.db"), days=1)
+        queue = BatchQueue()
+
+        def record():
+            while True:
+                try:
+                    if batch_size == 1:
+                        batch = [queue.get(timeout=0.1)]
+                    else:
+                        batch = queue.get_batch(batch_size, timeout=0.1)
+                except Empty:
+                    return
+                stats.record_visits(0, batch)
+                queue.batch_done(len(batch))
+
+        def depart(share):
+            for patient in share:
+                queue.put(patient)
+
+        start = perf_counter()
+        recorder = Thread(target=record)
+        recorder.start()
+        senders = [Thread(target=depart, args=(patients[i::producers],)) for i in range(producers)]
+        for sender in senders:
+            sender.start()
+        for sender in senders:
+            sender.join()
+        queue.join()
+        stats.flush_patient_facts()
+        elapsed = perf_counter() - start
+        recorder.join()
+        return len(patients) / elapsed
+
+
+def main():
+    seed(42)
+    patients = make_patients(PATIENTS_PER_DAY)
+    print(f"⏱️ Batching benchmark at 10x volume ({PATIENTS_PER_DAY:,} patients per day, higher is better)")
+
+    print("\nDeparture recorder fed by 8 doctor threads (patients recorded per second):")
+    baseline = recorder_rate(patients, 8, 1)
+    print(f"  one get() and write per patient {baseline:>10,.0f}")
+    for batch_size in (16, 64, 256):
+        rate = recorder_rate(patients, 8, batch_size)
+        print(f"  up to {batch_size:<3} per wake-up and write  {rate:>10,.0f}   ({rate / baseline:.1f}x)")
+
+if __name__ == "__main__":
+    main()
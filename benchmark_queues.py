@@ -0,0 +1,87 @@
+from queue import PriorityQueue
+from random import randint, seed
+from time import perf_counter, time
+
+from Patient import Patient
+from TriageQueue import TriageQueue
+
+
+def make_patients(count):
+    """Patients with random severities arriving one report minute apart."""
+    start = time()
+    patients = []
+    for i in range(count):
+        patient = Patient(f"Patient {i}", start + i * 2)
+        patient.severity = randint(1, 10)
+        patients.append(patient)
+    return patients
+
+
+def fill_and_drain(queue, patients):
+    """Queue every patient, then serve them all; returns operations per second."""
+    start = perf_counter()
+    for patient in patients:
+        queue.put(patient)
+    while not queue.empty():
+        queue.get()
+    return 2 * len(patients) / (perf_counter() - start)
+
+
+def steady_state(queue, patients, backlog):
+    """Keep `backlog` patients waiting while the rest stream through; returns operations per second."""
+    for patient in patients[:backlog]:
+        queue.put(patient)
+    start = perf_counter()
+    for patient in patients[backlog:]:
+        queue.put(patient)
+        queue.get()
+    return 2 * (len(patients) - backlog) / (perf_counter() - start)
+
+
+def low_severity_waits(queue, patients, backlog=500):
+    """Serve one patient per arrival behind a standing backlog.
+
+    Returns (longest wait of a served severity 1-3 patient in arrivals,
+    severity 1-3 patients still waiting at the end).
+    """
+    arrival_index = {id(patient): i for i, patient in enumerate(patients)}
+    longest = 0
+    for i, patient in enumerate(patients):
+        queue.put(patient)
+        if i >= backlog:
+            served = queue.get()
+            if served.severity <= 3:
+                longest = max(longest, i - arrival_index[id(served)])
+    still_waiting = sum(1 for *_, patient in queue.queue if patient.severity <= 3)
+    return longest, still_waiting
+
+
+def main():
+    seed(42)
+    print("⏱️ ER/MCI queue benchmark (operations per second, higher is better)")
+    print(f"{'Patients':>10}{'Patient.__lt__':>18}{'TriageQueue':>16}{'Aging queue':>16}{'Speedup':>10}")
+
+    # From a normal ER shift to the largest MCI backlogs
+    for count in (150, 1500, 15000, 150000):
+        patients = make_patients(count)
+        baseline = fill_and_drain(PriorityQueue(), patients)
+        keyed = fill_and_drain(TriageQueue(), patients)
+        aging = fill_and_drain(TriageQueue(aging_rate=0.1), patients)
+        print(f"{count:>10}{baseline:>18,.0f}{keyed:>16,.0f}{aging:>16,.0f}{keyed / baseline:>9.1f}x")
+
+    print("\nSteady state with 1,500 patients waiting:")
+    patients = make_patients(50000)
+    baseline = steady_state(PriorityQueue(), patients, 1500)
+    keyed = steady_state(TriageQueue(), patients, 1500)
+    print(f"  Patient.__lt__ {baseline:,.0f} ops/s, TriageQueue {keyed:,.0f} ops/s ({keyed / baseline:.1f}x)")
+
+    print("\nSeverity 1-3 patients behind a standing backlog of 500 (waits counted in arrivals):")
+    patients = make_patients(20000)
+    for rate in (0.0, 0.05, 0.2):
+        longest, still_waiting = low_severity_waits(TriageQueue(rate), patients)
+        print(f"  aging rate {rate:<5} longest served wait {longest:>6,}   "
+              f"still waiting at the end {still_waiting:>4}")
+
+
+if __name__ == "__main__":
+    main()